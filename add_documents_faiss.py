@@ -1,60 +1,100 @@
 import os
 import sys
+import time
+from pathlib import Path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from langchain_core.documents import Document
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from embeddings import get_embeddings
+from vector_storage import FAISS_VECTOR_STORAGE, apply_storage
+from page_cache import load_pdf_pages, format_stats
+from index_snapshots import (load, publish, writer_lock, current_version, ids_for_source,
+                             needs_compaction, compact_in_background)
 
-FAISS_INDEX_PATH = "faiss_index"
+# Every change is published as a new index version with an atomic CURRENT swap (see index_snapshots.py)
+FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH", "faiss_index")
 vector_store = None
+vector_store_version = None
 embeddings = None
 
 def initialize_vector_store():
     # Initialize or load the FAISS vector store
-    global vector_store, embeddings
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2",  model_kwargs={'device': 'cpu'}, encode_kwargs={'normalize_embeddings': True}
-)
+    global vector_store, vector_store_version, embeddings
+    # Same backend as the search side (EMBEDDING_BACKEND, see embeddings.py), so queries and indexed chunks are comparable
+    embeddings = get_embeddings()
     try:
-        if os.path.exists(FAISS_INDEX_PATH):
-            vector_store = FAISS.load_local(FAISS_INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
-            print("Loaded existing FAISS index")
-        else:
-            init_doc=Document(page_content="This is the initial document to create the FAISS index.", metadata={})
-            vector_store = FAISS.from_documents([init_doc], embeddings)
-            vector_store.save_local(FAISS_INDEX_PATH)
-            print("Created new FAISS index")
+        with writer_lock(FAISS_INDEX_PATH):
+            vector_store, vector_store_version = load(FAISS_INDEX_PATH, embeddings)
+            if vector_store is not None:
+                print(f"Loaded existing FAISS index {vector_store_version or '(unversioned)'}")
+            else:
+                init_doc=Document(page_content="This is the initial document to create the FAISS index.", metadata={})
+                vector_store = FAISS.from_documents([init_doc], embeddings)
+                vector_store.tombstones = frozenset()
+                vector_store_version = publish(vector_store, FAISS_INDEX_PATH)
+                print("Created new FAISS index")
     except Exception as e:
         print(f"Error initializing FAISS: {e}")
         raise
 
 
+def _refresh_under_lock():
+    # Another ingestion run or a compaction may have published since this process loaded the index
+    global vector_store, vector_store_version
+    if current_version(FAISS_INDEX_PATH) != vector_store_version:
+        vector_store, vector_store_version = load(FAISS_INDEX_PATH, embeddings)
+        print(f"Reloaded FAISS index {vector_store_version} published by another process")
+
 def add_documents_to_faiss(documents: list[Document]):
-    # Add new documents to the FAISS index and save it
-    global vector_store
-    vector_store.add_documents(documents)
-    vector_store.save_local(FAISS_INDEX_PATH)
+    # Add new documents to the FAISS index and publish it as a new version; searches keep using the old one until the swap
+    global vector_store_version
+    with writer_lock(FAISS_INDEX_PATH):
+        _refresh_under_lock()
+        vector_store.add_documents(documents)
+        # Store vectors as float16 and/or PCA-reduced when FAISS_VECTOR_STORAGE asks for it (see vector_storage.py)
+        apply_storage(vector_store)
+        vector_store_version = publish(vector_store, FAISS_INDEX_PATH, vector_store.tombstones)
     print(f"Added {len(documents)} documents to FAISS index")
+
+def delete_documents_by_source(source: str):
+    # Mark a source's chunks deleted; they are filtered from searches now and dropped by compaction later
+    global vector_store_version
+    with writer_lock(FAISS_INDEX_PATH):
+        _refresh_under_lock()
+        ids = ids_for_source(vector_store, source)
+        if not ids:
+            print(f"No chunks with source {source}")
+            return
+        vector_store.tombstones = vector_store.tombstones | set(ids)
+        vector_store_version = publish(vector_store, FAISS_INDEX_PATH, vector_store.tombstones)
+    print(f"Deleted {len(ids)} chunks from {source}")
+    if needs_compaction(vector_store):
+        print("Compacting the index in the background")
+        compact_in_background(FAISS_INDEX_PATH, embeddings)
 2
 def add_from_pdf(pdf_path: str):
     """Add documents from a PDF file."""
     print(f"\n=== Adding Documents from PDF: {pdf_path} ===")
     
     try:
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
+        # Extracted pages come from the page cache when this PDF was parsed before (see page_cache.py)
+        stats = {}
+        documents = load_pdf_pages(pdf_path, stats=stats)
+        print(format_stats(stats))
         
         # Split into chunks
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
+            add_start_index=True,  # lets context_assembler.py merge overlapping chunks exactly
         )
         split_docs = text_splitter.split_documents(documents)
 
         for doc in split_docs:
             doc.metadata["file_type"] = "pdf"
+            doc.metadata["file"] = pdf_path  # per-file key for context_assembler.py; "source" is not unique per file
             doc.metadata["source"] = str(os.path.getctime(pdf_path))
         
         add_documents_to_faiss(split_docs)
@@ -68,16 +108,22 @@ def add_from_directory(directory_path: str, file_type: str = "*.txt"):
     print(f"\n Adding Documents from Directory: {directory_path} ===")
     
     try:
-        loader = DirectoryLoader(directory_path, glob=file_type, loader_cls=PyPDFLoader, use_multithreading=False)
-        documents = loader.load()
+        stats, start = {}, time.perf_counter()
+        documents = []
+        for path in sorted(Path(directory_path).glob(file_type)):
+            if path.is_file():
+                documents.extend(load_pdf_pages(str(path), stats=stats))
+        print(f"Loaded {len(documents)} pages in {time.perf_counter() - start:.2f}s - {format_stats(stats)}")
         # Split into chunks
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
+            add_start_index=True,  # lets context_assembler.py merge overlapping chunks exactly
         )
         split_docs = text_splitter.split_documents(documents)
         for doc in split_docs:
             doc.metadata["file_type"] = "pdf"
+            doc.metadata["file"] = doc.metadata.get("source", "")  # per-file key for context_assembler.py
             doc.metadata["source"] = str(os.path.dirname(doc.metadata.get("source", "")))
         
         add_documents_to_faiss(split_docs)
@@ -96,9 +142,10 @@ def interactive_mode():
         print("\nOptions:")
         print("  1. Add from PDF file")
         print("  2. Add from directory")
-        print("  3. Exit")
+        print("  3. Delete documents by source")
+        print("  4. Exit")
         
-        choice = input("\nEnter your choice (1-3): ").strip()
+        choice = input("\nEnter your choice (1-4): ").strip()
         if choice == "1":
             pdf_path = input("Enter PDF file path: ").strip()
             if os.path.exists(pdf_path):
@@ -112,6 +159,10 @@ def interactive_mode():
             else:
                 print("Directory not found")
         elif choice == "3":
+            source = input("Enter the source to delete (as stored in the chunk metadata): ").strip()
+            if source:
+                delete_documents_by_source(source)
+        elif choice == "4":
             print("\n End!")
             break
         else:
@@ -122,7 +173,8 @@ def main():
     print("   FAISS Vector Store - Document Addition Utility")
     print("="*70)
     print("\nThis utility helps you add documents to your FAISS vector store.")
-    print("Current vector store location: faiss_index/")
+    print(f"Current vector store location: {FAISS_INDEX_PATH}/ (versioned, see index_snapshots.py)")
+    print(f"Vector storage: {FAISS_VECTOR_STORAGE}")
 
     initialize_vector_store()
     interactive_mode()
@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from metrics import counter, gauge
+
+# Admission control for the API layer. Instead of accepting every request and piling work onto the
+# executor until latency collapses for everyone, requests are:
+#   1. rate limited per session with a token bucket (429 + Retry-After),
+#   2. admitted while fewer than ADMISSION_MAX_IN_FLIGHT agent turns are running,
+#   3. otherwise queued in a bounded, priority-ordered wait queue (interactive WebSocket traffic
+#      ahead of bulk REST), and dropped with 503 + Retry-After when the queue is full or a request
+#      has waited past its deadline - a late answer is worth less than a fast rejection.
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT_S = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "10"))
+SESSION_RATE_LIMIT_PER_MIN = float(os.getenv("SESSION_RATE_LIMIT_PER_MIN", "30"))  # 0 disables rate limiting
+SESSION_RATE_BURST = int(os.getenv("SESSION_RATE_BURST", "10"))
+MAX_TRACKED_SESSIONS = 100_000
+
+# Lane name -> priority (lower is served first)
+LANES = {"interactive": 0, "bulk": 1}
+
+IN_FLIGHT = gauge("agent_admission_in_flight", "Agent turns currently admitted", [])
+QUEUED = gauge("agent_admission_queued", "Requests waiting for admission", ["lane"])
+REJECTED = counter("agent_admission_rejected_total", "Requests rejected by admission control", ["lane", "reason"])
+ADMITTED = counter("agent_admission_admitted_total", "Requests admitted", ["lane"])
+
+
+class AdmissionRejected(Exception):
+    "Raised when a request is rate limited (429) or shed (503); carries a Retry-After hint in seconds."
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate_per_second: float):
+        self.capacity = capacity
+        self.rate = rate_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        "Take one token; returns 0 on success or the seconds until a token is available."
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Waiter:
+    __slots__ = ("priority", "sequence", "lane", "deadline", "future")
+
+    def __init__(self, priority, sequence, lane, deadline, future):
+        self.priority = priority
+        self.sequence = sequence
+        self.lane = lane
+        self.deadline = deadline
+        self.future = future
+
+    @property
+    def order(self):
+        return (self.priority, self.sequence)
+
+
+class AdmissionController:
+    "Concurrency limit, bounded priority wait queue and per-session rate limits (see module comment)."
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_S, rate_per_minute: float = SESSION_RATE_LIMIT_PER_MIN,
+                 burst: int = SESSION_RATE_BURST, lanes: dict = None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate_per_second = rate_per_minute / 60
+        self.burst = burst
+        self.lanes = lanes or LANES
+        self.in_flight = 0
+        self._waiters = []
+        self._buckets = OrderedDict()
+        self._sequence = itertools.count()
+        self._service_time = 1.0  # EWMA of turn duration, used for Retry-After
+
+    # Rate limiting ----------------------------------------------------------------------------------------------------
+    def check_rate(self, session_id: str, lane: str = "bulk"):
+        "Raise AdmissionRejected(429) when the session exceeded its message rate."
+        if self.rate_per_second <= 0:
+            return
+        bucket = self._buckets.get(session_id)
+        if bucket is None:
+            bucket = self._buckets[session_id] = TokenBucket(self.burst, self.rate_per_second)
+            if len(self._buckets) > MAX_TRACKED_SESSIONS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(session_id)
+        wait = bucket.take()
+        if wait:
+            REJECTED.inc(lane=lane, reason="rate_limited")
+            raise AdmissionRejected(429, "rate_limited", wait)
+
+    # Concurrency limit ------------------------------------------------------------------------------------------------
+    def _retry_after(self) -> float:
+        return self._service_time * (len(self._waiters) + 1) / max(self.max_in_flight, 1)
+
+    def _reject(self, lane: str, reason: str) -> AdmissionRejected:
+        REJECTED.inc(lane=lane, reason=reason)
+        return AdmissionRejected(503, reason, self._retry_after())
+
+    def _remove(self, waiter):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            QUEUED.dec(lane=waiter.lane)
+
+    def _wake_next(self):
+        # Hand free slots to the best waiters, dropping any whose deadline already passed
+        now = time.monotonic()
+        while self._waiters and self.in_flight < self.max_in_flight:
+            waiter = min(self._waiters, key=lambda w: w.order)
+            self._remove(waiter)
+            if waiter.future.done():
+                continue
+            if waiter.deadline < now:
+                waiter.future.set_exception(self._reject(waiter.lane, "deadline_exceeded"))
+                continue
+            self.in_flight += 1
+            waiter.future.set_result(True)
+
+    async def _acquire(self, lane: str, deadline: float):
+        priority = self.lanes.get(lane, max(self.lanes.values()))
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            # Queue full: shed the lowest-priority, newest waiter if this request outranks it
+            worst = max(self._waiters, key=lambda w: w.order) if self._waiters else None
+            if worst is None or worst.priority <= priority:
+                raise self._reject(lane, "queue_full")
+            self._remove(worst)
+            if not worst.future.done():
+                worst.future.set_exception(self._reject(worst.lane, "preempted"))
+
+        waiter = _Waiter(priority, next(self._sequence), lane, deadline, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        QUEUED.inc(lane=lane)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self._remove(waiter)
+            if waiter.future.done() and not waiter.future.exception():
+                return  # granted at the last moment
+            raise self._reject(lane, "queue_timeout") from None
+        except asyncio.CancelledError:
+            self._remove(waiter)
+            if waiter.future.done() and not waiter.future.cancelled() and not waiter.future.exception():
+                self._release(0.0)
+            raise
+
+    def _release(self, duration: float):
+        self.in_flight -= 1
+        if duration:
+            self._service_time = 0.9 * self._service_time + 0.1 * duration
+        self._wake_next()
+
+    @asynccontextmanager
+    async def slot(self, lane: str = "bulk", timeout: float = None):
+        "Hold an in-flight slot for the enclosed block; raises AdmissionRejected(503) when shed."
+        deadline = time.monotonic() + (self.queue_timeout if timeout is None else timeout)
+        await self._acquire(lane, deadline)
+        ADMITTED.inc(lane=lane)
+        IN_FLIGHT.set(self.in_flight)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - start)
+            IN_FLIGHT.set(self.in_flight)
@@ -1,14 +1,23 @@
-from fastapi import FastAPI, WebSocket, HTTPException, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, HTTPException, WebSocketDisconnect, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
 
 import asyncio
-import json
+import os
+import tempfile
 import uvicorn
 
-from main import run_agent
-from memory_postgres import clear_session_history # PostgreSQL version
+from main import run_turn, clear_session_history, list_sessions_page, export_messages # history backend selected in main.py
+from history_export import iter_ndjson, write_parquet
+from startup import readiness, start_background_warm_up
+from session_queue import SessionQueue
+from admission import AdmissionController, AdmissionRejected
+from cpu_pool import check_input_async, start_executors, shutdown_executors
+from ws_connections import ConnectionRegistry, WS_IDLE_TIMEOUT_SECONDS, server_options
+from metrics import GUARDRAIL_LATENCY, GUARDRAIL_BLOCKS, REQUEST_LATENCY, REQUESTS, render_metrics
 
 from pii_guardrail import OutputGuardrails
 from prompt_guardrail import InputGuardrails
@@ -17,7 +26,25 @@ from prompt_guardrail import InputGuardrails
 input_guardrails = InputGuardrails()
 output_guardrails = OutputGuardrails()
 
-app = FastAPI(title="AI Agent API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy components (LLM client, embeddings, FAISS index, graph, Phoenix) load in the background
+    # so the worker accepts connections immediately; /ready flips once they are available.
+    # The CPU pool forks first, before the warm-up threads start (see cpu_pool.py).
+    lag_monitor = start_executors()
+    start_background_warm_up()
+    yield
+    lag_monitor.cancel()
+    shutdown_executors()
+
+app = FastAPI(title="AI Agent API", lifespan=lifespan)
+
+# Turns for the same session run one at a time, in order (see session_queue.py)
+session_queue = SessionQueue()
+# In-flight limit, priority wait queue and per-session rate limits (see admission.py)
+admission = AdmissionController()
+# Per-worker /ws connection cap, idle timeout and bounded send queues (see ws_connections.py)
+ws_connections = ConnectionRegistry()
 
 app.add_middleware(
     CORSMiddleware,
@@ -187,6 +214,30 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
     session_id: str
+    metadata: dict = {}  # route taken and budget usage (see budgets.py)
+
+async def run_agent_async(message: str, session_id: str) -> dict:
+    # Run the blocking agent turn in the default executor
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, run_turn, message, session_id)
+
+def admitted(lane: str):
+    # Session-queue handler that holds an admission slot in the given lane while the turn runs
+    async def handler(message: str, session_id: str) -> dict:
+        async with admission.slot(lane):
+            return await run_agent_async(message, session_id)
+    return handler
+
+run_agent_interactive = admitted("interactive")   # WebSocket traffic
+run_agent_bulk = admitted("bulk")                 # REST traffic
+
+def rejection_response(rejection: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        status_code=rejection.status_code,
+        content={"detail": {"message": "Server busy, retry later" if rejection.status_code == 503 else "Rate limit exceeded",
+                            "reason": rejection.reason}},
+        headers={"Retry-After": str(rejection.retry_after)}
+    )
 
 @app.get("/", response_class=HTMLResponse)
 async def get_chat_interface():
@@ -194,17 +245,44 @@ async def get_chat_interface():
 
 @app.get("/health")
 async def health_check():
+    # Liveness: the process is up and serving requests
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    # Readiness: all required components are loaded
+    ready, components = readiness()
+    body = {"status": "ready" if ready else "not_ready", "components": components}
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    # Prometheus scrape endpoint
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
-    # Input guardrail check
-    passed, results = input_guardrails.check_all(request.message)
+    with REQUEST_LATENCY.time(endpoint="/chat"):
+        return await _chat(request)
+
+async def _chat(request: ChatRequest):
+    # Per-session rate limit before doing any work
+    try:
+        admission.check_rate(request.session_id, lane="bulk")
+    except AdmissionRejected as rejection:
+        REQUESTS.inc(endpoint="/chat", status=str(rejection.status_code))
+        return rejection_response(rejection)
+
+    # Input guardrail check (long inputs are checked in the CPU pool, off the event loop)
+    with GUARDRAIL_LATENCY.time(check="input"):
+        passed, results = await check_input_async(input_guardrails, request.message)
     print(f"Overall Input Guardrail Result: {'PASSED' if passed else 'FAILED'}")
     for result in results:
         print(f" - {result['cause']} (Risk: {result['risk_level']})")
     if not passed:
+        GUARDRAIL_BLOCKS.inc(check="input")
+        REQUESTS.inc(endpoint="/chat", status="blocked")
         detail = {
             "message": "Input blocked by guardrails",
             "violations": [{"cause": r["cause"], "risk_level": r["risk_level"]} for r in results]
@@ -212,54 +290,102 @@ async def chat_endpoint(request: ChatRequest):
         raise HTTPException(status_code=400, detail=detail)
     else:
         print("Input passed all guardrail checks.")
-        # Run agent (make it async-compatible)
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, run_agent, request.message, request.session_id)
+        # Run agent (make it async-compatible), ordered with other turns of the same session
+        try:
+            turn = await session_queue.submit(request.session_id, request.message, run_agent_bulk)
+            response, metadata = turn["response"]["response"], turn["response"]["metadata"]
+        except AdmissionRejected as rejection:
+            REQUESTS.inc(endpoint="/chat", status=str(rejection.status_code))
+            return rejection_response(rejection)
+        except Exception:
+            REQUESTS.inc(endpoint="/chat", status="error")
+            raise
     
-    return ChatResponse(response=response, session_id=request.session_id)
+    REQUESTS.inc(endpoint="/chat", status="ok")
+    return ChatResponse(response=response, session_id=request.session_id, metadata=metadata)
 
 # WebSocket endpoint for streaming
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
-    await websocket.accept()
+    connection = await ws_connections.open(websocket)
+    if connection is None:
+        return  # worker at WS_MAX_CONNECTIONS, closed with 1013
+
+    async def process(user_message: str):
+        # Turns are queued per session, so replies go out in the order messages arrived. Messages
+        # coalesced into a later message's turn are answered by that turn's reply.
+        try:
+            with REQUEST_LATENCY.time(endpoint="/ws"):
+                turn = await session_queue.submit(session_id, user_message, run_agent_interactive)
+            REQUESTS.inc(endpoint="/ws", status="ok")
+            if turn["primary"]:
+                connection.send({
+                    "response": turn["response"]["response"],
+                    "session_id": session_id,
+                    "coalesced": turn["coalesced"],
+                    "metadata": turn["response"]["metadata"]
+                })
+        except AdmissionRejected as rejection:
+            REQUESTS.inc(endpoint="/ws", status=str(rejection.status_code))
+            connection.send({"error": "Server busy, retry later", "reason": rejection.reason,
+                             "retry_after": rejection.retry_after, "session_id": session_id})
+        except Exception as e:
+            REQUESTS.inc(endpoint="/ws", status="error")
+            connection.send({"error": str(e), "session_id": session_id})
+
+    pending_turns = set()
+    close_reason = "server closed"
     try:
         while True:
-            # Receive message from client
-            data = await websocket.receive_text()
-            
-            # Parse JSON if needed
+            # Receive message from client; a connection with nothing in flight is closed once idle
             try:
-                message_data = json.loads(data)
+                message_data, data = await connection.receive(WS_IDLE_TIMEOUT_SECONDS)
+            except TimeoutError:
+                if pending_turns:
+                    continue
+                close_reason = "idle timeout"
+                break
+
+            # JSON/msgpack object with a "message" field, or plain text
+            if isinstance(message_data, dict):
+                if message_data.get("type") == "ping":
+                    connection.send({"type": "pong"})
+                    continue
                 user_message = message_data.get("message", data)
-            except:
+            else:
                 user_message = data
+
+            # Per-session rate limit
+            try:
+                admission.check_rate(session_id, lane="interactive")
+            except AdmissionRejected as rejection:
+                REQUESTS.inc(endpoint="/ws", status=str(rejection.status_code))
+                connection.send({"error": "Rate limit exceeded", "retry_after": rejection.retry_after,
+                                 "session_id": session_id})
+                continue
             
-            # Input guardrail check
-            passed, results = input_guardrails.check_all(user_message)
+            # Input guardrail check (long inputs are checked in the CPU pool, off the event loop)
+            with GUARDRAIL_LATENCY.time(check="input"):
+                passed, results = await check_input_async(input_guardrails, str(user_message))
             if not passed:
-                await websocket.send_json({
+                GUARDRAIL_BLOCKS.inc(check="input")
+                REQUESTS.inc(endpoint="/ws", status="blocked")
+                connection.send({
                     "error": "Input blocked by guardrails",
                     "violations": [{"cause": r["cause"], "risk_level": r["risk_level"]} for r in results]
                 })
                 continue
             
-            # Process with agent
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(None, run_agent, user_message, session_id)
-            
-            # Send response
-            await websocket.send_json({
-                "response": response,
-                "session_id": session_id
-            })
+            # Process with agent without blocking further receives
+            task = asyncio.create_task(process(str(user_message)))
+            pending_turns.add(task)
+            task.add_done_callback(pending_turns.discard)
     
     except WebSocketDisconnect:
+        close_reason = "client disconnected"
         print(f"Client disconnected: {session_id}")
-
-# Health check endpoint
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+    finally:
+        await connection.close(1000, close_reason)
 
 # Clear session endpoint
 @app.delete("/session/{session_id}")
@@ -270,13 +396,33 @@ async def clear_session(session_id: str):
     else:
         return {"message": f"No history found for session {session_id}"}
 
-# List sessions endpoint (if your get_session_history supports it)
+# List sessions endpoint: keyset pagination, pass next_after back as ?after= for the next page
 @app.get("/sessions")
-async def list_sessions():
-    # You may need to modify get_session_history to return session list
-    return {"sessions": ["Add your session listing logic here"]}
+async def list_sessions(after: str = None, limit: int = Query(50, ge=1, le=1000)):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, list_sessions_page, after, limit)
+
+# Export endpoint: streams one session's (or every session's) messages as NDJSON or Parquet
+@app.get("/sessions/export")
+async def export_sessions(session_id: str = None, format: str = Query("ndjson", pattern="^(ndjson|parquet)$")):
+    name = session_id or "all_sessions"
+    if format == "ndjson":
+        # Starlette iterates the sync generator in a thread pool, one cursor batch at a time
+        return StreamingResponse(iter_ndjson(export_messages(session_id)), media_type="application/x-ndjson",
+                                 headers={"Content-Disposition": f'attachment; filename="{name}.ndjson"'})
+    # Parquet needs its footer written last, so row groups are spooled to a temporary file first
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed on the server")
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, write_parquet, export_messages(session_id), path)
+    return FileResponse(path, media_type="application/vnd.apache.parquet", filename=f"{name}.parquet",
+                        background=BackgroundTask(os.remove, path))
 
 if __name__ == "__main__":
     print("API is running on http://localhost:8000")# Import your existing agent code
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, **server_options())
     
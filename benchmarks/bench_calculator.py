@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator import CalculationError, compile_expression, evaluate
+
+# Compares the AST-compiled calculator with the previous eval() path used by toolkit.calculate
+# Usage: python benchmarks/bench_calculator.py [iterations]
+
+EXPRESSIONS = [
+    "17*23.5",
+    "(1250 * 0.15) + 42 / 7",
+    "2**32 - 1",
+    "sqrt(144) + sin(pi / 2)",
+    "(3.5 + 4.25) * (19 - 7) / 3",
+    "1e6 / 365.25 / 24",
+]
+
+# Inputs that used to hang or exhaust memory with eval(); only run through the safe engine
+HOSTILE_EXPRESSIONS = [
+    "9**9**9",
+    "10**10**10",
+    "factorial(10**6)",
+    "[1]*10**9",
+    "(1).__class__.__mro__",
+    "__import__('os').system('true')",
+]
+
+
+def time_calls(fn, expressions, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for expression in expressions:
+            fn(expression)
+    elapsed = time.perf_counter() - start
+    return elapsed / (iterations * len(expressions)) * 1e6
+
+
+def run_benchmark(iterations: int = 20000):
+    eval_us = time_calls(lambda e: eval(e, {"__builtins__": {}}, {}), EXPRESSIONS[:3] + EXPRESSIONS[4:], iterations)
+
+    compile_expression.cache_clear()
+    cold_us = time_calls(lambda e: (compile_expression.cache_clear(), evaluate(e)), EXPRESSIONS, max(iterations // 10, 1))
+    warm_us = time_calls(evaluate, EXPRESSIONS, iterations)
+
+    print("\nCalculator benchmark")
+    print("=" * 70)
+    print(f"  eval() (no math functions)     : {eval_us:8.2f} us/expression")
+    print(f"  safe engine, cold (parse+run)  : {cold_us:8.2f} us/expression")
+    print(f"  safe engine, cached compile    : {warm_us:8.2f} us/expression")
+    print(f"  compile cache                  : {compile_expression.cache_info()}")
+
+    print("\nHostile inputs (safe engine only)")
+    print("=" * 70)
+    for expression in HOSTILE_EXPRESSIONS:
+        start = time.perf_counter()
+        try:
+            outcome = f"result {evaluate(expression)!r}"[:40]
+        except CalculationError as e:
+            outcome = f"rejected: {e}"
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"  {expression:35} {elapsed_ms:7.3f} ms  {outcome}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+# Per-turn cost of turn checkpointing (see checkpoints.py). Runs the same turns against a zero-latency
+# stub LLM with checkpointing off and with each CHECKPOINT_DURABILITY mode, on the SQLite history
+# backend, and reports turn latency and the difference to running without checkpoints. Knowledge-base
+# turns run three nodes (agent, tools, agent), plain turns one.
+# Usage: python benchmarks/bench_checkpoint_overhead.py --turns 200
+
+KB_QUESTION = "What does the maintenance manual say about replacing the pump seal?"
+PLAIN_QUESTION = "Hello there, how are you today?"
+MODES = ["off", "exit", "async", "sync"]
+
+
+def child(turns: int):
+    sys.path.insert(0, REPO_ROOT)
+    sys.path.insert(0, BENCH_DIR)
+    from stub_llm import start_stub_server
+    from synthetic_corpus import build_synthetic_index
+
+    build_synthetic_index(os.environ["FAISS_INDEX_PATH"], 200)
+    _, _, stub_url = start_stub_server(latency=0.0, tokens_per_second=1e6)
+    os.environ["VLLM_BASE_URL"] = stub_url
+    import main
+
+    timings = {"kb": [], "plain": []}
+    for i in range(turns + 5):
+        for kind, question in (("kb", KB_QUESTION), ("plain", PLAIN_QUESTION)):
+            start = time.perf_counter()
+            main.run_turn(question, f"overhead_{kind}_{i}")
+            if i >= 5:  # warm-up: model client, FAISS index, first checkpoint table access
+                timings[kind].append(time.perf_counter() - start)
+    print("RESULT " + json.dumps(timings))
+
+
+def run_mode(mode: str, turns: int, workdir: str) -> dict:
+    env = {
+        **os.environ,
+        "CHECKPOINT_ENABLED": "0" if mode == "off" else "1",
+        "CHECKPOINT_DURABILITY": "exit" if mode == "off" else mode,
+        "LLM_BACKEND": "vllm",
+        "VLLM_MODEL": "stub",
+        "LLM_FALLBACK_BACKENDS": "",
+        "CHAT_HISTORY_BACKEND": "sqlite",
+        "SQLITE_DB_PATH": os.path.join(workdir, f"history_{mode}.db"),
+        "FAISS_INDEX_PATH": os.path.join(workdir, f"faiss_index_{mode}"),
+        "EMBEDDING_BACKEND": "fake",
+        "FAST_ROUTER_ENABLED": "0",
+        "PHOENIX_MONITORING": "0",
+    }
+    output = subprocess.run([sys.executable, __file__, "--child", str(turns)], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, timeout=1800)
+    for line in output.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise SystemExit(f"Child run failed:\n{output.stdout[-2000:]}\n{output.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn latency with and without checkpointing")
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="checkpoint_overhead_")
+    results = {mode: run_mode(mode, args.turns, workdir) for mode in MODES}
+    print(f"{args.turns} turns per kind, SQLite history, stub LLM without latency; milliseconds per turn")
+    print(f"{'mode':>6} {'kb mean':>9} {'kb p50':>8} {'kb +':>7} {'plain mean':>11} {'plain p50':>10} {'plain +':>8}")
+    base = {kind: statistics.mean(results["off"][kind]) for kind in ("kb", "plain")}
+    for mode in MODES:
+        kb, plain = results[mode]["kb"], results[mode]["plain"]
+        print(f"{mode:>6} {statistics.mean(kb) * 1000:>9.2f} {statistics.median(kb) * 1000:>8.2f} "
+              f"{(statistics.mean(kb) - base['kb']) * 1000:>+7.2f} {statistics.mean(plain) * 1000:>11.2f} "
+              f"{statistics.median(plain) * 1000:>10.2f} {(statistics.mean(plain) - base['plain']) * 1000:>+8.2f}")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child(int(sys.argv[sys.argv.index("--child") + 1]))
+    else:
+        main()
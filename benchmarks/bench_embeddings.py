@@ -0,0 +1,87 @@
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import percentile
+from synthetic_corpus import synthetic_chunks
+
+# PyTorch (EMBEDDING_BACKEND=huggingface) versus ONNX Runtime fp32 and int8 embeddings:
+#   accuracy   - cosine similarity between each ONNX vector and the PyTorch vector for the same text,
+#                and recall@k of ONNX retrieval against the PyTorch top-k on the same corpus
+#   throughput - chunks/s for batch embedding (ingestion) and p50/p95 single-query latency
+# Usage: python benchmarks/bench_embeddings.py --docs 2000 --queries 200 --quantization auto
+
+
+def load_queries(count: int):
+    # Short question-like queries built from the synthetic vocabulary (same generator, different seed)
+    return [" ".join(text.split()[:8]) + "?" for text, _ in synthetic_chunks(count, chunk_chars=80, seed=11)]
+
+
+def measure(name: str, model, corpus, queries):
+    import numpy as np
+
+    model.embed_query("warm up")
+    start = time.perf_counter()
+    doc_vectors = np.asarray(model.embed_documents(corpus), dtype="float32")
+    batch_seconds = time.perf_counter() - start
+
+    latencies, query_vectors = [], []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(model.embed_query(query))
+        latencies.append(time.perf_counter() - start)
+    return {
+        "name": name, "docs": doc_vectors, "queries": np.asarray(query_vectors, dtype="float32"),
+        "chunks_per_s": len(corpus) / batch_seconds,
+        "query_p50_ms": percentile(latencies, 50) * 1000, "query_p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def agreement(reference, candidate, k: int):
+    import numpy as np
+
+    # Vectors are normalized, so the row-wise dot product is the cosine similarity
+    cosine = np.sum(reference["docs"] * candidate["docs"], axis=1)
+    ref_top = np.argsort(-reference["queries"] @ reference["docs"].T, axis=1)[:, :k]
+    cand_top = np.argsort(-candidate["queries"] @ candidate["docs"].T, axis=1)[:, :k]
+    recall = np.mean([len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)])
+    return {"cosine_mean": float(cosine.mean()), "cosine_min": float(cosine.min()), "recall_at_k": float(recall)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTorch vs ONNX Runtime embedding accuracy and throughput")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--quantization", default="auto", help="int8 config for the quantized run (auto, avx2, avx512, avx512_vnni, arm64)")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = all cores)")
+    args = parser.parse_args()
+
+    import embeddings
+    corpus = [text for text, _ in synthetic_chunks(args.docs)]
+    queries = load_queries(args.queries)
+
+    runs = [measure("pytorch", embeddings.build_embeddings("huggingface"), corpus, queries)]
+    for quantization in ("none", args.quantization):
+        model = embeddings.load_onnx_embeddings(quantization=quantization, threads=args.threads)
+        label = "onnx fp32" if quantization == "none" else f"onnx int8 ({embeddings.onnx_file_name(quantization)})"
+        runs.append(measure(label, model, corpus, queries))
+
+    reference = runs[0]
+    print(f"\n{args.docs} chunks, {args.queries} queries, recall@{args.k} against the PyTorch top-{args.k}")
+    print(f"{'backend':>44} {'chunks/s':>9} {'speedup':>8} {'q p50 ms':>9} {'q p95 ms':>9} {'cos mean':>9} {'cos min':>8} {'recall':>7}")
+    print("=" * 112)
+    for run in runs:
+        scores = agreement(reference, run, args.k)
+        print(f"{run['name']:>44} {run['chunks_per_s']:>9.1f} {run['chunks_per_s'] / reference['chunks_per_s']:>7.2f}x "
+              f"{run['query_p50_ms']:>9.2f} {run['query_p95_ms']:>9.2f} {scores['cosine_mean']:>9.4f} "
+              f"{scores['cosine_min']:>8.4f} {scores['recall_at_k']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
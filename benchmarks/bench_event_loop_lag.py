@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from prompt_guardrail import InputGuardrails
+
+# Event-loop latency while large inputs go through the input guardrails, checked on the loop (what
+# app.py used to do) versus in the CPU process pool (cpu_pool.check_input_async). A probe coroutine
+# sleeps 1 ms at a time and records how late it wakes up; a flat probe means other WebSocket
+# connections keep being served while the checks run.
+# Usage: python benchmarks/bench_event_loop_lag.py --inputs 200 --chars 5000 --concurrency 16
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def make_inputs(count: int, chars: int, seed: int = 3):
+    # Words without PII, injection or long runs, so every check scans the whole input
+    rng = random.Random(seed)
+    inputs = []
+    for _ in range(count):
+        words, size = [], 0
+        while size < chars - 12:
+            word = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+            words.append(word)
+            size += len(word) + 1
+        inputs.append(" ".join(words))
+    return inputs
+
+
+async def probe(lags, stop: asyncio.Event, interval: float = 0.001):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(loop.time() - start - interval, 0.0))
+
+
+async def run(mode: str, inputs, concurrency: int):
+    from cpu_pool import check_input_async
+
+    guardrails = InputGuardrails()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(text):
+        async with semaphore:
+            if mode == "inline":
+                guardrails.check_all(text)
+                await asyncio.sleep(0)  # yield between checks, as the request handlers do
+            else:
+                await check_input_async(guardrails, text)
+
+    lags, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(0.05)
+    idle = len(lags)
+    start = time.perf_counter()
+    await asyncio.gather(*(check(text) for text in inputs))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    return len(inputs) / elapsed, lags[idle:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop lag during input guardrail checks")
+    parser.add_argument("--inputs", type=int, default=200)
+    parser.add_argument("--chars", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None, help="CPU pool processes (default CPU_POOL_WORKERS)")
+    args = parser.parse_args()
+    if args.workers is not None:
+        os.environ["CPU_POOL_WORKERS"] = str(args.workers)
+    import cpu_pool
+
+    inputs = make_inputs(args.inputs, args.chars)
+    print(f"{args.inputs} inputs of {args.chars} chars, {args.concurrency} concurrent, "
+          f"{cpu_pool.CPU_POOL_WORKERS} pool processes")
+    print(f"{'mode':>8} {'checks/s':>9} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    print("=" * 55)
+
+    async def bench():
+        cpu_pool.get_cpu_pool().submit(cpu_pool._noop).result()  # fork the workers outside the measurement
+        for mode in ("inline", "pool"):
+            rate, lags = await run(mode, inputs, args.concurrency)
+            print(f"{mode:>8} {rate:>9.1f} {percentile(lags, 0.5) * 1000:>11.2f} "
+                  f"{percentile(lags, 0.99) * 1000:>11.2f} {max(lags, default=0) * 1000:>11.2f}")
+        cpu_pool.shutdown_executors()
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()
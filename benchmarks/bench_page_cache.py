@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_cache import format_stats, load_pdf_pages
+
+# Cold versus warm PDF page extraction through page_cache.py, followed by a chunk-size sweep that
+# re-splits the cached pages (the experiment that used to force a full re-parse per setting).
+# Usage: python benchmarks/bench_page_cache.py <pdf_directory> [--chunk-sizes 500,1000,2000]
+
+
+def load_all(paths, cache_dir):
+    stats, start = {}, time.perf_counter()
+    documents = [doc for path in paths for doc in load_pdf_pages(str(path), cache_dir=cache_dir, stats=stats)]
+    return documents, time.perf_counter() - start, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF page cache: cold vs warm extraction")
+    parser.add_argument("directory")
+    parser.add_argument("--glob", default="**/*.pdf")
+    parser.add_argument("--chunk-sizes", default="500,1000,2000")
+    args = parser.parse_args()
+
+    paths = sorted(p for p in Path(args.directory).glob(args.glob) if p.is_file())
+    if not paths:
+        print(f"No PDFs matching {args.glob} in {args.directory}")
+        sys.exit(1)
+    cache_dir = tempfile.mkdtemp(prefix="page_cache_")
+
+    _, cold_seconds, cold_stats = load_all(paths, cache_dir)
+    documents, warm_seconds, warm_stats = load_all(paths, cache_dir)
+    cache_bytes = sum(f.stat().st_size for f in Path(cache_dir).rglob("*.gz"))
+    source_bytes = sum(p.stat().st_size for p in paths)
+
+    print(f"\n{len(paths)} PDFs, {len(documents)} pages, {source_bytes / 1e6:.1f} MB of PDF, {cache_bytes / 1e6:.2f} MB cached")
+    print(f"  cold: {cold_seconds:8.2f}s  {format_stats(cold_stats)}")
+    print(f"  warm: {warm_seconds:8.2f}s  {format_stats(warm_stats)}  ({cold_seconds / max(warm_seconds, 1e-9):.0f}x faster)")
+
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    print("\nRe-chunking from the warm cache:")
+    for size in (int(s) for s in args.chunk_sizes.split(",")):
+        start = time.perf_counter()
+        pages, _, _ = load_all(paths, cache_dir)
+        chunks = RecursiveCharacterTextSplitter(chunk_size=size, chunk_overlap=size // 5).split_documents(pages)
+        print(f"  chunk_size={size:>5}: {len(chunks):>7} chunks in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
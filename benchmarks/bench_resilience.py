@@ -0,0 +1,98 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stub_llm import start_stub_server
+
+# Timeouts, retries, circuit breaker and fallback (resilience.py) against two local stub LLMs:
+# an Azure-style primary whose latency and error rate change per phase, and a healthy vLLM-style
+# fallback. Each phase reports latency percentiles, failures and which backend answered. First checks
+# that a hanging primary leaves the fallback enough of the deadline to answer (the defaults' ratios:
+# deadline = 3 x per-request timeout, 2 retries); exit code 1 if it does not.
+# Usage: python benchmarks/bench_resilience.py --calls 40 --timeout 1
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM resilience under injected latency and errors")
+    parser.add_argument("--calls", type=int, default=40, help="calls per phase")
+    parser.add_argument("--timeout", type=float, default=1.0, help="per-request LLM timeout (seconds)")
+    parser.add_argument("--reset", type=float, default=3.0, help="circuit breaker reset (seconds)")
+    parser.add_argument("--deadline", type=float, default=None, help="deadline per call (default 3x --timeout)")
+    args = parser.parse_args()
+    deadline = args.deadline or 3 * args.timeout
+
+    _, primary, primary_url = start_stub_server(latency=0.05, tokens_per_second=2000)
+    _, fallback, fallback_url = start_stub_server(latency=0.05, tokens_per_second=2000)
+    os.environ.update({
+        "LLM_BACKEND": "azure",
+        "LLM_FALLBACK_BACKENDS": "vllm",
+        "LLM_TIMEOUT_SECONDS": str(args.timeout),
+        "AZURE_OPENAI_ENDPOINT": primary_url[: -len("/v1")],
+        "AZURE_OPENAI_API_KEY": "stub",
+        "AZURE_OPENAI_DEPLOYMENT": "stub",
+        "AZURE_OPENAI_API_VERSION": "2024-06-01",
+        "VLLM_BASE_URL": fallback_url,
+        "RESILIENCE_BACKOFF_SECONDS": "0.05",
+        "RESILIENCE_DEADLINE_SECONDS": str(deadline),
+        "RESILIENCE_RESET_SECONDS": str(args.reset),
+    })
+    from llm_backends import get_resilient_llm
+    from resilience import BackendUnavailable, breaker_states
+
+    llm = get_resilient_llm()
+
+    # A hanging primary must not use up the deadline before the fallback is tried
+    primary.extra_latency = args.timeout * 10
+    start = time.perf_counter()
+    try:
+        answer = llm.invoke("hanging primary check").content
+    except BackendUnavailable as e:
+        answer = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    answered = fallback.requests == 1 and not answer.startswith("BackendUnavailable")
+    print(f"Hanging primary: {'answered by the fallback' if answered else answer[:80]} in {elapsed:.2f}s "
+          f"(deadline {deadline:.2f}s)")
+    if not answered or elapsed > deadline:
+        print("FAIL: the fallback did not answer within the deadline")
+        sys.exit(1)
+    primary.extra_latency = 0.0
+    phases = [
+        ("healthy", 0.0, 0.0),
+        ("primary 50% errors", 0.5, 0.0),
+        ("primary down (100% errors)", 1.0, 0.0),
+        ("primary hanging", 0.0, args.timeout * 3),
+        ("primary recovered", 0.0, 0.0),
+    ]
+    print(f"{'phase':>28} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'failed':>7} {'primary':>8} {'fallback':>9}  breaker")
+    print("=" * 100)
+    for name, error_rate, extra_latency in phases:
+        if name == "primary recovered":
+            time.sleep(args.reset)  # let the open breaker reach its half-open trial
+        primary.error_rate, primary.extra_latency = error_rate, extra_latency
+        primary_before, fallback_before = primary.requests, fallback.requests
+        latencies, failed = [], 0
+        for i in range(args.calls):
+            start = time.perf_counter()
+            try:
+                llm.invoke(f"phase {name} call {i}")
+            except BackendUnavailable:
+                failed += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+        print(f"{name:>28} {statistics.median(latencies):>8.0f} {percentile(latencies, 0.95):>8.0f} {max(latencies):>8.0f} "
+              f"{failed:>7} {primary.requests - primary_before:>8} {fallback.requests - fallback_before:>9}  "
+              f"{breaker_states().get('llm:azure')}")
+
+
+if __name__ == "__main__":
+    main()
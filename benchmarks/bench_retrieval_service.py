@@ -0,0 +1,121 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_embeddings import load_queries
+
+# Throughput of knowledge-base search at 1, 8 and 64 concurrent clients: each client embedding and
+# searching on its own (what every API worker does today) versus the micro-batched retrieval service
+# (retrieval_service.py, started as a separate process on a synthetic index).
+# Usage: python benchmarks/bench_retrieval_service.py --docs 5000 --concurrency 1,8,64 [--transport unix]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def drive(search, queries, concurrency: int, k: int):
+    "Run all queries through search(query, k) from `concurrency` threads; returns (qps, latencies)."
+    latencies, lock, position = [], threading.Lock(), [0]
+
+    def client():
+        while True:
+            with lock:
+                if position[0] >= len(queries):
+                    return
+                query = queries[position[0]]
+                position[0] += 1
+            start = time.perf_counter()
+            search(query, k)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(queries) / (time.perf_counter() - start), latencies
+
+
+def wait_for_service(client, process, timeout: float = 600):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("Retrieval service exited during start-up")
+        try:
+            return client.health()
+        except OSError:
+            time.sleep(0.5)
+    raise SystemExit("Retrieval service did not start in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Direct search vs micro-batched retrieval service")
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--concurrency", default="1,8,64")
+    parser.add_argument("--transport", choices=["http", "unix"], default="unix")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="retrieval_bench_")
+    index_path = os.path.join(workdir, "faiss_index")
+    os.environ["FAISS_INDEX_PATH"] = index_path
+    os.environ.pop("RETRIEVAL_SERVICE_URL", None)
+    from synthetic_corpus import build_synthetic_index
+    from retrieval_service import RemoteVectorStore
+
+    print(f"Building synthetic corpus ({args.docs} chunks) in {workdir}")
+    vector_store = build_synthetic_index(index_path, args.docs)
+    queries = load_queries(args.queries)
+
+    command = [sys.executable, os.path.join(REPO_DIR, "retrieval_service.py"), "--window-ms", str(args.window_ms)]
+    if args.transport == "unix":
+        socket_path = os.path.join(workdir, "retrieval.sock")
+        command += ["--socket", socket_path]
+        url = f"unix://{socket_path}"
+    else:
+        command += ["--port", "8041"]
+        url = "http://127.0.0.1:8041"
+    process = subprocess.Popen(command, cwd=REPO_DIR)
+    try:
+        client = RemoteVectorStore(url)
+        wait_for_service(client, process)
+        vector_store.similarity_search_with_score(queries[0], k=args.k)  # warm up the in-process model
+
+        print(f"\n{len(queries)} queries, k={args.k}, {args.docs} vectors, service over {args.transport}")
+        print(f"{'clients':>8} {'mode':>8} {'qps':>9} {'p50 ms':>9} {'p95 ms':>9} {'mean batch':>11}")
+        print("=" * 60)
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            qps, latencies = drive(lambda q, k: vector_store.similarity_search_with_score(q, k=k), queries, concurrency, args.k)
+            print(f"{concurrency:>8} {'direct':>8} {qps:>9.1f} {percentile(latencies, 0.5) * 1000:>9.1f} "
+                  f"{percentile(latencies, 0.95) * 1000:>9.1f} {'-':>11}")
+            before = client.health()
+            qps, latencies = drive(client.similarity_search_with_score, queries, concurrency, args.k)
+            after = client.health()
+            mean_batch = (after["queries"] - before["queries"]) / max(after["batches"] - before["batches"], 1)
+            print(f"{concurrency:>8} {'service':>8} {qps:>9.1f} {percentile(latencies, 0.5) * 1000:>9.1f} "
+                  f"{percentile(latencies, 0.95) * 1000:>9.1f} {mean_batch:>11.1f}")
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import percentile
+
+# Concurrent chat turns against the SQLite history backend, comparing the previous setup (an engine
+# per call, default rollback journal, user and AI messages written separately) with the tuned one
+# in memory.py (WAL, pooled engine, busy_timeout, one batched write per turn).
+# SQLite does not expose lock waits directly; time spent in writes and "database is locked"
+# failures are reported instead, since writers mostly wait on the database lock.
+# Usage: python benchmarks/bench_sqlite_history.py --threads 1,8,32 --turns 50
+
+
+def legacy_history(path: str):
+    from langchain_community.chat_message_histories import SQLChatMessageHistory
+    SQLChatMessageHistory(session_id="", connection=f"sqlite:///{path}")  # create the table up front
+    return lambda session_id: SQLChatMessageHistory(session_id=session_id, connection=f"sqlite:///{path}")
+
+
+def run(mode: str, history_factory, threads: int, turns: int, history_turns: int):
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    read_times, write_times, errors = [], [], {}
+    lock = threading.Lock()
+
+    for worker_id in range(threads):
+        history_factory(f"{mode}_{threads}_{worker_id}").add_messages(
+            [HumanMessage(content=f"seed {i}") for i in range(history_turns)])
+
+    def worker(worker_id: int):
+        session_id = f"{mode}_{threads}_{worker_id}"
+        for turn in range(turns):
+            try:
+                start = time.perf_counter()
+                history = history_factory(session_id)
+                _ = history.messages
+                loaded = time.perf_counter()
+                user, reply = f"question {turn}", f"answer {turn} " + "x" * 400
+                if mode == "legacy":
+                    history.add_user_message(user)
+                    history.add_ai_message(reply)
+                else:
+                    history.add_messages([HumanMessage(content=user), AIMessage(content=reply)])
+                saved = time.perf_counter()
+                with lock:
+                    read_times.append(loaded - start)
+                    write_times.append(saved - loaded)
+            except Exception as e:
+                key = "database is locked" if "locked" in str(e) else type(e).__name__
+                with lock:
+                    errors[key] = errors.get(key, 0) + 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode, "threads": threads, "turns_per_s": len(write_times) / elapsed,
+        "read_p95_ms": percentile(read_times, 95) * 1000,
+        "write_p50_ms": percentile(write_times, 50) * 1000,
+        "write_p95_ms": percentile(write_times, 95) * 1000,
+        "write_total_s": sum(write_times), "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite history backend under concurrent turns")
+    parser.add_argument("--threads", default="1,8,32", help="comma separated thread counts")
+    parser.add_argument("--turns", type=int, default=50, help="turns per thread")
+    parser.add_argument("--history", type=int, default=20, help="messages already in each session")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="agent_sqlite_")
+    os.environ["SQLITE_DB_PATH"] = os.path.join(workdir, "tuned.db")
+    import memory
+    legacy = legacy_history(os.path.join(workdir, "legacy.db"))
+
+    results = []
+    for threads in (int(t) for t in args.threads.split(",")):
+        results.append(run("legacy", legacy, threads, args.turns, args.history))
+        results.append(run("tuned", memory.get_session_history, threads, args.turns, args.history))
+
+    print(f"\n{'mode':>7} {'threads':>7} {'turns/s':>9} {'read p95':>9} {'write p50':>10} {'write p95':>10} {'write s':>8}  errors")
+    print("=" * 84)
+    for r in results:
+        print(f"{r['mode']:>7} {r['threads']:>7} {r['turns_per_s']:>9.1f} {r['read_p95_ms']:>9.2f} {r['write_p50_ms']:>10.2f} "
+              f"{r['write_p95_ms']:>10.2f} {r['write_total_s']:>8.2f}  {r['errors'] or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_embeddings import load_queries
+from synthetic_corpus import synthetic_chunks
+
+# Memory saved versus recall lost for the FAISS storage modes in vector_storage.py.
+# Recall@k is measured against the exact float32 top-k for the same queries. Use the real model
+# (the default); with EMBEDDING_BACKEND=fake the vectors are random and PCA has nothing to learn.
+# Usage: python benchmarks/bench_vector_storage.py --docs 20000 --pca-dims 128,256,384
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS float16 / PCA storage: memory vs recall")
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--pca-dims", default="128,256,384")
+    parser.add_argument("--embedding-backend", default="huggingface")
+    args = parser.parse_args()
+
+    import numpy as np
+    from embeddings import build_embeddings
+    from vector_storage import build_index, index_memory_bytes
+
+    model = build_embeddings(args.embedding_backend)
+    print(f"Embedding {args.docs} chunks with {args.embedding_backend}...")
+    vectors = np.asarray(model.embed_documents([text for text, _ in synthetic_chunks(args.docs)]), dtype="float32")
+    queries = np.asarray(model.embed_documents(load_queries(args.queries)), dtype="float32")
+
+    configs = [("float32", None), ("float16", None)]
+    for dim in (int(d) for d in args.pca_dims.split(",")):
+        configs += [("pca", dim), ("pca+float16", dim)]
+
+    results, exact_top = [], None
+    for storage, dim in configs:
+        index = build_index(storage, vectors.shape[1], vectors, dim or 0)
+        index.add(vectors)
+        start = time.perf_counter()
+        _, top = index.search(queries, args.k)
+        search_ms = (time.perf_counter() - start) / len(queries) * 1000
+        if exact_top is None:
+            exact_top = top
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(exact_top, top)])
+        results.append((f"{storage}" + (f" ({dim}d)" if dim else ""), index_memory_bytes(index), recall, search_ms))
+
+    baseline_bytes = results[0][1]
+    print(f"\n{args.docs} vectors, {args.queries} queries, recall@{args.k} against exact float32 search")
+    print(f"{'storage':>20} {'MB':>9} {'B/vector':>9} {'saved':>7} {'recall':>7} {'ms/query':>9}")
+    print("=" * 66)
+    for name, nbytes, recall, search_ms in results:
+        print(f"{name:>20} {nbytes / 1e6:>9.2f} {nbytes / args.docs:>9.0f} {1 - nbytes / baseline_bytes:>6.0%} "
+              f"{recall:>7.3f} {search_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import run_level, wait_until_ready
+from stub_llm import start_stub_server
+
+# Compares the production launcher with components preloaded before fork (shared copy-on-write)
+# against N workers that each load their own embedding model and FAISS index.
+# Reports aggregate RSS and PSS (proportional set size, which splits shared pages between the
+# processes sharing them) plus throughput at a fixed concurrency.
+# Usage: python benchmarks/bench_workers.py --workers 4 --embedding-backend huggingface
+
+
+def process_tree(pid: int):
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            pass
+    return pids
+
+
+def memory_of(pids):
+    # Sum Rss and Pss (kB) from smaps_rollup
+    totals = {"Rss": 0, "Pss": 0}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    key = line.split(":")[0]
+                    if key in totals:
+                        totals[key] += int(line.split()[1])
+        except FileNotFoundError:
+            pass
+    return {key: round(value / 1024, 1) for key, value in totals.items()}
+
+
+def run_mode(preload: bool, args, stub_url: str, workdir: str):
+    port = args.port + (0 if preload else 1)
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "vllm", "VLLM_BASE_URL": stub_url, "VLLM_MODEL": "stub",
+        "CHAT_HISTORY_BACKEND": "sqlite", "SQLITE_DB_PATH": os.path.join(workdir, f"history_{port}.db"),
+        "FAISS_INDEX_PATH": os.path.join(workdir, "faiss_index"),
+        "EMBEDDING_BACKEND": args.embedding_backend, "PHOENIX_MONITORING": "0", "SESSION_RATE_LIMIT_PER_MIN": "0",
+    }
+    command = [sys.executable, "launch.py", "--production", "--workers", str(args.workers),
+               "--host", "127.0.0.1", "--port", str(port)]
+    if not preload:
+        command.append("--no-preload")
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready(base_url, timeout=300):
+            raise RuntimeError("launcher did not become ready")
+        # Every worker warms up independently; give the slowest one time to finish
+        time.sleep(args.settle)
+        memory = memory_of(process_tree(process.pid))
+        load = asyncio.run(run_level(base_url, "rest", args.concurrency, args.requests))
+        memory_after = memory_of(process_tree(process.pid))
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+    return {"preload": preload, "memory_mb": memory, "memory_after_load_mb": memory_after,
+            "requests_per_s": load["requests_per_s"], "p95_ms": load["p95_ms"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preloaded pre-fork workers vs independent workers")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--settle", type=float, default=5.0)
+    parser.add_argument("--embedding-backend", default="huggingface")
+    args = parser.parse_args()
+
+    os.environ["EMBEDDING_BACKEND"] = args.embedding_backend
+    workdir = tempfile.mkdtemp(prefix="agent_workers_")
+    from synthetic_corpus import build_synthetic_index
+    build_synthetic_index(os.path.join(workdir, "faiss_index"), args.docs)
+    stub, _, stub_url = start_stub_server(latency=0.05)
+
+    try:
+        results = [run_mode(True, args, stub_url, workdir), run_mode(False, args, stub_url, workdir)]
+    finally:
+        stub.shutdown()
+
+    print(f"\n{args.workers} workers, {args.docs} chunks, embedding backend {args.embedding_backend}")
+    print(f"{'mode':>12} {'RSS MB':>10} {'PSS MB':>10} {'PSS after':>10} {'req/s':>8} {'p95 ms':>8}")
+    print("=" * 64)
+    for r in results:
+        mode = "preload+fork" if r["preload"] else "independent"
+        print(f"{mode:>12} {r['memory_mb']['Rss']:>10.1f} {r['memory_mb']['Pss']:>10.1f} "
+              f"{r['memory_after_load_mb']['Pss']:>10.1f} {r['requests_per_s']:>8.2f} {r['p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
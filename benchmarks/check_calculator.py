@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from calculator import MAX_INTEGER_BITS, CalculationError, evaluate
+
+# Behaviour check for the calculator's integer size limit (see calculator.py): powers, products and
+# prod() whose result fits in MAX_INTEGER_BITS are computed, including those right at the limit; those
+# whose result is larger are rejected before the result is computed, and hostile inputs are rejected
+# within milliseconds.
+# Usage: python benchmarks/check_calculator.py   (exit code 1 on failure)
+
+WITHIN_LIMIT = {
+    "2**9999": 2**9999,
+    "3**6000": 3**6000,
+    "(-3)**6309": -3**6309,
+    "7**3500": 7**3500,
+    "1000**1003": 1000**1003,
+    "2**5000 * 2**4999": 2**9999,
+    "prod([2**5000, 2**4999])": 2**9999,
+    "prod([2**9000, 0, 2**9000])": 0,
+    "(-1)**9999": -1,
+}
+OVER_LIMIT = [
+    "2**10000",
+    "3**6310",
+    "(2**5000)**3",
+    "2**5000 * 2**5000",
+    "prod([2**5000, 2**5000])",
+    "prod(2**9000 + [0, 0, 0, 0, 0, 0, 0, 0])",
+    "9**9**9",
+    "factorial(10**6)",
+]
+
+
+def main():
+    failures = []
+
+    def expect(name, condition):
+        print(f"{'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    for expression, expected in WITHIN_LIMIT.items():
+        try:
+            result = evaluate(expression)
+        except CalculationError as e:
+            result = e
+        expect(f"{expression} is computed ({expected.bit_length()} bits)", result == expected)
+
+    for expression in OVER_LIMIT:
+        start = time.perf_counter()
+        try:
+            evaluate(expression)
+            rejected = False
+        except CalculationError:
+            rejected = True
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        expect(f"{expression} is rejected ({elapsed_ms:.2f} ms, limit {MAX_INTEGER_BITS} bits)",
+               rejected and elapsed_ms < 50)
+
+    print("PASS" if not failures else f"{len(failures)} failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+# Checks that a failed turn resumes from its checkpoint instead of recomputing (see checkpoints.py).
+# Against the stub LLM, a knowledge-base question makes the model call search_knowledge_base; the
+# stub then fails the next LLM call, so the turn fails after the tool ran. The same message is sent
+# again with the stub healthy. With checkpointing the retry must not run the tool or the first LLM
+# call again, and no checkpoints may be left once the reply is saved; without checkpointing (for
+# comparison) the retry repeats both. Also checks that prune_expired removes an abandoned turn, and
+# that a finished thread left behind (its cleanup failed) is run again rather than replayed, also when
+# discarding it fails.
+# Usage: python benchmarks/check_checkpoint_resume.py   (exit code 1 on failure)
+
+QUESTION = "What does the maintenance manual say about replacing the pump seal?"
+
+
+def child():
+    sys.path.insert(0, REPO_ROOT)
+    sys.path.insert(0, BENCH_DIR)
+    from stub_llm import start_stub_server
+    from synthetic_corpus import build_synthetic_index
+
+    build_synthetic_index(os.environ["FAISS_INDEX_PATH"], 200)
+    _, stub, stub_url = start_stub_server(latency=0.01, tokens_per_second=10000, fail_after_tool=True)
+    os.environ["VLLM_BASE_URL"] = stub_url
+    import main
+    from checkpoints import get_checkpointer, prune_expired, turn_thread_id
+    from metrics import TOOL_CALLS
+
+    def tool_runs():
+        return TOOL_CALLS.value(tool="search_knowledge_base", status="ok")
+
+    try:
+        main.run_turn(QUESTION, "resume_check")
+        first = "ok"
+    except Exception as e:
+        first = type(e).__name__
+    failed = {"tool_runs": tool_runs(), "llm_calls": stub.requests}
+    stub.fail_after_tool = False
+    reply = main.run_turn(QUESTION, "resume_check")["response"]
+    result = {"first_attempt": first, "after_failure": failed,
+              "retry": {"tool_runs": tool_runs() - failed["tool_runs"], "llm_calls": stub.requests - failed["llm_calls"]},
+              "reply": reply[:40]}
+
+    checkpointer = get_checkpointer(main.get_history_backend().create_checkpointer)
+    if checkpointer is not None:
+        result["threads_left"] = len({c.config["configurable"]["thread_id"] for c in checkpointer.list(None)})
+        stub.fail_after_tool = True
+        try:
+            main.run_turn(QUESTION, "abandoned_turn")
+        except Exception:
+            pass
+        result["pruned"] = prune_expired(checkpointer, main.get_history_backend().expired_checkpoint_threads, max_age=0)
+
+        # A finished thread for the next turn of this session, as if deleting it had failed
+        stub.fail_after_tool = False
+        history_length = len(main.get_session_history("stale_check").messages)
+        main.invoke_graph({"messages": [main.HumanMessage(content=QUESTION)], "started_at": time.time(),
+                           "tokens_used": 0, "tool_iterations": 0, "budget_exhausted": None},
+                          turn_thread_id("stale_check", history_length, QUESTION))
+        before = stub.requests
+        main.run_turn(QUESTION, "stale_check")
+        result["stale_llm_calls"] = stub.requests - before
+
+        # ... and deleting it fails again: the turn still answers, without checkpoints
+        history_length = len(main.get_session_history("stale_check").messages)
+        main.invoke_graph({"messages": [main.HumanMessage(content=QUESTION)], "started_at": time.time(),
+                           "tokens_used": 0, "tool_iterations": 0, "budget_exhausted": None},
+                          turn_thread_id("stale_check", history_length, QUESTION))
+
+        def failing_delete(thread_id):
+            raise RuntimeError("checkpoint database unavailable")
+        checkpointer.delete_thread = failing_delete
+        try:
+            result["stale_discard_failed"] = bool(main.run_turn(QUESTION, "stale_check")["response"])
+        except Exception as e:
+            result["stale_discard_failed"] = type(e).__name__
+        del checkpointer.delete_thread
+    print("RESULT " + json.dumps(result))
+
+
+def run_mode(enabled: bool, workdir: str) -> dict:
+    env = {
+        **os.environ,
+        "CHECKPOINT_ENABLED": "1" if enabled else "0",
+        "LLM_BACKEND": "vllm",
+        "VLLM_MODEL": "stub",
+        "LLM_FALLBACK_BACKENDS": "",
+        "RESILIENCE_MAX_RETRIES": "0",
+        "CHAT_HISTORY_BACKEND": "sqlite",
+        "SQLITE_DB_PATH": os.path.join(workdir, f"history_{int(enabled)}.db"),
+        "FAISS_INDEX_PATH": os.path.join(workdir, f"faiss_index_{int(enabled)}"),
+        "EMBEDDING_BACKEND": "fake",
+        "FAST_ROUTER_ENABLED": "0",
+        "PHOENIX_MONITORING": "0",
+    }
+    output = subprocess.run([sys.executable, __file__, "--child"], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, timeout=300)
+    for line in output.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise SystemExit(f"Child run failed:\n{output.stdout[-2000:]}\n{output.stderr[-2000:]}")
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="checkpoint_check_")
+    with_checkpoints, without = run_mode(True, workdir), run_mode(False, workdir)
+    print(f"{'':>16} {'1st attempt':>20} {'tool runs':>10} {'retry tool runs':>16} {'retry LLM calls':>16}")
+    for name, r in (("checkpointing", with_checkpoints), ("no checkpoints", without)):
+        print(f"{name:>16} {r['first_attempt']:>20} {r['after_failure']['tool_runs']:>10.0f} "
+              f"{r['retry']['tool_runs']:>16.0f} {r['retry']['llm_calls']:>16}")
+    print(f"Checkpoint threads left after the successful retry: {with_checkpoints['threads_left']}; "
+          f"abandoned threads pruned: {with_checkpoints['pruned']}; "
+          f"LLM calls for a turn with a finished thread left behind: {with_checkpoints['stale_llm_calls']}")
+
+    failures = []
+    if with_checkpoints["first_attempt"] == "ok" or with_checkpoints["after_failure"]["tool_runs"] != 1:
+        failures.append("the first attempt did not fail after running the tool")
+    if with_checkpoints["retry"]["tool_runs"] != 0:
+        failures.append("the tool ran again on retry")
+    if with_checkpoints["retry"]["llm_calls"] != 1:
+        failures.append("the retry repeated LLM calls that had completed")
+    if with_checkpoints["threads_left"] != 0:
+        failures.append("checkpoints were left after the turn completed")
+    if with_checkpoints["pruned"] != 1:
+        failures.append("the abandoned turn was not pruned")
+    if with_checkpoints["stale_llm_calls"] == 0:
+        failures.append("a finished thread's stored reply was replayed")
+    if with_checkpoints["stale_discard_failed"] is not True:
+        failures.append(f"a failed discard of a finished thread failed the turn ({with_checkpoints['stale_discard_failed']})")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("PASS" if not failures else "")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child()
+    else:
+        main()
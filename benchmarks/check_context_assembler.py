@@ -0,0 +1,116 @@
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import context_assembler
+from context_assembler import assemble_context, count_tokens, merge_chunks, select_sentences
+
+# Behaviour check for the knowledge-base context assembler (see context_assembler.py): merging of
+# overlapping and touching chunks by start_index and by suffix/prefix match, duplicates, chunks from
+# other pages and from other PDFs of the same directory, sentence scoring, the token-budget cut, a
+# budget smaller than one sentence and an empty retrieval.
+# Usage: python benchmarks/check_context_assembler.py   (exit code 1 on failure)
+
+# A page of distinct sentences, chunked like ingestion (1000 chars, 200 overlap)
+PAGE = " ".join(f"Step {i:03d} of the service procedure covers part {i * 7 % 100:02d} of the pump." for i in range(40))
+CHUNK_A, CHUNK_B = PAGE[:1000], PAGE[800:1800]
+SOURCE = {"source": "manual.pdf", "page": 3}
+# A second PDF in the same directory, with a page 3 of its own
+OTHER_PAGE = " ".join(f"Clause {i:03d} of the warranty excludes damage type {i * 3 % 50:02d}." for i in range(40))
+
+
+class CharacterEncoding:
+    "One token per character."
+
+    def encode(self, text, disallowed_special=()):
+        return list(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def result(text, start=None, **metadata):
+    metadata = {**SOURCE, **metadata}
+    if start is not None:
+        metadata["start_index"] = start
+    return {"content": text, "metadata": metadata, "score": 0.0}
+
+
+def main():
+    failures = []
+
+    def expect(name, condition):
+        print(f"{'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    # Merging
+    for label, with_start in (("start_index", True), ("suffix/prefix", False)):
+        a = result(CHUNK_A, 0 if with_start else None)
+        b = result(CHUNK_B, 800 if with_start else None)
+        forward, backward = merge_chunks([a, b]), merge_chunks([b, a])
+        expect(f"{label}: overlapping chunks merge into the page text",
+               len(forward) == 1 and forward[0]["text"] == PAGE[:1800])
+        expect(f"{label}: the same when the later chunk ranks first",
+               len(backward) == 1 and backward[0]["text"] == PAGE[:1800] and backward[0]["rank"] == 0)
+    touching = merge_chunks([result(PAGE[:900], 0), result(PAGE[900:1800], 900)])
+    expect("start_index: touching chunks merge", len(touching) == 1 and touching[0]["text"] == PAGE[:1800])
+    apart = merge_chunks([result(PAGE[:500], 0), result(PAGE[1000:1500], 1000)])
+    expect("start_index: chunks with a gap stay apart", len(apart) == 2)
+    unrelated = merge_chunks([result(PAGE[:500]), result(PAGE[1000:1500])])
+    expect("suffix/prefix: chunks without a shared edge stay apart", len(unrelated) == 2)
+    expect("duplicates and contained chunks are dropped",
+           len(merge_chunks([result(CHUNK_A, 0), result(CHUNK_A, 0), result(PAGE[100:400])])) == 1)
+    expect("chunks from another page are not merged",
+           len(merge_chunks([result(CHUNK_A, 0), result(CHUNK_B, 800, page=4)])) == 2)
+
+    # Several PDFs ingested from one directory share "source" (the directory) and page numbers
+    for label, extra in (("file metadata", True), ("source only (older index)", False)):
+        docs = {"source": "manuals"}
+        a = result(CHUNK_A, 0, **docs, **({"file": "manuals/pump.pdf"} if extra else {}))
+        b = result(OTHER_PAGE[800:1800], 800, **docs, **({"file": "manuals/warranty.pdf"} if extra else {}))
+        c = result(CHUNK_B, 800, **docs, **({"file": "manuals/pump.pdf"} if extra else {}))
+        passages = merge_chunks([a, b, c])
+        expect(f"{label}: same page of two PDFs is not spliced together",
+               sorted(p["text"] for p in passages) == sorted([PAGE[:1800], OTHER_PAGE[800:1800]]))
+
+    # Sentence scoring
+    sentences = [f"The pump housing has bolt pattern {i}." for i in range(8)]
+    sentences[2] = "The pump impeller must be inspected for wear."
+    sentences[6] = "Replace the impeller if the pump vanes are worn."
+    kept = select_sentences(" ".join(sentences), "pump impeller wear", max_sentences=2)
+    expect("sentences with the rare query term win, in original order", kept == [sentences[2], sentences[6]])
+    common = [f"The pump housing has bolt pattern {i}." for i in range(7)] + ["The impeller is cast iron."]
+    expect("one rare query term outweighs two common ones",
+           select_sentences(" ".join(common), "pump housing impeller", max_sentences=1) == [common[-1]])
+    expect("short passages are kept whole", select_sentences("One. Two.", "pump", max_sentences=6) == ["One.", "Two."])
+
+    # Token budget
+    query = "part 42 of the pump"
+    results = [result(CHUNK_A, 0), result(CHUNK_B, 800), result(PAGE[1800:2800], 1800, page=5)]
+    context, report = assemble_context(results, query, token_budget=60)
+    expect(f"context stays within the token budget ({report['tokens']} <= 60)", 0 < report["tokens"] <= 60)
+    expect("report counts the raw and saved tokens",
+           report["raw_tokens"] == count_tokens("\n\n".join(r["content"] for r in results))
+           and report["saved"] == report["raw_tokens"] - report["tokens"])
+    first_sentence = select_sentences(merge_chunks(results)[0]["text"], query)[0]
+    tiny, tiny_report = assemble_context(results, query, token_budget=3)
+    expect(f"a budget below one sentence returns a sentence truncated to it ({count_tokens(tiny)} <= 3 tokens)",
+           tiny != "" and first_sentence.startswith(tiny) and tiny_report["tokens"] <= 3)
+    # A tokenizer with far more tokens per character than the 4-characters estimate (tiktoken needs a download)
+    context_assembler._encoding = CharacterEncoding()
+    dense, dense_report = assemble_context(results, query, token_budget=5)
+    context_assembler._encoding = None
+    expect(f"truncation uses the budget's token counter ({dense_report['tokens']} <= 5 tokens: {dense!r})",
+           dense != "" and dense_report["tokens"] <= 5)
+    empty, empty_report = assemble_context([], query)
+    expect("an empty retrieval gives an empty context", empty == "" and empty_report == {"raw_tokens": 0, "tokens": 0, "saved": 0})
+
+    print("PASS" if not failures else f"{len(failures)} failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
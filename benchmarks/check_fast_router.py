@@ -0,0 +1,92 @@
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("EMBEDDING_BACKEND", "fake")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from fast_router import FAQIndex, route
+
+# Behaviour check for the pre-graph fast path (see fast_router.py): which inputs are answered by the
+# calculate tool, which must go to the graph (dates, phone numbers, expressions without a cue), and
+# that the FAQ matcher only embeds inputs that share words with a FAQ question.
+# Usage: python benchmarks/check_fast_router.py   (exit code 1 on failure)
+
+CALCULATE = {
+    "what is 17*23.5": "Result: 399.5",
+    "Calculate (4+8)/3": "Result: 4.0",
+    "17*23=": "Result: 391",
+    "2+2?": "Result: 4",
+    "how much is 3 x 4": "Result: 12",
+    "what is 2024 - 1?": "Result: 2023",
+}
+
+# Must never be answered by the calculator
+GRAPH = [
+    "2024-1-15",
+    "12/25",
+    "555-1234",
+    "(555) 123-4567",
+    "+1 555-123-4567",
+    "what is 12/25",
+    "2024-01-15?",
+    "call 555-1234?",
+    "17*23",
+    "what is the pump pressure at 20/5 bar",
+]
+
+FAQ = [
+    {"questions": ["How do I reset my password?", "I forgot my password"], "answer": "Use the reset link on the login page."},
+    {"question": "What are your opening hours?", "answer": "Monday to Friday, 9:00-17:00."},
+]
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    queries: int = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+
+def main():
+    failures = []
+    for text, expected in CALCULATE.items():
+        got = route(text)
+        if got != ("calculate", expected):
+            failures.append(f"{text!r}: expected calculate {expected!r}, got {got}")
+    for text in GRAPH:
+        got = route(text)
+        if got[0] == "calculate":
+            failures.append(f"{text!r}: answered by the calculator with {got[1]!r}")
+
+    embeddings = CountingEmbeddings(size=64)
+    faq = FAQIndex(FAQ, embeddings)
+    lookups = [
+        ("how do i reset my password", False),  # exact after normalization
+        ("Summarize the maintenance manual section on pump seals", False),  # no shared words
+        ("What does the warranty cover for the compressor?", False),
+        ("how can I reset my password please", True),
+        ("opening hours on friday?", True),
+    ]
+    for text, should_embed in lookups:
+        before = embeddings.queries
+        faq.match(text)
+        embedded = embeddings.queries > before
+        if embedded != should_embed:
+            failures.append(f"FAQ lookup {text!r}: {'embedded' if embedded else 'skipped'}, expected the opposite")
+    if faq.match("How do I reset my password")[0] != FAQ[0]["answer"]:
+        failures.append("exact FAQ match not answered")
+
+    print(f"{len(CALCULATE)} calculator inputs, {len(GRAPH)} graph inputs, {len(lookups)} FAQ lookups "
+          f"({embeddings.queries} embedded)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("PASS" if not failures else "")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+if "--separate-worker" not in sys.argv:
+    os.environ["SQLITE_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="history_cache_"), "history.db")
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import memory
+from cache import CachedChatMessageHistory, HotSessionCache, enable_shared_generations
+
+# Behaviour check for the hot-session cache (see cache.py) on the SQLite backend: that a write by a separate
+# process (uvicorn --workers, another host) is seen by the next read even with a revalidation interval set,
+# since generations are not shared there; store version queries per turn (one read, one write of the user
+# and AI message); that with the launcher's shared generations a write by a forked worker is seen by the
+# next read in the parent, and a write bypassing the cache once the revalidation interval has passed.
+# Usage: python benchmarks/check_history_cache.py --turns 20   (exit code 1 on failure)
+
+REVALIDATE_SECONDS = 0.5
+
+
+class CountingVersion:
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, session_id):
+        self.queries += 1
+        return memory.get_session_version(session_id)
+
+
+def history(session_id, cache, version_fn):
+    return CachedChatMessageHistory(session_id, memory.get_session_history, version_fn, cache)
+
+
+def turn(session_id, cache, version_fn, i):
+    history(session_id, cache, version_fn).messages
+    history(session_id, cache, version_fn).add_messages([HumanMessage(content=f"question {i}"), AIMessage(content=f"answer {i}")])
+
+
+def separate_worker(session_id: str):
+    "Another worker process with its own cache and no shared generations: one turn on session_id."
+    turn(session_id, HotSessionCache(), CountingVersion(), "elsewhere")
+
+
+def main():
+    turns = int(sys.argv[sys.argv.index("--turns") + 1]) if "--turns" in sys.argv else 20
+    failures = []
+
+    # Separate processes: the interval is ignored, every read checks the store version
+    cache, version_fn = HotSessionCache(revalidate_seconds=3600), CountingVersion()
+    turn("separate", cache, version_fn, 0)
+    subprocess.run([sys.executable, __file__, "--separate-worker", "separate"], env=os.environ, check=True)
+    seen = history("separate", cache, version_fn).messages
+    print(f"Messages after a separate process's write: {len(seen)} (expected 4)")
+    if len(seen) != 4:
+        failures.append("a write by a separate process was not seen")
+    # ... also when this process writes on top of the other process's write before reading again
+    subprocess.run([sys.executable, __file__, "--separate-worker", "separate"], env=os.environ, check=True)
+    history("separate", cache, version_fn).add_messages([HumanMessage(content="question 2"), AIMessage(content="answer 2")])
+    seen = [m.content for m in history("separate", cache, version_fn).messages]
+    stored = [m.content for m in memory.get_session_history("separate").messages]
+    print(f"Messages after writes by both processes: {len(seen)} (expected 8, as stored)")
+    if seen != stored or len(seen) != 8:
+        failures.append("a write on top of another process's write served a stale list")
+
+    enable_shared_generations()
+
+    queries = {}
+    for name, revalidate in (("every read", 0.0), (f"{REVALIDATE_SECONDS}s", REVALIDATE_SECONDS)):
+        cache, version_fn = HotSessionCache(revalidate_seconds=revalidate), CountingVersion()
+        for i in range(turns):
+            turn(f"queries_{revalidate}", cache, version_fn, i)
+        queries[name] = version_fn.queries
+        print(f"revalidate {name:>10}: {version_fn.queries / turns:.2f} version queries per turn over {turns} turns")
+    if queries[f"{REVALIDATE_SECONDS}s"] > 2:
+        failures.append("version queried on cached reads or on writes within the revalidation interval")
+
+    # A forked worker writes to a session the parent has cached
+    cache, version_fn = HotSessionCache(revalidate_seconds=3600), CountingVersion()
+    turn("shared", cache, version_fn, 0)
+    pid = os.fork()
+    if pid == 0:
+        memory.get_engine().dispose(close=False)  # the parent's pooled connections are not ours to use
+        turn("shared", cache, version_fn, 1)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    seen = len(history("shared", cache, version_fn).messages)
+    print(f"Messages after a forked worker's write: {seen} (expected 4)")
+    if seen != 4:
+        failures.append("a write by another worker was not seen")
+
+    # A write that bypasses the cache (another host, the CLI) is seen after the revalidation interval
+    cache, version_fn = HotSessionCache(revalidate_seconds=REVALIDATE_SECONDS), CountingVersion()
+    turn("external", cache, version_fn, 0)
+    memory.get_session_history("external").add_messages([HumanMessage(content="from elsewhere")])
+    time.sleep(REVALIDATE_SECONDS)
+    seen = len(history("external", cache, version_fn).messages)
+    print(f"Messages after an external write and {REVALIDATE_SECONDS}s: {seen} (expected 3)")
+    if seen != 3:
+        failures.append("an external write was not seen after the revalidation interval")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("PASS" if not failures else "")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    if "--separate-worker" in sys.argv:
+        separate_worker(sys.argv[sys.argv.index("--separate-worker") + 1])
+    else:
+        main()
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+# Import-time budget check for the API module. Importing app must not launch Phoenix, build the
+# LLM client, import the chat history backend or load the embedding model/FAISS index; those happen in
+# the background warm-up. The budget is relative to a baseline measured on the same machine: importing
+# the frameworks app cannot avoid (FastAPI, LangGraph), so the check holds on slow and fast hosts alike.
+# Usage: python benchmarks/check_import_time.py [budget_ratio]   (exit code 1 on failure)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_RATIO = 1.3  # import app may take at most this many times the baseline
+
+BASELINE_IMPORTS = "import fastapi, langgraph.graph, langgraph.prebuilt, langchain_core.messages"
+
+# Modules that must stay unloaded after "import app"
+HEAVY_MODULES = ["torch", "sentence_transformers", "phoenix", "faiss", "langchain_openai", "langchain_ollama", "langchain_huggingface",
+                 "memory", "memory_postgres", "psycopg2"]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {heavy!r} if m in sys.modules]
+print(f"{{elapsed:.3f}}")
+print(",".join(loaded))
+"""
+
+
+def measure_import(imports: str = "import app", runs: int = 3):
+    # Fresh interpreter per run so nothing is cached in sys.modules; report the best run
+    timings, loaded = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(imports=imports, heavy=HEAVY_MODULES)], cwd=REPO_ROOT,
+            capture_output=True, text=True, env={**os.environ, "AGENT_WARM_UP": "0"}, check=True
+        ).stdout.strip().splitlines()
+        timings.append(float(output[0]))
+        loaded = [m for m in (output[1].split(",") if len(output) > 1 else []) if m]
+    return min(timings), loaded
+
+
+if __name__ == "__main__":
+    ratio = float(sys.argv[1]) if len(sys.argv) > 1 else IMPORT_BUDGET_RATIO
+    baseline, _ = measure_import(BASELINE_IMPORTS)
+    budget = baseline * ratio
+    elapsed, loaded = measure_import()
+    print(f"import app: {elapsed:.3f}s (baseline {baseline:.3f}s, budget {budget:.3f}s = {ratio:.2f}x baseline)")
+    if loaded:
+        print(f"Heavy modules loaded at import time: {', '.join(loaded)}")
+    if elapsed > budget or loaded:
+        print("FAILED")
+        sys.exit(1)
+    print("PASSED")
@@ -0,0 +1,123 @@
+import os
+import sys
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from prefetch import PREFETCH_REQUESTS, PrefetchRegistry, similarity
+
+# Behaviour check for the speculative knowledge-base prefetch (see prefetch.py), against a fake search:
+# a matching tool query of the same turn takes the prefetched hits without a second search; a query
+# below the match threshold, or from another turn, misses; an unused prefetch expires; a prefetch still
+# queued behind other turns' prefetches is cancelled instead of waited for; a failed prefetch raises
+# its error instead of being searched again.
+# Usage: python benchmarks/check_prefetch.py   (exit code 1 on failure)
+
+USER_MESSAGE = "How do I replace the pump seal on the main unit?"
+
+
+class FakeSearch:
+    "Records every search; queries containing 'broken' fail, and searches wait for `gate` when set."
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.queries = []
+        self.gate = None
+
+    def __call__(self, query):
+        self.queries.append(query)
+        if self.gate is not None:
+            self.gate.wait(5)
+        time.sleep(self.latency)
+        if "broken" in query:
+            raise RuntimeError("index unavailable")
+        return [{"content": f"hits for {query}", "metadata": {}, "score": 0.0}]
+
+
+def wait_started(search, count):
+    "Until the fake has received `count` searches: a prefetch claimed before it starts is cancelled."
+    deadline = time.monotonic() + 5
+    while len(search.queries) < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def outcome(result):
+    return PREFETCH_REQUESTS.value(result=result)
+
+
+def main():
+    failures = []
+
+    def expect(name, condition):
+        print(f"{'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    # Hit: the model's query shares most content words with the user's message
+    search = FakeSearch()
+    registry = PrefetchRegistry(search, workers=2, ttl=60, threshold=0.6)
+    registry.start("turn-1", USER_MESSAGE)
+    wait_started(search, 1)
+    tool_query = "replace pump seal main unit"
+    hits_before = outcome("hit")
+    results = registry.claim("turn-1", tool_query)
+    expect(f"hit: similar tool query ({similarity(USER_MESSAGE, tool_query):.2f}) takes the prefetched results",
+           results is not None and outcome("hit") == hits_before + 1 and len(search.queries) == 1)
+
+    # Miss: below the Jaccard threshold, or another turn's prefetch
+    registry.start("turn-2", USER_MESSAGE)
+    wait_started(search, 2)
+    misses_before = outcome("miss")
+    unrelated = "pump warranty terms for the compressor"
+    expect(f"miss: tool query below the threshold ({similarity(USER_MESSAGE, unrelated):.2f} < 0.6)",
+           registry.claim("turn-2", unrelated) is None and outcome("miss") == misses_before + 1)
+    expect("miss: another turn's prefetch is not taken", registry.claim("turn-3", tool_query) is None)
+    expect("the turn's prefetch is still there for a matching query", registry.claim("turn-2", tool_query) is not None)
+
+    # Expiry: an unused prefetch is dropped and counted after the TTL
+    search = FakeSearch()
+    registry = PrefetchRegistry(search, workers=1, ttl=0.1, threshold=0.6)
+    registry.start("turn-4", USER_MESSAGE)
+    wait_started(search, 1)
+    unused_before = outcome("unused")
+    time.sleep(0.2)
+    expect("expiry: a prefetch past its TTL is not claimed and counts as unused",
+           registry.claim("turn-4", tool_query) is None and outcome("unused") == unused_before + 1
+           and registry.pending() == 0)
+
+    # Queued: with every prefetch thread busy, claiming a prefetch that has not started cancels it
+    search = FakeSearch()
+    search.gate = threading.Event()
+    registry = PrefetchRegistry(search, workers=1, ttl=60, threshold=0.6)
+    registry.start("busy-turn", "maintenance schedule for the compressor filters")
+    registry.start("turn-5", USER_MESSAGE)
+    start = time.perf_counter()
+    results = registry.claim("turn-5", tool_query)
+    waited = time.perf_counter() - start
+    search.gate.set()
+    time.sleep(0.1)
+    expect(f"queued: claim returns at once ({waited * 1000:.1f} ms) and the queued search never runs",
+           results is None and waited < 0.5 and USER_MESSAGE not in search.queries)
+
+    # Error: the failure is raised in the tool, not hidden by a second search
+    search = FakeSearch()
+    registry = PrefetchRegistry(search, workers=1, ttl=60, threshold=0.6)
+    registry.start("turn-6", "broken pump seal replacement")
+    wait_started(search, 1)
+    errors_before = outcome("error")
+    try:
+        registry.claim("turn-6", "broken pump seal replacement")
+        raised = None
+    except RuntimeError as e:
+        raised = e
+    expect("error: a failed prefetch raises its error once, without searching again",
+           raised is not None and outcome("error") == errors_before + 1 and len(search.queries) == 1)
+
+    print("PASS" if not failures else f"{len(failures)} failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
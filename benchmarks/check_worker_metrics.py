@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import run_level, wait_until_ready
+from stub_llm import start_stub_server
+
+# Checks that /metrics covers every pre-fork worker (see metrics.py): starts launch.py --production
+# against the stub LLM, sends --requests /chat requests spread over the workers, then scrapes /metrics
+# repeatedly. Every scrape, whichever worker answers it, must report all requests in
+# agent_requests_total and the same totals as the other scrapes.
+# Usage: python benchmarks/check_worker_metrics.py --workers 3 --requests 60   (exit code 1 on failure)
+
+
+def scrape(base_url: str) -> dict:
+    "{series: value} for the agent_requests_total and agent_request_latency_seconds_count series."
+    with urllib.request.urlopen(f"{base_url}/metrics", timeout=10) as response:
+        lines = response.read().decode().splitlines()
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1]) for line in lines
+            if line.startswith(("agent_requests_total{", "agent_request_latency_seconds_count{"))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check /metrics aggregation across pre-fork workers")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--scrapes", type=int, default=12)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    os.environ["EMBEDDING_BACKEND"] = "fake"
+    from synthetic_corpus import build_synthetic_index
+
+    workdir = tempfile.mkdtemp(prefix="worker_metrics_")
+    build_synthetic_index(os.path.join(workdir, "faiss_index"), 200)
+    stub, _, stub_url = start_stub_server(latency=0.05, tokens_per_second=2000.0)
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "vllm", "VLLM_BASE_URL": stub_url, "VLLM_MODEL": "stub",
+        "CHAT_HISTORY_BACKEND": "sqlite", "SQLITE_DB_PATH": os.path.join(workdir, "history.db"),
+        "FAISS_INDEX_PATH": os.path.join(workdir, "faiss_index"), "EMBEDDING_BACKEND": "fake",
+        "PHOENIX_MONITORING": "0", "SESSION_RATE_LIMIT_PER_MIN": "0",
+    }
+    base_url = f"http://127.0.0.1:{args.port}"
+    process = subprocess.Popen([sys.executable, "launch.py", "--production", "--workers", str(args.workers),
+                                "--host", "127.0.0.1", "--port", str(args.port)],
+                               cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    failures = []
+    try:
+        if not wait_until_ready(base_url, timeout=300):
+            raise SystemExit("Launcher did not become ready")
+        load = asyncio.run(run_level(base_url, "rest", 2 * args.workers, args.requests))
+        time.sleep(2.5)  # longer than METRICS_FLUSH_SECONDS, so every worker has written its snapshot
+        scrapes = [scrape(base_url) for _ in range(args.scrapes)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+        stub.shutdown()
+
+    chat_ok = [s.get('agent_requests_total{endpoint="/chat",status="ok"}', 0.0) for s in scrapes]
+    print(f"{args.workers} workers, {load['completed']} of {args.requests} /chat requests completed")
+    print(f"agent_requests_total{{endpoint=\"/chat\",status=\"ok\"}} over {len(scrapes)} scrapes: {sorted(set(chat_ok))}")
+    if any(value != load["completed"] for value in chat_ok):
+        failures.append(f"a scrape did not report all {load['completed']} completed requests")
+    if any(s != scrapes[0] for s in scrapes):
+        failures.append("scrapes answered by different workers disagree")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("PASS" if not failures else "")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
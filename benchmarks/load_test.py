@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from stub_llm import start_stub_server
+
+# End-to-end load test: starts the FastAPI app against the stub LLM, a throwaway SQLite history
+# database and a synthetic FAISS corpus, drives /chat and /ws at increasing concurrency, and reports
+# latency percentiles, throughput and a per-stage breakdown scraped from /metrics.
+#
+# Usage:
+#   python benchmarks/load_test.py --concurrency 1,8,32 --requests 200
+#   python benchmarks/load_test.py --baseline benchmarks/results/load_20260101_120000.json
+#   Overload with admission control (rejected requests are excluded from the latency percentiles):
+#   python benchmarks/load_test.py --transport rest --concurrency 8,64,256 --app-env ADMISSION_MAX_IN_FLIGHT=8
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+WORKLOAD = [
+    "What is 17*23.5?",
+    "What does the maintenance manual say about replacing the pump seal?",
+    "Summarize the warranty policy for sensors",
+    "Hello, who are you?",
+    "How do I calibrate the pressure sensor after a firmware update?",
+]
+
+# Histograms broken down per request in the report: (metric, label) pairs
+STAGES = [
+    ("agent_node_latency_seconds", 'node="call_model"'),
+    ("agent_node_latency_seconds", 'node="tools"'),
+    ("agent_tool_latency_seconds", 'tool="calculate"'),
+    ("agent_tool_latency_seconds", 'tool="search_knowledge_base"'),
+    ("agent_vector_search_latency_seconds", ""),
+    ("agent_history_latency_seconds", 'operation="load"'),
+    ("agent_history_latency_seconds", 'operation="save"'),
+    ("agent_guardrail_latency_seconds", 'check="input"'),
+]
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def scrape_metrics(base_url: str) -> dict:
+    # Parse *_sum / *_count samples from the Prometheus text output
+    samples = {}
+    with urllib.request.urlopen(f"{base_url}/metrics", timeout=5) as response:
+        for line in response.read().decode().splitlines():
+            match = re.match(r"^(\w+)_(sum|count)(?:\{(.*)\})? (\S+)$", line)
+            if match:
+                name, kind, labels, value = match.groups()
+                samples[(name, labels or "", kind)] = float(value)
+    return samples
+
+
+def stage_breakdown(before: dict, after: dict, completed: int) -> dict:
+    breakdown = {}
+    for name, labels in STAGES:
+        total = after.get((name, labels, "sum"), 0.0) - before.get((name, labels, "sum"), 0.0)
+        calls = after.get((name, labels, "count"), 0.0) - before.get((name, labels, "count"), 0.0)
+        if calls:
+            key = f"{name}{{{labels}}}" if labels else name
+            breakdown[key] = {
+                "calls_per_request": round(calls / max(completed, 1), 3),
+                "mean_ms": round(total / calls * 1000, 3),
+                "ms_per_request": round(total / max(completed, 1) * 1000, 3),
+            }
+    return breakdown
+
+
+async def drive_chat(client, base_url, worker_id, counter, total, latencies, statuses):
+    while True:
+        index = counter[0]
+        if index >= total:
+            return
+        counter[0] += 1
+        body = {"message": WORKLOAD[index % len(WORKLOAD)], "session_id": f"bench_rest_{worker_id}"}
+        start = time.perf_counter()
+        try:
+            response = await client.post(f"{base_url}/chat", json=body)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            statuses[type(e).__name__] = statuses.get(type(e).__name__, 0) + 1
+
+
+async def drive_ws(ws_url, worker_id, counter, total, latencies, statuses):
+    import websockets
+    async with websockets.connect(f"{ws_url}/ws/bench_ws_{worker_id}") as websocket:
+        while True:
+            index = counter[0]
+            if index >= total:
+                return
+            counter[0] += 1
+            start = time.perf_counter()
+            await websocket.send(json.dumps({"message": WORKLOAD[index % len(WORKLOAD)]}))
+            reply = json.loads(await websocket.recv())
+            key = "ok" if "response" in reply else "error"
+            statuses[key] = statuses.get(key, 0) + 1
+            if key == "ok":
+                latencies.append(time.perf_counter() - start)
+
+
+async def run_level(base_url: str, transport: str, concurrency: int, total: int) -> dict:
+    import httpx
+
+    latencies, statuses, counter = [], {}, [0]
+    before = scrape_metrics(base_url)
+    start = time.perf_counter()
+    if transport == "ws":
+        ws_url = base_url.replace("http://", "ws://")
+        await asyncio.gather(*[drive_ws(ws_url, i, counter, total, latencies, statuses) for i in range(concurrency)])
+    else:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+            await asyncio.gather(*[drive_chat(client, base_url, i, counter, total, latencies, statuses) for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    after = scrape_metrics(base_url)
+
+    return {
+        "transport": transport,
+        "concurrency": concurrency,
+        "requests": total,
+        "completed": len(latencies),
+        "shed_pct": round(100 * (total - len(latencies)) / max(total, 1), 2),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "duration_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "stages": stage_breakdown(before, after, len(latencies)),
+    }
+
+
+def wait_until_ready(base_url: str, timeout: float = 120) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready", timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except Exception:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def start_app(port: int, stub_url: str, workdir: str, extra_env=None, extra_args=(), quiet: bool = False):
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "vllm",
+        "VLLM_BASE_URL": stub_url,
+        "VLLM_MODEL": "stub",
+        "CHAT_HISTORY_BACKEND": "sqlite",
+        "SQLITE_DB_PATH": os.path.join(workdir, "bench_history.db"),
+        "FAISS_INDEX_PATH": os.path.join(workdir, "faiss_index"),
+        "PHOENIX_MONITORING": "0",
+        "SESSION_RATE_LIMIT_PER_MIN": "0",  # the driver reuses a few sessions at a high rate
+        **(extra_env or {}),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", *extra_args],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL if quiet else None,
+    )
+
+
+def print_report(results):
+    print(f"\n{'transport':>9} {'conc':>5} {'done':>6} {'shed %':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    print("=" * 98)
+    for r in results:
+        print(f"{r['transport']:>9} {r['concurrency']:>5} {r['completed']:>6} {r['shed_pct']:>7.1f} {r['requests_per_s']:>8.2f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}  {r['statuses']}")
+    for r in results:
+        print(f"\nPer-stage breakdown ({r['transport']}, concurrency {r['concurrency']}):")
+        for stage, values in r["stages"].items():
+            print(f"  {stage:60} {values['calls_per_request']:>6.2f} calls/req  {values['mean_ms']:>9.2f} ms/call  {values['ms_per_request']:>9.2f} ms/req")
+
+
+def compare_with_baseline(results, baseline_path: str, tolerance: float = 0.10):
+    # Flag p95/p99 increases or throughput drops beyond the tolerance
+    baseline = {(r["transport"], r["concurrency"]): r for r in json.load(open(baseline_path))["results"]}
+    regressions = 0
+    print(f"\nComparison with {baseline_path} (tolerance {tolerance:.0%}):")
+    for r in results:
+        old = baseline.get((r["transport"], r["concurrency"]))
+        if not old:
+            continue
+        for key, higher_is_worse in (("p95_ms", True), ("p99_ms", True), ("requests_per_s", False)):
+            if not old[key]:
+                continue
+            change = (r[key] - old[key]) / old[key]
+            worse = change > tolerance if higher_is_worse else change < -tolerance
+            regressions += worse
+            print(f"  {r['transport']:>4} c={r['concurrency']:<4} {key:15} {old[key]:>10.2f} -> {r[key]:>10.2f} ({change:+.1%}){'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /chat and /ws against a stub LLM")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--transport", default="rest,ws", help="rest, ws or both")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--docs", type=int, default=2000, help="synthetic FAISS chunks")
+    parser.add_argument("--embedding-backend", default="fake", help="fake or huggingface")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app, e.g. ADMISSION_MAX_IN_FLIGHT=8 (repeatable)")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--output", help="where to save results (default benchmarks/results/load_<time>.json)")
+    args = parser.parse_args()
+
+    os.environ["EMBEDDING_BACKEND"] = args.embedding_backend
+    workdir = tempfile.mkdtemp(prefix="agent_bench_")
+    from synthetic_corpus import build_synthetic_index
+    print(f"Building synthetic corpus ({args.docs} chunks) in {workdir}")
+    build_synthetic_index(os.path.join(workdir, "faiss_index"), args.docs)
+
+    stub, _, stub_url = start_stub_server(latency=args.stub_latency, tokens_per_second=args.tokens_per_second)
+    base_url = f"http://127.0.0.1:{args.port}"
+    app_env = dict(item.split("=", 1) for item in args.app_env)
+    app_process = start_app(args.port, stub_url, workdir, {"EMBEDDING_BACKEND": args.embedding_backend, **app_env})
+    results = []
+    try:
+        if not wait_until_ready(base_url):
+            print("App did not become ready")
+            sys.exit(1)
+        for transport in args.transport.split(","):
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                print(f"Running {transport} at concurrency {concurrency}...")
+                results.append(asyncio.run(run_level(base_url, transport, concurrency, args.requests)))
+    finally:
+        app_process.terminate()
+        app_process.wait(timeout=30)
+        stub.shutdown()
+
+    print_report(results)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("load_%Y%m%d_%H%M%S.json"))
+    with open(output, "w") as f:
+        json.dump({"args": vars(args), "results": results}, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.baseline and compare_with_baseline(results, args.baseline):
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import WORKLOAD, percentile, start_app, wait_until_ready
+from stub_llm import start_stub_server
+
+# WebSocket soak test: starts the app against the stub LLM, opens thousands of idle /ws connections
+# and reports the worker's resident memory per connection, then keeps them open while a set of active
+# connections chat for --duration seconds (reply latency, errors, memory per active connection),
+# checks that one connection over WS_MAX_CONNECTIONS is refused with 1013, and that the connection
+# gauge returns to zero once everything is closed.
+# Usage: python benchmarks/soak_websockets.py --idle 2000 --active 100 --duration 60 [--format msgpack] [--no-deflate]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def open_connections(base_url: str) -> float:
+    "Sum of the agent_ws_connections gauge on /metrics."
+    with urllib.request.urlopen(f"{base_url}/metrics", timeout=5) as response:
+        return sum(float(line.rsplit(" ", 1)[1]) for line in response.read().decode().splitlines()
+                   if line.startswith("agent_ws_connections{"))
+
+
+def raise_fd_limit(needed: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard if hard != resource.RLIM_INFINITY else needed, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+class Client:
+    def __init__(self, ws_url: str, fmt: str, deflate: bool):
+        self.ws_url, self.fmt, self.deflate = ws_url, fmt, deflate
+        if fmt == "msgpack":
+            import ormsgpack
+            self.codec = ormsgpack
+
+    async def connect(self, session_id: str):
+        from websockets.asyncio.client import connect
+        return await connect(f"{self.ws_url}/ws/{session_id}", ping_interval=None, open_timeout=60,
+                             compression="deflate" if self.deflate else None,
+                             subprotocols=["msgpack"] if self.fmt == "msgpack" else None)
+
+    async def send(self, websocket, payload: dict):
+        await websocket.send(self.codec.packb(payload) if self.fmt == "msgpack" else json.dumps(payload))
+
+    async def recv(self, websocket) -> dict:
+        data = await websocket.recv()
+        return self.codec.unpackb(data) if self.fmt == "msgpack" else json.loads(data)
+
+
+async def open_idle(client: Client, count: int, wave: int = 200):
+    connections = []
+    for start in range(0, count, wave):
+        batch = range(start, min(start + wave, count))
+        connections += await asyncio.gather(*(client.connect(f"soak_idle_{i}") for i in batch))
+    return connections
+
+
+async def active_session(client: Client, index: int, deadline: float, interval: float, latencies, errors):
+    websocket = await client.connect(f"soak_active_{index}")
+    turn = 0
+    try:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            await client.send(websocket, {"message": WORKLOAD[(index + turn) % len(WORKLOAD)]})
+            reply = await asyncio.wait_for(client.recv(websocket), 120)
+            if "error" in reply:
+                errors[reply["error"]] = errors.get(reply["error"], 0) + 1
+            else:
+                latencies.append(time.perf_counter() - start)
+            turn += 1
+            await asyncio.sleep(interval)
+    except Exception as e:
+        errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+    finally:
+        await websocket.close()
+
+
+async def soak(args, base_url: str, pid: int):
+    from websockets.exceptions import ConnectionClosed
+
+    client = Client(base_url.replace("http://", "ws://"), args.format, not args.no_deflate)
+    baseline = rss_mb(pid)
+    print(f"Worker RSS with no connections: {baseline:.1f} MB")
+
+    start = time.perf_counter()
+    idle = await open_idle(client, args.idle)
+    await asyncio.sleep(2)
+    with_idle = rss_mb(pid)
+    print(f"Opened {len(idle)} idle connections in {time.perf_counter() - start:.1f}s; RSS {with_idle:.1f} MB "
+          f"({(with_idle - baseline) * 1024 / max(len(idle), 1):.1f} KB per idle connection)")
+
+    latencies, errors, peak = [], {}, [with_idle]
+
+    async def sample_memory(stop):
+        while not stop.is_set():
+            peak[0] = max(peak[0], rss_mb(pid))
+            await asyncio.sleep(0.5)
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_memory(stop))
+    deadline = time.monotonic() + args.duration
+    await asyncio.gather(*(active_session(client, i, deadline, args.interval, latencies, errors) for i in range(args.active)))
+    stop.set()
+    await sampler
+    print(f"{args.active} active connections for {args.duration:.0f}s: {len(latencies)} replies, "
+          f"p50 {percentile(latencies, 50) * 1000:.0f} ms, p95 {percentile(latencies, 95) * 1000:.0f} ms, errors {errors or 0}; "
+          f"peak RSS {peak[0]:.1f} MB ({(peak[0] - with_idle) * 1024 / max(args.active, 1):.1f} KB per active connection)")
+
+    # The worker is full again (idle connections only after the active ones closed); fill the freed slots
+    refill = await open_idle(client, args.active)
+    extra = await client.connect("soak_over_cap")
+    try:
+        await asyncio.wait_for(extra.recv(), 10)
+        print("Connection over the cap was NOT refused")
+    except ConnectionClosed as e:
+        print(f"Connection over the cap refused with close code {e.rcvd.code if e.rcvd else None}")
+
+    alive = sum(1 for websocket in idle if websocket.close_code is None)
+    print(f"Idle connections still open after the soak: {alive}/{len(idle)}")
+    await asyncio.gather(*(websocket.close() for websocket in idle + refill))
+    await asyncio.sleep(2)
+    print(f"agent_ws_connections after closing everything: {open_connections(base_url):g}; RSS {rss_mb(pid):.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak /ws with thousands of idle and active connections")
+    parser.add_argument("--idle", type=int, default=2000)
+    parser.add_argument("--active", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between messages per active connection")
+    parser.add_argument("--format", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--no-deflate", action="store_true")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--docs", type=int, default=500, help="synthetic FAISS chunks")
+    parser.add_argument("--stub-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    limit = raise_fd_limit(2 * (args.idle + args.active) + 256)  # client and server ends share this limit
+    if limit < 2 * (args.idle + args.active) + 64:
+        raise SystemExit(f"Open-file limit {limit} is too low for {args.idle + args.active} connections")
+    os.environ["EMBEDDING_BACKEND"] = "fake"
+    os.environ["WS_MAX_CONNECTIONS"] = str(args.idle + args.active)
+    os.environ["WS_PER_MESSAGE_DEFLATE"] = "0" if args.no_deflate else "1"
+    from ws_connections import server_options
+    from synthetic_corpus import build_synthetic_index
+
+    workdir = tempfile.mkdtemp(prefix="ws_soak_")
+    build_synthetic_index(os.path.join(workdir, "faiss_index"), args.docs)
+    stub, _, stub_url = start_stub_server(latency=args.stub_latency, tokens_per_second=200.0)
+    uvicorn_args = [arg for name, value in server_options().items() for arg in (f"--{name.replace('_', '-')}", str(value))]
+    app_env = {k: os.environ[k] for k in ("EMBEDDING_BACKEND", "WS_MAX_CONNECTIONS", "WS_PER_MESSAGE_DEFLATE")}
+    app_env.update({"ADMISSION_MAX_IN_FLIGHT": str(args.active), "ADMISSION_MAX_QUEUE": str(args.active)})
+    base_url = f"http://127.0.0.1:{args.port}"
+    process = start_app(args.port, stub_url, workdir, app_env, uvicorn_args, quiet=True)
+    try:
+        if not wait_until_ready(base_url):
+            raise SystemExit("App did not become ready")
+        print(f"{args.format} frames, permessage-deflate {'off' if args.no_deflate else 'on'}, "
+              f"WS_MAX_CONNECTIONS={args.idle + args.active}")
+        asyncio.run(soak(args, base_url, process.pid))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# OpenAI-compatible stub LLM server for load tests. It answers /v1/chat/completions (vLLM/OpenAI
+# style) and /openai/deployments/<name>/chat/completions (Azure style) with a configurable
+# time-to-first-token, output token rate and a scripted tool-call policy, so the agent can be
+# benchmarked without a GPU or API quota.
+#
+# Tool-call script (JSON list, first matching rule wins) - a rule fires on the first model call of a
+# turn, i.e. when the last message is from the user:
+#   [{"match": "\\d+\\s*[-+*/]\\s*\\d+", "tool": "calculate", "arguments": {"expression": "17*23.5"}},
+#    {"match": "manual|policy", "tool": "search_knowledge_base", "arguments": {"query": "$input"}}]
+# "$input" is replaced with the user's message. After a tool result, the stub returns a final answer.
+# Like vLLM prefix caching, prompts whose leading messages (and tool schemas) match an earlier request
+# report those tokens as usage.prompt_tokens_details.cached_tokens.
+#
+# Usage: python benchmarks/stub_llm.py --port 8030 --latency 0.3 --tokens-per-second 50
+
+DEFAULT_SCRIPT = [
+    {"match": r"\d+\s*[-+*/]\s*\d+", "tool": "calculate", "arguments": {"expression": "17*23.5"}},
+    {"match": r"manual|policy|document|knowledge", "tool": "search_knowledge_base", "arguments": {"query": "$input"}},
+]
+
+
+class StubConfig:
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 100.0, answer_tokens: int = 40,
+                 script=None, error_rate: float = 0.0, extra_latency: float = 0.0, fail_after_tool: bool = False):
+        self.latency = latency                      # seconds before the first token
+        self.tokens_per_second = tokens_per_second  # generation speed of the answer
+        self.answer_tokens = answer_tokens          # length of a final answer
+        self.script = [dict(rule, pattern=re.compile(rule["match"], re.IGNORECASE)) for rule in (script or DEFAULT_SCRIPT)]
+        self.error_rate = error_rate                # fraction of requests answered with HTTP 500
+        self.extra_latency = extra_latency          # injected delay on top of latency (for timeout tests)
+        self.fail_after_tool = fail_after_tool      # answer every call that follows a tool result with HTTP 500
+        self.requests = 0
+        self.prefixes = set()                       # digests of prompt prefixes seen so far
+        self.lock = threading.Lock()
+
+
+def _last_user_text(messages):
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, list):
+                return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return content or ""
+    return ""
+
+
+def _message_tokens(message) -> int:
+    return len(str(message.get("content") or "").split())
+
+
+def _cached_prompt_tokens(config: StubConfig, messages, tools) -> int:
+    "Tokens of the longest message-aligned prefix seen in an earlier request; records this prompt's prefixes."
+    digest = hashlib.sha256(json.dumps(tools or []).encode())
+    cached, tokens = 0, 0
+    with config.lock:
+        if len(config.prefixes) > 100_000:
+            config.prefixes.clear()
+        for message in messages:
+            digest.update(json.dumps(message).encode())
+            tokens += _message_tokens(message)
+            key = digest.hexdigest()
+            if key in config.prefixes:
+                cached = tokens  # digests chain, so a hit means every earlier message matched too
+            config.prefixes.add(key)
+    return cached
+
+
+def build_completion(config: StubConfig, body: dict):
+    "Return the chat completion payload for a request body."
+    messages = body.get("messages", [])
+    prompt_tokens = sum(_message_tokens(m) for m in messages)
+    cached_tokens = _cached_prompt_tokens(config, messages, body.get("tools"))
+    user_text = _last_user_text(messages)
+    message = {"role": "assistant", "content": None}
+    completion_tokens = config.answer_tokens
+
+    if messages and messages[-1].get("role") == "user" and body.get("tools"):
+        tool_names = {t.get("function", {}).get("name") for t in body["tools"]}
+        for rule in config.script:
+            if rule["tool"] in tool_names and rule["pattern"].search(user_text):
+                arguments = {k: (user_text if v == "$input" else v) for k, v in rule["arguments"].items()}
+                message["tool_calls"] = [{
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": rule["tool"], "arguments": json.dumps(arguments)},
+                }]
+                completion_tokens = 12
+                break
+
+    if "tool_calls" not in message:
+        message["content"] = " ".join(["stub"] * config.answer_tokens)
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if "tool_calls" in message else "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens,
+                  "prompt_tokens_details": {"cached_tokens": cached_tokens}},
+    }, completion_tokens
+
+
+def make_handler(config: StubConfig):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client timed out and closed the connection
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+            else:
+                self._send_json(200, {"status": "ok", "requests": config.requests})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.split("?")[0].endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            with config.lock:
+                config.requests += 1
+
+            payload, completion_tokens = build_completion(config, body)
+            time.sleep(config.latency + config.extra_latency + completion_tokens / config.tokens_per_second)
+            after_tool = bool(body.get("messages")) and body["messages"][-1].get("role") == "tool"
+            if (config.error_rate and random.random() < config.error_rate) or (config.fail_after_tool and after_tool):
+                self._send_json(500, {"error": {"message": "Injected stub failure", "type": "server_error"}})
+                return
+            self._send_json(200, payload)
+
+    return StubHandler
+
+
+def start_stub_server(port: int = 0, **config_kwargs):
+    "Start the stub in a background thread; returns (server, config, base_url)."
+    config = StubConfig(**config_kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server, config, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server")
+    parser.add_argument("--port", type=int, default=8030)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--script", help="JSON file with tool-call rules")
+    args = parser.parse_args()
+
+    script = json.load(open(args.script)) if args.script else None
+    server, _, url = start_stub_server(args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                                       answer_tokens=args.answer_tokens, script=script, error_rate=args.error_rate)
+    print(f"Stub LLM listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,48 @@
+import os
+import random
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Synthetic FAISS corpus for benchmarks: random technical-manual style chunks with the same metadata
+# layout as add_documents_faiss.py, embedded with the configured EMBEDDING_BACKEND.
+# Usage: EMBEDDING_BACKEND=fake python benchmarks/synthetic_corpus.py <index_path> [num_chunks]
+
+WORDS = (
+    "pump valve pressure manual policy warranty install sensor calibrate motor voltage filter "
+    "replace inspect safety torque schedule maintenance bearing coolant flow alarm reset panel "
+    "firmware update cable connector housing seal gasket temperature threshold operator service"
+).split()
+
+
+def synthetic_chunks(num_chunks: int, chunk_chars: int = 1000, seed: int = 7):
+    "Generate (text, metadata) pairs shaped like PDF chunks from the ingestion path."
+    rng = random.Random(seed)
+    for i in range(num_chunks):
+        words, length = [], 0
+        while length < chunk_chars:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        text = " ".join(words)[:chunk_chars]
+        metadata = {"file_type": "pdf", "source": f"synthetic/manual_{i // 50:04d}.pdf", "page": (i % 50) // 3}
+        yield text, metadata
+
+
+def build_synthetic_index(index_path: str, num_chunks: int = 2000, chunk_chars: int = 1000):
+    "Embed synthetic chunks and save a FAISS index at index_path."
+    from langchain_community.vectorstores import FAISS
+    from embeddings import get_embeddings
+
+    texts, metadatas = zip(*synthetic_chunks(num_chunks, chunk_chars))
+    vector_store = FAISS.from_texts(list(texts), get_embeddings(), metadatas=list(metadatas))
+    vector_store.save_local(index_path)
+    return vector_store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarks/synthetic_corpus.py <index_path> [num_chunks]")
+        sys.exit(1)
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    build_synthetic_index(sys.argv[1], count)
+    print(f"Built synthetic FAISS index with {count} chunks at {sys.argv[1]}")
@@ -0,0 +1,61 @@
+import os
+import time
+
+from metrics import counter, histogram
+
+# Per-request budgets for the agent <-> tools loop. Without them a model that keeps calling tools can
+# hold a worker for minutes and many LLM calls. Checked each time the model asks for tools:
+#   AGENT_MAX_SECONDS=60           - wall-clock time since the turn started
+#   AGENT_MAX_TOKENS=20000         - prompt + completion tokens reported by the provider this turn
+#   AGENT_MAX_TOOL_ITERATIONS=5    - rounds of tool calls
+# When one runs out the pending tool calls are answered with a "budget exhausted" note and the model
+# gets one last call to answer from what it already has. 0 disables a budget. LangGraph's
+# recursion_limit is set from the iteration budget as a backstop.
+AGENT_MAX_SECONDS = float(os.getenv("AGENT_MAX_SECONDS", "60"))
+AGENT_MAX_TOKENS = int(os.getenv("AGENT_MAX_TOKENS", "20000"))
+AGENT_MAX_TOOL_ITERATIONS = int(os.getenv("AGENT_MAX_TOOL_ITERATIONS", "5"))
+
+BUDGET_EXHAUSTED = counter("agent_budget_exhausted_total", "Turns forced to a final answer by a budget", ["budget"])
+TURN_TOKENS = histogram("agent_turn_tokens", "LLM tokens used per agent turn", [],
+                        buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000))
+TURN_TOOL_ITERATIONS = histogram("agent_turn_tool_iterations", "Rounds of tool calls per agent turn", [],
+                                 buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20))
+
+
+def recursion_limit(max_tool_iterations: int = AGENT_MAX_TOOL_ITERATIONS) -> int:
+    "Graph steps allowed per turn: agent + tools per iteration, plus the first and the forced final call."
+    return 2 * max_tool_iterations + 4 if max_tool_iterations > 0 else 25
+
+
+def tokens_of(message) -> int:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens") or (usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
+
+
+def exhausted_budget(state) -> str:
+    "Name of the first exhausted budget for this turn's state, or None."
+    if AGENT_MAX_TOOL_ITERATIONS > 0 and state.get("tool_iterations", 0) >= AGENT_MAX_TOOL_ITERATIONS:
+        return "tool_iterations"
+    if AGENT_MAX_TOKENS > 0 and state.get("tokens_used", 0) >= AGENT_MAX_TOKENS:
+        return "tokens"
+    if AGENT_MAX_SECONDS > 0 and time.time() - state.get("started_at", time.time()) >= AGENT_MAX_SECONDS:
+        return "time"
+    return None
+
+
+def budget_report(state) -> dict:
+    "Budget usage of a finished turn (returned as response metadata) and recorded in the metrics."
+    report = {
+        "elapsed_seconds": round(time.time() - state.get("started_at", time.time()), 3),
+        "max_seconds": AGENT_MAX_SECONDS,
+        "tokens": state.get("tokens_used", 0),
+        "max_tokens": AGENT_MAX_TOKENS,
+        "tool_iterations": state.get("tool_iterations", 0),
+        "max_tool_iterations": AGENT_MAX_TOOL_ITERATIONS,
+        "exhausted": state.get("budget_exhausted"),
+    }
+    TURN_TOKENS.observe(report["tokens"])
+    TURN_TOOL_ITERATIONS.observe(report["tool_iterations"])
+    if report["exhausted"]:
+        BUDGET_EXHAUSTED.inc(budget=report["exhausted"])
+    return report
@@ -0,0 +1,259 @@
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, List, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage
+
+from metrics import counter, gauge
+
+# Hot-session cache in front of the chat history store. Active conversations re-read their whole
+# history every turn even though this process wrote it seconds earlier, so recent sessions' message
+# lists are kept in memory (LRU, bounded by total bytes, evicted after an idle period).
+# Writes go through to the store and update the cached list. Every read asks the store for the
+# session's version - (message count, last message id), one indexed single-row query - and a change
+# made by another worker invalidates the entry instead of serving stale history.
+# Each session also has a write generation, bumped by every write through this cache. Under the pre-fork
+# launcher the generations live in shared memory (enable_shared_generations), so a write by any of its
+# workers is seen by all of them; only then may HISTORY_CACHE_REVALIDATE_SECONDS (default 0) let a read
+# skip the version query while the generation is unchanged and the entry was verified that recently.
+# Writers outside the launcher (other hosts, uvicorn --workers, the CLI) are then seen only after that
+# interval, so leave it at 0 unless the launcher's workers are the only writers.
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+HISTORY_CACHE_IDLE_SECONDS = float(os.getenv("HISTORY_CACHE_IDLE_SECONDS", "1800"))
+HISTORY_CACHE_REVALIDATE_SECONDS = float(os.getenv("HISTORY_CACHE_REVALIDATE_SECONDS", "0"))
+HISTORY_CACHE_WRITE_SLOTS = int(os.getenv("HISTORY_CACHE_WRITE_SLOTS", "4096"))  # sessions hash into this many generation counters
+MESSAGE_OVERHEAD_BYTES = 200  # rough per-message object overhead on top of the content
+
+CACHE_REQUESTS = counter("agent_history_cache_requests_total",
+                         "Hot-session cache lookups (hit: no store query, revalidated: hit after a version query)", ["result"])
+CACHE_BYTES = gauge("agent_history_cache_bytes", "Approximate bytes held by the hot-session cache", [])
+CACHE_SESSIONS = gauge("agent_history_cache_sessions", "Sessions held by the hot-session cache", [])
+
+
+def _message_size(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return len(content.encode("utf-8", "ignore")) + MESSAGE_OVERHEAD_BYTES
+
+
+class WriteGenerations:
+    """Per-session write counters, hashed into a fixed number of slots (a collision only costs a version
+    query). Shared ones live in shared memory created before the launcher forks its workers."""
+
+    def __init__(self, slots: int = HISTORY_CACHE_WRITE_SLOTS, shared: bool = False):
+        self.slots = slots
+        self.shared = shared
+        if shared:
+            import multiprocessing
+            counters = multiprocessing.Array("q", slots)
+            self._values, self._lock = counters.get_obj(), counters.get_lock()
+        else:
+            self._values, self._lock = [0] * slots, threading.Lock()
+
+    def _slot(self, session_id: str) -> int:
+        return zlib.crc32(session_id.encode("utf-8")) % self.slots
+
+    def get(self, session_id: str) -> int:
+        return self._values[self._slot(session_id)]
+
+    def bump(self, session_id: str = None) -> int:
+        "Count a write to one session (returns its new generation), or to every session when session_id is None."
+        with self._lock:
+            if session_id is None:
+                for slot in range(self.slots):
+                    self._values[slot] += 1
+                return 0
+            slot = self._slot(session_id)
+            self._values[slot] += 1
+            return self._values[slot]
+
+
+_generations = WriteGenerations()
+
+
+def enable_shared_generations(slots: int = HISTORY_CACHE_WRITE_SLOTS):
+    "Called by the pre-fork launcher before forking, so every worker sees the history writes of the others."
+    global _generations
+    _generations = WriteGenerations(slots, shared=True)
+
+
+class _Entry:
+    __slots__ = ("messages", "version", "generation", "verified_at", "size", "last_access")
+
+    def __init__(self, messages, version, generation):
+        self.messages = list(messages)
+        self.version = version  # store version, or None after a write through this cache (count known, id not)
+        self.generation = generation
+        self.verified_at = time.monotonic()
+        self.size = sum(_message_size(m) for m in self.messages)
+        self.last_access = self.verified_at
+
+    def matches(self, version) -> bool:
+        return self.version == version or (self.version is None and version[0] == len(self.messages))
+
+
+class HotSessionCache:
+    "Byte-bounded LRU of session message lists with idle eviction; thread safe."
+
+    def __init__(self, max_bytes: int = HISTORY_CACHE_MAX_BYTES, idle_seconds: float = HISTORY_CACHE_IDLE_SECONDS,
+                 revalidate_seconds: float = HISTORY_CACHE_REVALIDATE_SECONDS):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.revalidate_seconds = revalidate_seconds
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def generation(self, session_id: str) -> int:
+        return _generations.get(session_id)
+
+    def get(self, session_id: str, generation: int, version=None):
+        """Return a copy of the cached messages, or None. Without version, only an entry that can be trusted
+        without asking the store is returned (generations shared across workers, generation unchanged,
+        verified within revalidate_seconds); with the store's version, an entry that matches it is returned
+        and counts as verified."""
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(session_id)
+            now = time.monotonic()
+            if entry is None:
+                if version is not None:
+                    CACHE_REQUESTS.inc(result="miss")
+                return None
+            if version is None:
+                if (not _generations.shared or entry.generation != generation
+                        or now - entry.verified_at >= self.revalidate_seconds):
+                    return None
+                CACHE_REQUESTS.inc(result="hit")
+            elif entry.matches(version):
+                entry.version, entry.generation, entry.verified_at = version, generation, now
+                CACHE_REQUESTS.inc(result="revalidated")
+            else:
+                self._drop(session_id)
+                self._update_gauges()
+                CACHE_REQUESTS.inc(result="stale")
+                return None
+            entry.last_access = now
+            self._entries.move_to_end(session_id)
+            return list(entry.messages)
+
+    def put(self, session_id: str, messages: Sequence[BaseMessage], version, generation: int):
+        with self._lock:
+            self._drop(session_id)
+            entry = _Entry(messages, version, generation)
+            if entry.size > self.max_bytes:
+                return
+            self._entries[session_id] = entry
+            self._bytes += entry.size
+            self._evict_over_budget()
+            self._update_gauges()
+
+    def append(self, session_id: str, messages: Sequence[BaseMessage], generation: int):
+        """Record messages this process just wrote; generation is the session's generation read before the
+        write. The cached list is extended when no other write to the session happened since it was
+        synced, otherwise dropped."""
+        new_generation = _generations.bump(session_id)
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            if entry.generation != generation or new_generation != generation + 1:
+                self._drop(session_id)
+                self._update_gauges()
+                return
+            added = sum(_message_size(m) for m in messages)
+            entry.messages.extend(messages)
+            entry.version, entry.generation = None, new_generation
+            entry.size += added
+            entry.last_access = time.monotonic()
+            self._bytes += added
+            self._entries.move_to_end(session_id)
+            self._evict_over_budget()
+            self._update_gauges()
+
+    def invalidate(self, session_id: str = None):
+        "Drop one session, or every session when session_id is None, here and in the other workers' caches."
+        _generations.bump(session_id)
+        with self._lock:
+            if session_id is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._drop(session_id)
+            self._update_gauges()
+
+    def _drop(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict_idle(self):
+        # Entries are in access order, so idle ones sit at the front
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if entry.last_access >= cutoff:
+                break
+            self._drop(session_id)
+
+    def _evict_over_budget(self):
+        while self._bytes > self.max_bytes and self._entries:
+            session_id = next(iter(self._entries))
+            self._drop(session_id)
+
+    def _update_gauges(self):
+        CACHE_BYTES.set(self._bytes)
+        CACHE_SESSIONS.set(len(self._entries))
+
+
+class CachedChatMessageHistory(BaseChatMessageHistory):
+    """Chat history served from a HotSessionCache and written through to a backend history.
+    history_factory(session_id) builds the backend history (e.g. memory_postgres.get_session_history) and
+    version_fn(session_id) returns the store's current version of the session."""
+
+    def __init__(self, session_id: str, history_factory: Callable[[str], BaseChatMessageHistory],
+                 version_fn: Callable[[str], tuple], cache: HotSessionCache):
+        self.session_id = session_id
+        self._history_factory = history_factory
+        self._version_fn = version_fn
+        self._cache = cache
+        self._backend = None
+
+    @property
+    def backend(self) -> BaseChatMessageHistory:
+        # The backend history object is only built on a cache miss or a write
+        if self._backend is None:
+            self._backend = self._history_factory(self.session_id)
+        return self._backend
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        generation = self._cache.generation(self.session_id)
+        cached = self._cache.get(self.session_id, generation)
+        if cached is not None:
+            return cached
+        version = self._version_fn(self.session_id)
+        cached = self._cache.get(self.session_id, generation, version)
+        if cached is not None:
+            return cached
+        messages = self.backend.messages
+        # Only cache when nothing was written between the version check and the load
+        if self._version_fn(self.session_id) == version:
+            self._cache.put(self.session_id, messages, version, generation)
+        return messages
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        messages = list(messages)
+        generation = self._cache.generation(self.session_id)
+        self.backend.add_messages(messages)
+        self._cache.append(self.session_id, messages, generation)
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self._cache.invalidate(self.session_id)
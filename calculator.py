@@ -0,0 +1,291 @@
+import ast
+import math
+import operator
+import time
+from functools import lru_cache
+
+# Safe arithmetic engine used by the calculate tool. Expressions are parsed once into an AST,
+# validated against a whitelist, compiled into nested closures and cached, so repeated
+# expressions skip parsing entirely. Every operation is bounded (operand size, exponent,
+# list length) and evaluation runs against a wall-clock budget, so inputs like 9**9**9 or
+# [0]*10**9 are rejected instead of pinning a worker thread.
+
+# Limits ------------------------------------------------------------------------------------------------------------------------------------------
+MAX_EXPRESSION_LENGTH = 1000      # characters accepted by the parser
+MAX_INTEGER_BITS = 10_000         # ~3000 decimal digits, below Python's int->str conversion limit
+MAX_EXPONENT = 10_000             # absolute value of any exponent
+MAX_FACTORIAL_ARG = 1000          # factorial/comb/perm arguments
+MAX_SEQUENCE_LENGTH = 10_000      # elements in a list operand
+MAX_AST_NODES = 500               # size of the parsed expression tree
+TIME_BUDGET_SECONDS = 0.5         # wall-clock budget per evaluation
+COMPILE_CACHE_SIZE = 1024         # compiled expressions kept in memory
+
+
+class CalculationError(ValueError):
+    "Raised when an expression is not allowed or exceeds a resource limit."
+
+
+class _Budget:
+    # Wall-clock budget checked at every evaluated node
+    __slots__ = ("deadline",)
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+
+    def check(self):
+        if time.monotonic() > self.deadline:
+            raise CalculationError("Calculation exceeded time budget")
+
+
+# Value checks ------------------------------------------------------------------------------------------------------------------------------------
+def _check_number(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        if value.bit_length() > MAX_INTEGER_BITS:
+            raise CalculationError(f"Integer result exceeds {MAX_INTEGER_BITS} bits")
+        return value
+    if isinstance(value, float):
+        return value
+    if isinstance(value, complex):
+        raise CalculationError("Complex results are not supported")
+    raise CalculationError(f"Unsupported value type: {type(value).__name__}")
+
+
+def _check_value(value):
+    if isinstance(value, list):
+        if len(value) > MAX_SEQUENCE_LENGTH:
+            raise CalculationError(f"List exceeds {MAX_SEQUENCE_LENGTH} elements")
+        return [_check_number(v) for v in value]
+    return _check_number(value)
+
+
+# Bounded operators -------------------------------------------------------------------------------------------------------------------------------
+# Integer results are sized from their operands before they are computed; _check_number still checks
+# the exact size of every result afterwards.
+def _check_result_bits(bits):
+    if bits > MAX_INTEGER_BITS:
+        raise CalculationError(f"Integer result exceeds {MAX_INTEGER_BITS} bits")
+
+
+def _safe_pow(base, exponent):
+    if isinstance(exponent, (int, float)) and abs(exponent) > MAX_EXPONENT:
+        raise CalculationError(f"Exponent exceeds limit of {MAX_EXPONENT}")
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        # |base|**exponent has floor(exponent * log2|base|) + 1 bits
+        _check_result_bits(math.floor(exponent * math.log2(abs(base))) + 1)
+    return operator.pow(base, exponent)
+
+
+def _safe_mul(a, b):
+    if isinstance(a, int) and isinstance(b, int) and a and b:
+        # a product has at least bits(a) + bits(b) - 1 bits
+        _check_result_bits(a.bit_length() + b.bit_length() - 1)
+    return operator.mul(a, b)
+
+
+def _safe_prod(values):
+    if values and all(isinstance(v, int) and v for v in values):
+        _check_result_bits(sum(v.bit_length() for v in values) - len(values) + 1)
+    return math.prod(values)
+
+
+def _bounded_int_arg(fn):
+    def wrapper(*args):
+        for arg in args:
+            if isinstance(arg, int) and abs(arg) > MAX_FACTORIAL_ARG:
+                raise CalculationError(f"{fn.__name__} argument exceeds {MAX_FACTORIAL_ARG}")
+        return fn(*args)
+    wrapper.__name__ = fn.__name__
+    return wrapper
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: _safe_mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _safe_pow,
+}
+
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+# Element-wise math functions (applied per element when given a list)
+_ELEMENTWISE_FUNCTIONS = {
+    name: getattr(math, name)
+    for name in (
+        "sqrt", "exp", "log", "log10", "log2", "log1p", "expm1",
+        "sin", "cos", "tan", "asin", "acos", "atan", "atan2",
+        "sinh", "cosh", "tanh", "asinh", "acosh", "atanh",
+        "degrees", "radians", "floor", "ceil", "trunc", "fabs",
+        "hypot", "gcd", "lcm", "isqrt", "copysign", "fmod", "remainder",
+        "erf", "erfc", "gamma", "lgamma", "pow", "isclose",
+    )
+}
+_ELEMENTWISE_FUNCTIONS.update({
+    "factorial": _bounded_int_arg(math.factorial),
+    "comb": _bounded_int_arg(math.comb),
+    "perm": _bounded_int_arg(math.perm),
+    "abs": abs,
+    "round": round,
+})
+
+
+def _mean(values):
+    if not values:
+        raise CalculationError("mean() of an empty list")
+    return math.fsum(values) / len(values)
+
+
+# Aggregate functions (reduce a list, or several scalar arguments, to one value)
+_AGGREGATE_FUNCTIONS = {
+    "sum": lambda values: math.fsum(values) if any(isinstance(v, float) for v in values) else sum(values),
+    "fsum": math.fsum,
+    "prod": _safe_prod,
+    "min": min,
+    "max": max,
+    "len": len,
+    "mean": _mean,
+}
+
+_CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau, "inf": math.inf, "nan": math.nan}
+
+
+# Vectorized application --------------------------------------------------------------------------------------------------------------------------
+def _broadcast(fn, *args):
+    # Apply fn element-wise when any argument is a list; scalars are broadcast
+    lengths = {len(a) for a in args if isinstance(a, list)}
+    if not lengths:
+        return fn(*args)
+    if len(lengths) > 1:
+        raise CalculationError("List operands must have the same length")
+    length = lengths.pop()
+    columns = [a if isinstance(a, list) else [a] * length for a in args]
+    return [fn(*row) for row in zip(*columns)]
+
+
+# Compiler ----------------------------------------------------------------------------------------------------------------------------------------
+def _compile_node(node):
+    # Translate a validated AST node into a closure taking a _Budget
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (int, float)):
+            raise CalculationError(f"Literal not supported: {node.value!r}")
+        value = _check_value(node.value)
+        return lambda budget: value
+
+    if isinstance(node, ast.Name):
+        if node.id not in _CONSTANTS:
+            raise CalculationError(f"Unknown name: {node.id}")
+        value = _CONSTANTS[node.id]
+        return lambda budget: value
+
+    if isinstance(node, ast.Attribute):
+        # Only math.<constant> is allowed as a bare attribute
+        if isinstance(node.value, ast.Name) and node.value.id == "math" and node.attr in _CONSTANTS:
+            value = _CONSTANTS[node.attr]
+            return lambda budget: value
+        raise CalculationError("Attribute access is not supported")
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        if len(node.elts) > MAX_SEQUENCE_LENGTH:
+            raise CalculationError(f"List exceeds {MAX_SEQUENCE_LENGTH} elements")
+        items = [_compile_node(elt) for elt in node.elts]
+
+        def build_list(budget):
+            budget.check()
+            values = [item(budget) for item in items]
+            if any(isinstance(v, list) for v in values):
+                raise CalculationError("Nested lists are not supported")
+            return values
+        return build_list
+
+    if isinstance(node, ast.BinOp):
+        op = _BINARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise CalculationError(f"Operator not supported: {type(node.op).__name__}")
+        left, right = _compile_node(node.left), _compile_node(node.right)
+
+        def binary(budget):
+            budget.check()
+            return _check_value(_broadcast(op, left(budget), right(budget)))
+        return binary
+
+    if isinstance(node, ast.UnaryOp):
+        op = _UNARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise CalculationError(f"Operator not supported: {type(node.op).__name__}")
+        operand = _compile_node(node.operand)
+
+        def unary(budget):
+            budget.check()
+            return _broadcast(op, operand(budget))
+        return unary
+
+    if isinstance(node, ast.Call):
+        if node.keywords:
+            raise CalculationError("Keyword arguments are not supported")
+        name = _function_name(node.func)
+        if name not in _AGGREGATE_FUNCTIONS and name not in _ELEMENTWISE_FUNCTIONS:
+            raise CalculationError(f"Function not supported: {name}")
+        args = [_compile_node(arg) for arg in node.args]
+
+        if name in _AGGREGATE_FUNCTIONS:
+            fn = _AGGREGATE_FUNCTIONS[name]
+
+            def aggregate(budget):
+                budget.check()
+                values = [arg(budget) for arg in args]
+                if len(values) == 1 and isinstance(values[0], list):
+                    values = values[0]
+                elif any(isinstance(v, list) for v in values):
+                    raise CalculationError(f"{name}() takes a single list or several numbers")
+                return _check_value(fn(values))
+            return aggregate
+
+        fn = _ELEMENTWISE_FUNCTIONS[name]
+
+        def elementwise(budget):
+            budget.check()
+            return _check_value(_broadcast(fn, *[arg(budget) for arg in args]))
+        return elementwise
+
+    raise CalculationError(f"Syntax not supported: {type(node).__name__}")
+
+
+def _function_name(func):
+    # Accept both sqrt(x) and math.sqrt(x)
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == "math":
+        return func.attr
+    raise CalculationError("Only math functions can be called")
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_expression(expression: str):
+    "Parse, validate and compile an expression; results are cached by expression text."
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculationError(f"Expression exceeds {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise CalculationError(f"Invalid expression: {e.msg}") from None
+    if sum(1 for _ in ast.walk(tree)) > MAX_AST_NODES:
+        raise CalculationError(f"Expression exceeds {MAX_AST_NODES} syntax nodes")
+    return _compile_node(tree.body)
+
+
+def evaluate(expression: str, time_budget: float = TIME_BUDGET_SECONDS):
+    "Evaluate an arithmetic expression safely and return an int, float or list of numbers."
+    compiled = compile_expression(expression)
+    try:
+        return compiled(_Budget(time_budget))
+    except CalculationError:
+        raise
+    except (ArithmeticError, ValueError, TypeError) as e:
+        raise CalculationError(str(e)) from None
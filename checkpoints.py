@@ -0,0 +1,150 @@
+import hashlib
+import os
+import threading
+import time
+
+from metrics import counter
+
+# Durable LangGraph checkpoints so a failed turn resumes instead of starting over. Each graph turn
+# runs on its own checkpoint thread, "<session_id>:turn:<history length>:<digest of the message>",
+# stored next to the chat history (SQLite file or Postgres database, see create_checkpointer in
+# memory.py / memory_postgres.py). A turn that fails (LLM timeout, crash, ...) saves no history, so
+# when the client retries the same message the thread id is the same and the graph continues from
+# the last completed node: tool results and earlier LLM calls are not repeated. Threads are deleted
+# as soon as their turn's graph finishes, before the reply is saved, so only unfinished turns are ever
+# resumed and a stored reply is never replayed; threads of turns that are never retried are deleted after
+# CHECKPOINT_TTL_SECONDS by a background prune every CHECKPOINT_PRUNE_INTERVAL_SECONDS.
+# Off by default (CHECKPOINT_ENABLED=1 turns it on): every turn then costs a checkpoint read and at
+# least one write, see benchmarks/bench_checkpoint_overhead.py. CHECKPOINT_DURABILITY is LangGraph's
+# durability mode:
+#   exit  - one write when the turn finishes or fails (default); enough to resume after an LLM or tool
+#           error, but a worker that dies mid-turn leaves nothing to resume from
+#   async - a checkpoint after every node, written in the background; also survives a worker crash
+#   sync  - like async, but each node waits for its checkpoint to be written
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "0") == "1"
+CHECKPOINT_DURABILITY = os.getenv("CHECKPOINT_DURABILITY", "exit")
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(24 * 3600)))
+CHECKPOINT_PRUNE_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL_SECONDS", "3600"))
+# When the checkpoint database cannot be reached, turns run without checkpoints and connecting is retried after this long
+CHECKPOINT_RETRY_SECONDS = float(os.getenv("CHECKPOINT_RETRY_SECONDS", "30"))
+CHECKPOINT_PRUNE_BATCH = int(os.getenv("CHECKPOINT_PRUNE_BATCH", "500"))  # expired threads looked up and deleted per query
+
+CHECKPOINT_RESUMES = counter("agent_checkpoint_resumes_total", "Turns resumed from a checkpoint, by next node", ["node"])
+CHECKPOINT_DELETED = counter("agent_checkpoint_threads_deleted_total", "Checkpoint threads deleted", ["reason"])
+CHECKPOINT_ERRORS = counter("agent_checkpoint_errors_total", "Checkpoint database failures; the turn ran without checkpoints", ["stage"])
+
+_checkpointer = None
+_checkpointer_pid = None
+_unavailable = False
+_retry_at = 0.0
+_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def get_checkpointer(factory):
+    """This process's checkpointer, built by factory() on first use; None when checkpointing is off or
+    the database is unreachable (retried after CHECKPOINT_RETRY_SECONDS). Rebuilt after fork, since
+    its database connection cannot be shared with the parent."""
+    global _checkpointer, _checkpointer_pid, _unavailable, _retry_at
+    if not CHECKPOINT_ENABLED or _unavailable:
+        return None
+    if _checkpointer is None or _checkpointer_pid != os.getpid():
+        with _lock:
+            if _checkpointer is None or _checkpointer_pid != os.getpid():
+                if time.monotonic() < _retry_at:
+                    return None
+                try:
+                    _checkpointer = factory()
+                except ImportError as e:
+                    print(f"Turn checkpointing disabled: {e}")
+                    _unavailable = True
+                    return None
+                except Exception as e:
+                    # Bad DSN, Postgres down, locked or unwritable SQLite file: serve turns without checkpoints
+                    CHECKPOINT_ERRORS.inc(stage="connect")
+                    print(f"Checkpoint database unavailable, running turns without checkpoints for "
+                          f"{CHECKPOINT_RETRY_SECONDS:.0f}s: {e}")
+                    _checkpointer = None
+                    _retry_at = time.monotonic() + CHECKPOINT_RETRY_SECONDS
+                    return None
+                _checkpointer_pid = os.getpid()
+    return _checkpointer
+
+
+def turn_thread_id(session_id: str, history_length: int, user_input: str) -> str:
+    "Same id for a retry of the same message on the same history, so the retry finds the failed turn's checkpoints."
+    digest = hashlib.sha256(user_input.encode()).hexdigest()[:16]
+    return f"{session_id}:turn:{history_length}:{digest}"
+
+
+def finish_turn(checkpointer, thread_id: str, expired_threads):
+    """Drop a completed turn's checkpoints and prune now and then. Called before the reply is saved to
+    the chat history: if saving fails the retry runs the turn again instead of replaying a stored reply.
+    A failed delete does not fail the turn; the thread is discarded on a retry or pruned later."""
+    try:
+        checkpointer.delete_thread(thread_id)
+    except Exception as e:
+        CHECKPOINT_ERRORS.inc(stage="delete")
+        print(f"Could not delete checkpoints of {thread_id}: {e}")
+        return
+    CHECKPOINT_DELETED.inc(reason="completed")
+    maybe_prune(checkpointer, expired_threads)
+
+
+def discard_turn(checkpointer, thread_id: str) -> bool:
+    """Drop a finished thread found at the start of a turn (its cleanup failed); the turn starts over.
+    False when the delete fails: the caller runs the turn without checkpoints rather than on top of the
+    stale thread, and the thread is pruned later."""
+    try:
+        checkpointer.delete_thread(thread_id)
+    except Exception as e:
+        CHECKPOINT_ERRORS.inc(stage="discard")
+        print(f"Could not discard checkpoints of {thread_id}: {e}")
+        return False
+    CHECKPOINT_DELETED.inc(reason="stale")
+    return True
+
+
+def checkpoint_id_at(timestamp: float) -> str:
+    """Lowest checkpoint id LangGraph can generate at timestamp. Checkpoint ids are uuid6 strings, which
+    sort by creation time, so "checkpoint_id < checkpoint_id_at(t)" selects checkpoints written before t."""
+    from langgraph.checkpoint.base.id import UUID
+    ticks = int(timestamp * 10_000_000) + 0x01B21DD213814000  # 100ns intervals since 1582-10-15, as in uuid6()
+    return str(UUID(int=((ticks >> 12) & 0xFFFFFFFFFFFF) << 80 | (ticks & 0x0FFF) << 64, version=6))
+
+
+def prune_expired(checkpointer, expired_threads, max_age: float = CHECKPOINT_TTL_SECONDS,
+                  batch_size: int = CHECKPOINT_PRUNE_BATCH) -> int:
+    """Delete threads whose newest checkpoint is older than max_age seconds; returns how many.
+    expired_threads(checkpointer, before_checkpoint_id, limit) is the history backend's query for such
+    threads (memory.py / memory_postgres.py); it reads thread and checkpoint ids from the primary-key
+    index only, and threads are deleted batch_size at a time."""
+    before = checkpoint_id_at(time.time() - max_age)
+    pruned = 0
+    while True:
+        batch = expired_threads(checkpointer, before, batch_size)
+        for thread_id in batch:
+            checkpointer.delete_thread(thread_id)
+        pruned += len(batch)
+        CHECKPOINT_DELETED.inc(len(batch), reason="expired")
+        if len(batch) < batch_size:
+            return pruned
+
+
+def _prune_in_background(checkpointer, expired_threads):
+    try:
+        pruned = prune_expired(checkpointer, expired_threads)
+        if pruned:
+            print(f"Pruned {pruned} expired checkpoint threads")
+    except Exception as e:
+        print(f"Checkpoint prune failed: {e}")
+
+
+def maybe_prune(checkpointer, expired_threads):
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < CHECKPOINT_PRUNE_INTERVAL_SECONDS:
+        return
+    _last_prune = now
+    threading.Thread(target=_prune_in_background, args=(checkpointer, expired_threads), name="checkpoint-prune",
+                     daemon=True).start()
@@ -0,0 +1,159 @@
+import math
+import os
+import re
+
+from metrics import counter, histogram
+
+# Token-budgeted context for knowledge-base results. Raw search hits are 1000-char chunks with a
+# 200-char overlap, and whatever the tool returns is re-read by the LLM on every later loop
+# iteration, so before returning them the assembler:
+#   1. merges chunks from the same file and page that overlap or touch (start_index metadata from
+#      ingestion, checked against the overlapping text, or a suffix/prefix match for older indexes) and
+#      drops duplicates,
+#   2. keeps the sentences most relevant to the query (term overlap weighted by rarity), in their
+#      original order,
+#   3. stops at CONTEXT_TOKEN_BUDGET tokens across all passages, best-ranked passage first.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+CONTEXT_MAX_SENTENCES = int(os.getenv("CONTEXT_MAX_SENTENCES", "6"))  # per passage
+MAX_OVERLAP_CHARS = 400
+
+CONTEXT_TOKENS = counter("agent_context_tokens_total", "Knowledge-base context tokens before and after assembly", ["stage"])
+CONTEXT_SAVED = histogram("agent_context_tokens_saved", "Tokens removed from one knowledge-base result by assembly", [],
+                          buckets=(0, 50, 100, 200, 400, 800, 1600, 3200))
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or that the this to was what when where "
+    "which who why will with you your".split()
+)
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    "Token count with tiktoken (cl100k_base) when installed, else a 4-characters-per-token estimate."
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def _terms(text: str):
+    return [w for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    "The longest prefix of text (by tokens, as count_tokens counts them) that fits in budget tokens."
+    count_tokens("")  # loads the encoding
+    if not _encoding:
+        return text[: budget * 4]
+    tokens = _encoding.encode(text, disallowed_special=())
+    while tokens:
+        prefix = _encoding.decode(tokens[:budget])
+        if count_tokens(prefix) <= budget:
+            return prefix
+        budget -= 1
+    return ""
+
+
+def _agrees(left: str, offset: int, right: str) -> bool:
+    "Whether right, placed offset characters into left, matches left where the two overlap."
+    return left[offset:offset + len(right)] == right[:len(left) - offset]
+
+
+def _overlap(left: str, right: str) -> int:
+    "Length of the longest suffix of left that is a prefix of right (bounded by MAX_OVERLAP_CHARS)."
+    for size in range(min(len(left), len(right), MAX_OVERLAP_CHARS), 20, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_chunks(results):
+    """Merge overlapping/adjacent chunks of the same file and page and drop duplicates.
+    results: [{"content", "metadata", "score"}] in rank order. Returns passages in rank order of their best chunk.
+    Chunks are grouped by metadata "file" (set at ingestion), or "source" for indexes built before it; since
+    a source can name a whole directory, start_index positions are only trusted when the overlapping text
+    agrees."""
+    passages = []
+    for rank, result in enumerate(results):
+        text = result["content"]
+        metadata = result.get("metadata") or {}
+        key = (metadata.get("file", metadata.get("source")), metadata.get("page"))
+        start = metadata.get("start_index")
+        for passage in passages:
+            if passage["key"] != key:
+                continue
+            if text in passage["text"]:
+                break  # duplicate or contained chunk
+            if start is not None and passage["start"] is not None:
+                end = passage["start"] + len(passage["text"])
+                if passage["start"] <= start <= end and _agrees(passage["text"], start - passage["start"], text):
+                    passage["text"] += text[end - start:]
+                    break
+                if (start <= passage["start"] <= start + len(text)
+                        and _agrees(text, passage["start"] - start, passage["text"])):
+                    passage["text"] = text + passage["text"][start + len(text) - passage["start"]:]
+                    passage["start"] = start
+                    break
+            elif _overlap(passage["text"], text):
+                passage["text"] += text[_overlap(passage["text"], text):]
+                break
+            elif _overlap(text, passage["text"]):
+                passage["text"] = text + passage["text"][_overlap(text, passage["text"]):]
+                break
+        else:
+            passages.append({"key": key, "start": start, "text": text, "rank": rank, "metadata": metadata})
+    return passages
+
+
+def select_sentences(text: str, query: str, max_sentences: int = CONTEXT_MAX_SENTENCES):
+    "The passage's most query-relevant sentences, in original order."
+    sentences = [s.strip() for s in SENTENCE_SPLIT.split(text) if s.strip()]
+    if len(sentences) <= max_sentences:
+        return sentences
+    query_terms = set(_terms(query))
+    sentence_terms = [set(_terms(s)) for s in sentences]
+    # Rarer query terms within the passage count for more
+    document_frequency = {t: sum(t in terms for terms in sentence_terms) for t in query_terms}
+    scores = [
+        sum(math.log(1 + len(sentences) / document_frequency[t]) for t in query_terms & terms if document_frequency[t])
+        for terms in sentence_terms
+    ]
+    keep = sorted(sorted(range(len(sentences)), key=lambda i: (-scores[i], i))[:max_sentences])
+    return [sentences[i] for i in keep]
+
+
+def assemble_context(results, query: str, token_budget: int = CONTEXT_TOKEN_BUDGET):
+    """Build the tool context from search results within token_budget.
+    Returns (context, report) where report has raw_tokens, tokens and saved."""
+    raw_tokens = count_tokens("\n\n".join(r["content"] for r in results))
+    passages = sorted(merge_chunks(results), key=lambda p: p["rank"])
+    blocks, used = [], 0
+    for passage in passages:
+        kept = []
+        for sentence in select_sentences(passage["text"], query):
+            cost = count_tokens(sentence) + 1
+            if used + cost > token_budget:
+                break
+            kept.append(sentence)
+            used += cost
+        if kept:
+            blocks.append(" ".join(kept))
+    if not blocks and passages:
+        # Even the first sentence is over budget: truncate it rather than return nothing
+        blocks.append(truncate_tokens(select_sentences(passages[0]["text"], query)[0], token_budget))
+    context = "\n\n".join(blocks)
+    tokens = count_tokens(context)
+    report = {"raw_tokens": raw_tokens, "tokens": tokens, "saved": max(raw_tokens - tokens, 0)}
+    CONTEXT_TOKENS.inc(raw_tokens, stage="raw")
+    CONTEXT_TOKENS.inc(tokens, stage="assembled")
+    CONTEXT_SAVED.observe(report["saved"])
+    return context, report
@@ -0,0 +1,128 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from metrics import counter, gauge, histogram
+
+# CPU-bound request stages run outside the asyncio event loop. Regex guardrails over a 5000-character
+# input take tens of milliseconds, and while they run on the loop no other WebSocket connection is
+# served. Two executors, sized separately:
+#   - the CPU pool: CPU_POOL_WORKERS processes (no GIL sharing with the loop) for guardrail checks and
+#     any other picklable CPU-heavy function passed to run_cpu. At most CPU_POOL_MAX_PENDING jobs are
+#     queued or running; further callers wait for a slot instead of growing the queue without bound.
+#   - the I/O executor: IO_EXECUTOR_WORKERS threads, installed as the loop's default executor for the
+#     blocking agent turns, history queries and exports (run_in_executor(None, ...)).
+# Inputs shorter than CPU_POOL_INLINE_CHARS are checked inline; the process hop costs more than the check.
+# The loop-lag monitor sleeps LOOP_LAG_INTERVAL_SECONDS and records how late it wakes up, which is how
+# long the loop was blocked (agent_event_loop_lag_seconds on /metrics).
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+CPU_POOL_MAX_PENDING = int(os.getenv("CPU_POOL_MAX_PENDING", str(4 * CPU_POOL_WORKERS)))
+CPU_POOL_INLINE_CHARS = int(os.getenv("CPU_POOL_INLINE_CHARS", "256"))
+IO_EXECUTOR_WORKERS = int(os.getenv("IO_EXECUTOR_WORKERS", "32"))
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.1"))
+
+CPU_POOL_PENDING = gauge("agent_cpu_pool_pending", "Jobs queued or running in the CPU process pool")
+CPU_POOL_WAIT = histogram("agent_cpu_pool_wait_seconds", "Time spent waiting for a CPU pool slot", [])
+CPU_POOL_JOBS = counter("agent_cpu_pool_jobs_total", "CPU-bound jobs by where they ran", ["where"])
+LOOP_LAG = gauge("agent_event_loop_lag_seconds", "Most recent event-loop scheduling delay (worst worker)", aggregate="max")
+LOOP_LAG_HISTOGRAM = histogram("agent_event_loop_lag_distribution_seconds", "Event-loop scheduling delay per probe", [],
+                               buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+# Worker side ---------------------------------------------------------------------------------------------------------------------------------------
+_input_guardrails = None
+
+
+def _init_worker():
+    global _input_guardrails
+    # Forked from the uvicorn worker, which traps SIGTERM/SIGINT for its graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C reaches the whole group; the app shuts the pool down
+    from prompt_guardrail import InputGuardrails
+    _input_guardrails = InputGuardrails()
+
+
+def check_input(text: str):
+    "InputGuardrails.check_all in a pool process (the instance is built once per process)."
+    if _input_guardrails is None:
+        _init_worker()
+    return _input_guardrails.check_all(text)
+
+
+def _noop():
+    return os.getpid()
+
+
+# Pool ----------------------------------------------------------------------------------------------------------------------------------------------
+def get_cpu_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # fork: the children only run the small functions above, and the pool is started in the
+                # lifespan hook before any background threads exist (see start_executors)
+                _pool = ProcessPoolExecutor(CPU_POOL_WORKERS, mp_context=multiprocessing.get_context("fork"),
+                                            initializer=_init_worker)
+    return _pool
+
+
+async def run_cpu(fn, *args):
+    "Run fn(*args) in the CPU pool, waiting for one of CPU_POOL_MAX_PENDING slots first."
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(CPU_POOL_MAX_PENDING)
+    start = time.perf_counter()
+    async with _slots:
+        CPU_POOL_WAIT.observe(time.perf_counter() - start)
+        CPU_POOL_PENDING.inc()
+        try:
+            CPU_POOL_JOBS.inc(where="pool")
+            return await asyncio.get_running_loop().run_in_executor(get_cpu_pool(), fn, *args)
+        finally:
+            CPU_POOL_PENDING.dec()
+
+
+async def check_input_async(guardrails, text: str):
+    "Input guardrail verdict without blocking the loop: inline for short inputs, in the CPU pool otherwise."
+    if len(text) < CPU_POOL_INLINE_CHARS or CPU_POOL_WORKERS <= 0:
+        CPU_POOL_JOBS.inc(where="inline")
+        return guardrails.check_all(text)
+    return await run_cpu(check_input, text)
+
+
+# Event loop ----------------------------------------------------------------------------------------------------------------------------------------
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL_SECONDS):
+    "Record how late each sleep(interval) wakes up; runs until cancelled."
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - start - interval, 0.0)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_HISTOGRAM.observe(lag)
+
+
+def start_executors():
+    """Called at the start of the app lifespan: install the I/O executor, fork the CPU pool workers
+    and start the loop-lag monitor. Returns the monitor task."""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(IO_EXECUTOR_WORKERS, thread_name_prefix="io"))
+    if CPU_POOL_WORKERS > 0:
+        # Submitting one job makes the executor fork all of its workers now
+        get_cpu_pool().submit(_noop).result()
+    return asyncio.create_task(monitor_loop_lag())
+
+
+def shutdown_executors():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)  # without waiting the forked workers can outlive the app
+        _pool = None
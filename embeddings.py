@@ -0,0 +1,185 @@
+import os
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+# Shared HuggingFace embedding model. Loading it pulls in PyTorch and the model weights, so it is
+# built on first use (or by the startup warm-up) instead of at import time.
+#   EMBEDDING_BACKEND=huggingface - all-mpnet-base-v2 via sentence-transformers (default)
+#   EMBEDDING_BACKEND=onnx        - the same model exported to ONNX and run by ONNX Runtime, optionally
+#                                   with dynamic int8 quantization (EMBEDDING_ONNX_QUANTIZATION)
+#   EMBEDDING_BACKEND=fake        - deterministic hash vectors, for benchmarks without the model
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface").lower()
+EMBEDDING_DIMENSION = 768
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+# ONNX backend: the model is exported once to EMBEDDING_ONNX_PATH (see export_onnx_model) and loaded from there.
+# EMBEDDING_ONNX_QUANTIZATION: none (fp32), auto (int8 for this CPU) or avx2 | avx512 | avx512_vnni | arm64
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", "onnx_models/all-mpnet-base-v2")
+EMBEDDING_ONNX_QUANTIZATION = os.getenv("EMBEDDING_ONNX_QUANTIZATION", "none").lower()
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))  # intra-op threads, 0 = one per available core
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def build_embeddings(backend: str = None):
+    "Construct the embedding model for the given backend (defaults to EMBEDDING_BACKEND)."
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=EMBEDDING_DIMENSION)
+    if backend == "onnx":
+        return build_onnx_embeddings()
+    if backend != "huggingface":
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    # Fully local HuggingFace model, no API calls
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True, 'batch_size': EMBEDDING_BATCH_SIZE}
+    )
+
+
+# ONNX Runtime backend -------------------------------------------------------------------------------------------------------------------
+def detect_quantization_config() -> str:
+    "Pick the int8 kernel set for this CPU from /proc/cpuinfo."
+    import platform
+    if platform.machine().lower() in ("aarch64", "arm64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return "avx2"
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def onnx_file_name(quantization: str = None) -> str:
+    "Model file inside EMBEDDING_ONNX_PATH for the given quantization setting."
+    quantization = (quantization or EMBEDDING_ONNX_QUANTIZATION).lower()
+    if quantization == "none":
+        return "onnx/model.onnx"
+    if quantization == "auto":
+        quantization = detect_quantization_config()
+    return f"onnx/model_qint8_{quantization}.onnx"
+
+
+def export_onnx_model(path: str = EMBEDDING_ONNX_PATH, quantization: str = None) -> str:
+    "Export the embedding model to ONNX under path, plus a dynamically int8-quantized copy unless quantization is none."
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    quantization = (quantization or EMBEDDING_ONNX_QUANTIZATION).lower()
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu", backend="onnx")
+    model.save_pretrained(path)
+    if quantization != "none":
+        config = detect_quantization_config() if quantization == "auto" else quantization
+        export_dynamic_quantized_onnx_model(model, quantization_config=config, model_name_or_path=path)
+    return os.path.join(path, onnx_file_name(quantization))
+
+
+def onnx_session_options(threads: int = EMBEDDING_ONNX_THREADS):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = threads or len(os.sched_getaffinity(0))
+    options.inter_op_num_threads = 1
+    return options
+
+
+class ForkSafeEmbeddings(Embeddings):
+    """Embeddings built on first use in each process. ONNX Runtime starts its thread pool when the
+    session is created and that pool does not survive fork, so the pre-fork launcher can preload this
+    wrapper (and the FAISS index holding it) while every worker creates its own session."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._model = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None and self._pid == os.getpid()
+
+    def load(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self._model = self._factory()
+                    self._pid = os.getpid()
+        return self._model
+
+    def embed_documents(self, texts):
+        return self.load().embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.load().embed_query(text)
+
+    async def aembed_documents(self, texts):
+        return await self.load().aembed_documents(texts)
+
+    async def aembed_query(self, text):
+        return await self.load().aembed_query(text)
+
+
+def build_onnx_embeddings(path: str = EMBEDDING_ONNX_PATH, quantization: str = None, threads: int = EMBEDDING_ONNX_THREADS):
+    "Fork-safe ONNX Runtime embeddings; see load_onnx_embeddings."
+    return ForkSafeEmbeddings(lambda: load_onnx_embeddings(path, quantization, threads))
+
+
+def load_onnx_embeddings(path: str = EMBEDDING_ONNX_PATH, quantization: str = None, threads: int = EMBEDDING_ONNX_THREADS):
+    """ONNX Runtime embeddings with the same interface and normalized outputs as the PyTorch backend.
+    sentence-transformers sorts each encode() call by text length and pads per batch, so batches of
+    short queries are not padded to the longest chunk in the corpus."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    file_name = onnx_file_name(quantization)
+    if not os.path.exists(os.path.join(path, file_name)):
+        print(f"Exporting {EMBEDDING_MODEL_NAME} to ONNX at {path} (one-time)")
+        export_onnx_model(path, quantization)
+    return HuggingFaceEmbeddings(
+        model_name=path,
+        model_kwargs={
+            'device': 'cpu',
+            'backend': 'onnx',
+            'model_kwargs': {
+                'file_name': file_name,
+                'provider': 'CPUExecutionProvider',
+                'session_options': onnx_session_options(threads),
+            },
+        },
+        encode_kwargs={'normalize_embeddings': True, 'batch_size': EMBEDDING_BATCH_SIZE}
+    )
+
+
+def get_embeddings():
+    "Return the shared embedding model, loading it on first use."
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                _embeddings = build_embeddings()
+    return _embeddings
+
+
+def warm_up_embeddings():
+    "Load the shared model, including a lazily created runtime (ONNX session) in this process."
+    embeddings = get_embeddings()
+    if isinstance(embeddings, ForkSafeEmbeddings):
+        embeddings.load()
+    return embeddings
+
+
+def is_embeddings_loaded() -> bool:
+    if isinstance(_embeddings, ForkSafeEmbeddings):
+        return _embeddings.loaded
+    return _embeddings is not None
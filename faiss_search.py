@@ -1,45 +1,121 @@
 import os
-from dotenv import load_dotenv  
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import threading
+import time
+from dotenv import load_dotenv
+
+from embeddings import get_embeddings
+from metrics import VECTOR_SEARCH_LATENCY
 
 load_dotenv()
 SQLITE_DB_PATH ="chat_history.db"
-FAISS_INDEX_PATH = "faiss_index"
+FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH", "faiss_index")
+RETRIEVAL_SERVICE_URL = os.getenv("RETRIEVAL_SERVICE_URL", "")
+
+# The loaded index is kept for the life of the process instead of being re-read on every search.
+# Ingestion publishes new versions atomically (see index_snapshots.py); every FAISS_RELOAD_CHECK_SECONDS
+# a search checks the CURRENT pointer and, if it moved, loads the new version in a background thread
+# while searches keep using the old one, then swaps the reference.
+FAISS_RELOAD_CHECK_SECONDS = float(os.getenv("FAISS_RELOAD_CHECK_SECONDS", "5"))
 
-# Initialize Embeddings
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-mpnet-base-v2",  
-    model_kwargs={'device': 'cpu'}, 
-    encode_kwargs={'normalize_embeddings': True}
-)
+_vector_store = None
+_vector_store_version = None
+_vector_store_loaded = False
+_vector_store_lock = threading.Lock()
+_last_version_check = 0.0
+_reloading = False
 
 def initialize_faiss_vector_store():
-    # Initialize or load FAISS vector store
+    # Initialize or load FAISS vector store (the CURRENT snapshot version, or a legacy flat index)
+    global _vector_store_version
+    from index_snapshots import load
+    vector_store = None
     try:
         # Try to load existing index
         if os.path.exists(FAISS_INDEX_PATH):
             print(f"Loading existing FAISS index from {FAISS_INDEX_PATH}")
-            vector_store = FAISS.load_local(
-                FAISS_INDEX_PATH, 
-                embeddings,
-                allow_dangerous_deserialization=True  # Required for loading pickled files
-            )
-            print(f"FAISS index loaded successfully")
+            vector_store, _vector_store_version = load(FAISS_INDEX_PATH, get_embeddings())
+        if vector_store is not None:
+            from vector_storage import storage_of
+            # float16/PCA indexes carry their transform, so queries are reduced the same way automatically
+            print(f"FAISS index {_vector_store_version or '(unversioned)'} loaded successfully "
+                  f"({vector_store.index.ntotal} vectors, {storage_of(vector_store.index)} storage)")
         else:
             print("FAISS index not found, need to create a new one with an initial sample document")
         return vector_store
-    
+
     except Exception as e:
         print(f"Error initializing FAISS: {e}")
         raise
 
+def _reload_in_background():
+    global _vector_store, _reloading
+    try:
+        vector_store = initialize_faiss_vector_store()
+        if vector_store is not None:
+            _vector_store = vector_store  # single reference swap; in-flight searches finish on the old index
+    except Exception as e:
+        print(f"Keeping the loaded FAISS index, reload failed: {e}")
+    finally:
+        _reloading = False
+
+def _maybe_reload():
+    global _last_version_check, _reloading
+    now = time.monotonic()
+    if FAISS_RELOAD_CHECK_SECONDS <= 0 or now - _last_version_check < FAISS_RELOAD_CHECK_SECONDS:
+        return
+    _last_version_check = now
+    from index_snapshots import current_version
+    version = current_version(FAISS_INDEX_PATH)
+    if version is None or version == _vector_store_version:
+        return
+    with _vector_store_lock:
+        if _reloading:
+            return
+        _reloading = True
+    threading.Thread(target=_reload_in_background, name="faiss-reload", daemon=True).start()
+
+def get_local_vector_store():
+    # The in-process FAISS store, loaded on first use and refreshed when a new version is published
+    global _vector_store, _vector_store_loaded, _last_version_check
+    if not _vector_store_loaded:
+        with _vector_store_lock:
+            if not _vector_store_loaded:
+                _vector_store = initialize_faiss_vector_store()
+                _last_version_check = time.monotonic()
+                _vector_store_loaded = True
+        return _vector_store
+    _maybe_reload()
+    return _vector_store
+
+def get_vector_store():
+    # Return the shared FAISS vector store, loading it on first use.
+    # With RETRIEVAL_SERVICE_URL set it is a thin client of retrieval_service.py instead of a local index
+    global _vector_store, _vector_store_loaded
+    if not RETRIEVAL_SERVICE_URL:
+        return get_local_vector_store()
+    if not _vector_store_loaded:
+        with _vector_store_lock:
+            if not _vector_store_loaded:
+                from retrieval_service import RemoteVectorStore
+                _vector_store = RemoteVectorStore(RETRIEVAL_SERVICE_URL)
+                print(f"Using retrieval service at {RETRIEVAL_SERVICE_URL} ({_vector_store.health()['ntotal']} vectors)")
+                _vector_store_loaded = True
+    return _vector_store
+
+def is_vector_store_loaded() -> bool:
+    return _vector_store_loaded
+
 def search_result(vector_store, query: str, k: int = 2):
     # Perform similarity search on the FAISS vector store
     if vector_store is None:
         raise ValueError("FAISS vector store is not initialized.")
-    
-    results = vector_store.similarity_search_with_score(query, k=k)
+
+    # Deleted chunks stay in the index until compaction; over-fetch and drop them
+    tombstones = getattr(vector_store, "tombstones", ())
+    with VECTOR_SEARCH_LATENCY.time():
+        results = vector_store.similarity_search_with_score(query, k=k + len(tombstones))
+    if tombstones:
+        results = [(doc, score) for doc, score in results if doc.id not in tombstones][:k]
     if not results:
         return "No relevant information found in the knowledge base."
     source_results=[]
@@ -0,0 +1,193 @@
+import json
+import os
+import re
+import threading
+
+from metrics import counter, histogram
+
+# Pre-graph fast path. Requests with a deterministic answer skip the LangGraph loop (and its two
+# LLM calls) and are answered directly:
+#   1. rules     - pure arithmetic with an explicit cue ("what is 17*23.5", "calculate (4+8)/3",
+#                  "17*23=", "2+2?") goes straight to the calculate tool in toolkit.py. A bare
+#                  expression is not enough: "2024-1-15", "12/25" or "555-1234" are dates and phone
+#                  numbers, and date/phone-shaped bodies are refused even with a cue,
+#   2. FAQ       - an exact (normalized) match against FAQ_PATH, else a nearest-neighbour classifier
+#                  over the FAQ questions embedded once with the shared mpnet model; it answers only
+#                  when the best match clears FAST_ROUTER_FAQ_THRESHOLD and beats the runner-up by
+#                  FAST_ROUTER_FAQ_MARGIN. The input is only embedded when it shares at least
+#                  FAST_ROUTER_FAQ_MIN_OVERLAP of its content words (Jaccard) with a FAQ question, so
+#                  ordinary turns don't pay for an embedding before the graph runs,
+#   3. otherwise the graph runs as before.
+# FAQ_PATH is a JSON list of {"questions": [...], "answer": "..."} (a single "question" also works);
+# without the file only the arithmetic rule is active. FAST_ROUTER_ENABLED=0 turns the router off.
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "1") == "1"
+FAQ_PATH = os.getenv("FAQ_PATH", "faq.json")
+FAST_ROUTER_FAQ_THRESHOLD = float(os.getenv("FAST_ROUTER_FAQ_THRESHOLD", "0.92"))
+FAST_ROUTER_FAQ_MARGIN = float(os.getenv("FAST_ROUTER_FAQ_MARGIN", "0.03"))
+FAST_ROUTER_FAQ_MIN_OVERLAP = float(os.getenv("FAST_ROUTER_FAQ_MIN_OVERLAP", "0.3"))
+
+ROUTE_DECISIONS = counter("agent_fast_route_total", "Turns by route taken (calculate/faq answered without the LLM, graph otherwise)", ["route"])
+TURN_LATENCY = histogram("agent_turn_latency_seconds", "Latency of a whole agent turn by path", ["path"])
+FAQ_LOOKUPS = counter("agent_fast_route_faq_lookups_total", "FAQ lookups by how far they got (exact, skipped by the word filter, embedded)", ["stage"])
+
+ARITHMETIC_PREFIX = re.compile(
+    r"^\s*(?:please\s+)?(?:what\s+is|what's|whats|how\s+much\s+is|calculate|compute|evaluate|solve)\s*:?\s*", re.IGNORECASE)
+ARITHMETIC_CUE_SUFFIX = re.compile(r"\s*(?:=\s*\??|\?)\s*$")
+ARITHMETIC_SUFFIX = re.compile(r"\s*\.?\s*$")
+ARITHMETIC_BODY = re.compile(r"^[\d\s.()+\-*/%]+$")
+ARITHMETIC_OPERATOR = re.compile(r"\d\s*(?:\*\*|//|[+\-*/%])\s*[\d(.-]")
+# Bodies that read as a date (2024-1-15, 12/25) or a phone number (555-1234, (555) 123-4567), not a calculation
+NOT_ARITHMETIC = re.compile(r"^(?:\d{1,4}[-/]\d{1,2}(?:[-/]\d{1,4})?|(?:\+?\d{1,3}[\s-])?(?:\(\d{3}\)\s*|\d{3}[\s-])?\d{3}-\d{4})$")
+TIMES = re.compile(r"(?<=[\d)\s])[x×](?=[\s\d(])")
+NORMALIZE = re.compile(r"[^a-z0-9]+")
+# Left out of the FAQ word filter: nearly every question has them
+STOP_WORDS = frozenset(
+    "a an and are can could do does for how i in is it me my of on or please the to what when where which who why "
+    "you your".split())
+
+
+def _normalize(text: str) -> str:
+    return NORMALIZE.sub(" ", text.lower()).strip()
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(_normalize(text).split()) - STOP_WORDS
+
+
+def arithmetic_expression(text: str):
+    """The arithmetic expression if text is nothing but a calculation asked for explicitly (a "what is" /
+    "calculate" prefix, or a trailing "=" or "?"), else None."""
+    body, prefixed = ARITHMETIC_PREFIX.subn("", text, count=1)
+    body, suffixed = ARITHMETIC_CUE_SUFFIX.subn("", body)
+    if not (prefixed or suffixed):
+        return None
+    body = TIMES.sub("*", ARITHMETIC_SUFFIX.sub("", body)).replace("÷", "/").strip()
+    if body and ARITHMETIC_BODY.match(body) and ARITHMETIC_OPERATOR.search(body) and not NOT_ARITHMETIC.match(body):
+        return body
+    return None
+
+
+class FAQIndex:
+    "FAQ questions with their embeddings; lookups by exact normalized text, then cosine similarity."
+
+    def __init__(self, entries, embeddings):
+        self.questions, self.answers = [], []
+        for entry in entries:
+            for question in entry.get("questions") or [entry["question"]]:
+                self.questions.append(question)
+                self.answers.append(entry["answer"])
+        self.exact = {_normalize(q): a for q, a in zip(self.questions, self.answers)}
+        self.words = [_words(q) for q in self.questions]
+        self.embeddings = embeddings
+        self.matrix = self._unit_rows(embeddings.embed_documents(self.questions)) if self.questions else None
+
+    @staticmethod
+    def _unit_rows(vectors):
+        import numpy as np
+        matrix = np.asarray(vectors, dtype="float32")
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    def word_overlap(self, text: str) -> float:
+        "Best Jaccard similarity between the content words of text and those of any FAQ question."
+        words = _words(text)
+        if not words:
+            return 0.0
+        return max((len(words & q) / len(words | q) for q in self.words), default=0.0)
+
+    def match(self, text: str, threshold: float = FAST_ROUTER_FAQ_THRESHOLD, margin: float = FAST_ROUTER_FAQ_MARGIN,
+              min_overlap: float = FAST_ROUTER_FAQ_MIN_OVERLAP):
+        "(answer, score) for a confident match, else (None, best score); the score is 0.0 when nothing was embedded."
+        answer = self.exact.get(_normalize(text))
+        if answer is not None:
+            FAQ_LOOKUPS.inc(stage="exact")
+            return answer, 1.0
+        if self.matrix is None:
+            return None, 0.0
+        # A paraphrase close enough to clear the cosine threshold shares most of its words with the question
+        if self.word_overlap(text) < min_overlap:
+            FAQ_LOOKUPS.inc(stage="skipped")
+            return None, 0.0
+        FAQ_LOOKUPS.inc(stage="embedded")
+        scores = self.matrix @ self._unit_rows(self.embeddings.embed_query(text))[0]
+        order = scores.argsort()[::-1]
+        best = float(scores[order[0]])
+        # The runner-up only counts against the best match when it points at a different answer
+        runner_up = next((float(scores[i]) for i in order[1:] if self.answers[i] != self.answers[order[0]]), -1.0)
+        if best >= threshold and best - runner_up >= margin:
+            return self.answers[order[0]], best
+        return None, best
+
+
+_faq_index = None
+_faq_loaded = False
+_faq_lock = threading.Lock()
+
+
+def get_faq_index():
+    "The FAQ index, built on first use; None when FAQ_PATH does not exist or is empty."
+    global _faq_index, _faq_loaded
+    if not _faq_loaded:
+        with _faq_lock:
+            if not _faq_loaded:
+                if os.path.exists(FAQ_PATH):
+                    with open(FAQ_PATH, encoding="utf-8") as f:
+                        entries = json.load(f)
+                    if entries:
+                        from embeddings import get_embeddings
+                        _faq_index = FAQIndex(entries, get_embeddings())
+                        print(f"Fast router: {len(_faq_index.questions)} FAQ questions loaded from {FAQ_PATH}")
+                _faq_loaded = True
+    return _faq_index
+
+
+def is_faq_loaded() -> bool:
+    return _faq_loaded
+
+
+def route(text: str):
+    """Answer text without the LLM if possible. Returns (route, answer) with route "calculate" or "faq",
+    or ("graph", None) when the request needs the agent."""
+    if not FAST_ROUTER_ENABLED:
+        return "graph", None
+    expression = arithmetic_expression(text)
+    if expression is not None:
+        from toolkit import calculate
+        result = calculate.invoke({"expression": expression})
+        if not result.startswith("Error"):
+            return "calculate", result
+    faq = get_faq_index()
+    if faq is not None:
+        answer, _ = faq.match(text)
+        if answer is not None:
+            return "faq", answer
+    return "graph", None
+
+
+def routing_report() -> dict:
+    "Share of turns served by the fast path and the latency it saved, from this process's metrics."
+    fast_routes = ("calculate", "faq")
+    counts = {r: int(ROUTE_DECISIONS.value(route=r)) for r in fast_routes + ("graph",)}
+    total = sum(counts.values())
+    fast_count, fast_seconds = TURN_LATENCY.snapshot(path="fast")
+    graph_count, graph_seconds = TURN_LATENCY.snapshot(path="graph")
+    fast_mean = fast_seconds / fast_count if fast_count else 0.0
+    graph_mean = graph_seconds / graph_count if graph_count else 0.0
+    return {
+        "turns": total,
+        "routes": counts,
+        "fast_share": (total - counts["graph"]) / total if total else 0.0,
+        "fast_mean_seconds": fast_mean,
+        "graph_mean_seconds": graph_mean,
+        # Each fast turn would otherwise have cost about one average graph turn
+        "saved_seconds": fast_count * max(graph_mean - fast_mean, 0.0) if graph_count else None,
+    }
+
+
+def format_report(report: dict) -> str:
+    saved = report["saved_seconds"]
+    return (f"{report['turns']} turns, {report['fast_share']:.1%} on the fast path "
+            f"({', '.join(f'{k}={v}' for k, v in report['routes'].items())}); "
+            f"mean {report['fast_mean_seconds'] * 1000:.1f} ms fast vs {report['graph_mean_seconds'] * 1000:.0f} ms graph, "
+            + (f"~{saved:.1f}s saved" if saved is not None else "no graph turns yet to compare"))
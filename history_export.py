@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import sys
+
+# Streaming export of chat history as NDJSON or Parquet. Rows come from the history backend's
+# export_messages() generator (server-side cursor on Postgres, lazily stepped statement on SQLite),
+# so memory stays constant however many messages are dumped.
+#   python history_export.py --format ndjson --output all.ndjson
+#   python history_export.py --session alice --format parquet --output alice.parquet
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+
+def iter_ndjson(rows):
+    "One JSON object per message: {\"id\", \"session_id\", \"message\"}; stored message JSON is passed through unparsed."
+    for message_id, session_id, message in rows:
+        if not isinstance(message, str):
+            message = json.dumps(message)  # JSON/JSONB columns come back already decoded
+        yield f'{{"id": {message_id}, "session_id": {json.dumps(session_id)}, "message": {message}}}\n'.encode("utf-8")
+
+
+def write_parquet(rows, sink, batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    "Write rows to a Parquet file or file-like sink, one row group per batch. Requires the optional pyarrow package."
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from e
+
+    schema = pa.schema([("id", pa.int64()), ("session_id", pa.string()), ("message", pa.string())])
+    written = 0
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        batch = []
+        for message_id, session_id, message in rows:
+            batch.append((message_id, session_id, message if isinstance(message, str) else json.dumps(message)))
+            if len(batch) >= batch_size:
+                writer.write_batch(pa.record_batch(list(zip(*batch)), schema=schema))
+                written += len(batch)
+                batch = []
+        if batch:
+            writer.write_batch(pa.record_batch(list(zip(*batch)), schema=schema))
+            written += len(batch)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export chat history as NDJSON or Parquet")
+    parser.add_argument("--session", help="export a single session (default: all sessions)")
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    parser.add_argument("--output", help="output file (default stdout for ndjson)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    # Same backend switch as main.py, without importing the agent
+    if os.getenv("CHAT_HISTORY_BACKEND", "postgres").lower() == "sqlite":
+        from memory import export_messages
+    else:
+        from memory_postgres import export_messages
+    rows = export_messages(args.session, batch_size=args.batch_size)
+    if args.format == "parquet":
+        if not args.output:
+            parser.error("--output is required for parquet")
+        count = write_parquet(rows, args.output, args.batch_size)
+        print(f"Exported {count} messages to {args.output}", file=sys.stderr)
+        return
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for line in iter_ndjson(rows):
+            out.write(line)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+# Versioned FAISS index snapshots. Ingestion used to save_local over the live faiss_index/ directory,
+# so a process loading at that moment could read a half-written index. Instead every write goes to a
+# new directory and is published by atomically replacing a small pointer file:
+#   faiss_index/
+#     CURRENT                      - name of the live version (replaced with os.replace)
+#     versions/v000007-1718000000/ - index.faiss, index.pkl, snapshot.json (tombstones, counts)
+# Readers load whatever CURRENT names and keep serving it until a newer version has been loaded in
+# the background (see faiss_search.get_vector_store); a version directory is never modified once
+# published. Deletes are recorded as tombstones (docstore ids filtered out of search results) and
+# compaction, in a background thread once FAISS_COMPACT_RATIO of the vectors are tombstoned or via
+# `python index_snapshots.py compact`, publishes a copy without them. The newest FAISS_KEEP_VERSIONS
+# versions are kept for rollback. A legacy faiss_index/ without CURRENT is read as-is until the first
+# publish.
+FAISS_KEEP_VERSIONS = int(os.getenv("FAISS_KEEP_VERSIONS", "3"))
+FAISS_COMPACT_RATIO = float(os.getenv("FAISS_COMPACT_RATIO", "0.1"))
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+SNAPSHOT_META = "snapshot.json"
+
+
+def _versions_dir(root: str) -> str:
+    return os.path.join(root, VERSIONS_DIR)
+
+
+def current_version(root: str):
+    "Name of the live version, or None for an unversioned (legacy or missing) index."
+    try:
+        with open(os.path.join(root, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def current_path(root: str):
+    "Directory holding the live index: the CURRENT version, a legacy flat index, or None."
+    return _index_path(root, current_version(root))
+
+
+def _index_path(root: str, version):
+    if version:
+        return os.path.join(_versions_dir(root), version)
+    if os.path.exists(os.path.join(root, "index.faiss")):
+        return root
+    return None
+
+
+def list_versions(root: str):
+    "Published versions, oldest first."
+    if not os.path.isdir(_versions_dir(root)):
+        return []
+    return sorted(v for v in os.listdir(_versions_dir(root)) if v.startswith("v") and ".tmp" not in v)
+
+
+def read_meta(path: str) -> dict:
+    try:
+        with open(os.path.join(path, SNAPSHOT_META), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"tombstones": []}
+
+
+@contextmanager
+def writer_lock(root: str):
+    "Serialize publishers (ingestion runs, compaction) across processes; readers never take it."
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".writer.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _fsync_tree(path: str):
+    for name in os.listdir(path):
+        with open(os.path.join(path, name), "rb") as f:
+            os.fsync(f.fileno())
+    directory = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def _write_current(root: str, version: str):
+    tmp = os.path.join(root, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))  # the atomic swap readers observe
+
+
+def publish(vector_store, root: str, tombstones=(), keep: int = FAISS_KEEP_VERSIONS) -> str:
+    """Save vector_store as a new version and make it current. Call under writer_lock.
+    Returns the new version name."""
+    versions = list_versions(root)
+    number = int(versions[-1][1:7]) + 1 if versions else 1
+    version = f"v{number:06d}-{int(time.time())}"
+    final = os.path.join(_versions_dir(root), version)
+    staging = f"{final}.tmp-{os.getpid()}"
+    vector_store.save_local(staging)
+    live_ids = set(vector_store.index_to_docstore_id.values())
+    meta = {"version": version, "created": time.time(), "ntotal": vector_store.index.ntotal,
+            "tombstones": sorted(set(tombstones) & live_ids)}
+    with open(os.path.join(staging, SNAPSHOT_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    _fsync_tree(staging)
+    os.rename(staging, final)
+    _write_current(root, version)
+    prune(root, keep)
+    print(f"Published FAISS index {version} ({meta['ntotal']} vectors, {len(meta['tombstones'])} deleted)")
+    return version
+
+
+def prune(root: str, keep: int = FAISS_KEEP_VERSIONS):
+    "Remove all but the newest `keep` versions (never the current one) and stale staging directories."
+    current = current_version(root)
+    versions = list_versions(root)
+    for version in versions[:-keep] if keep > 0 else versions:
+        if version != current:
+            shutil.rmtree(os.path.join(_versions_dir(root), version), ignore_errors=True)
+    for name in os.listdir(_versions_dir(root)) if os.path.isdir(_versions_dir(root)) else []:
+        if ".tmp-" in name and not os.path.exists(f"/proc/{name.rsplit('-', 1)[-1]}"):
+            shutil.rmtree(os.path.join(_versions_dir(root), name), ignore_errors=True)
+
+
+def load(root: str, embeddings):
+    "(vector_store, version) for the live index; tombstoned docstore ids are attached as .tombstones."
+    from langchain_community.vectorstores import FAISS
+
+    # CURRENT is read once: a publish in between must not pair the new version name with the old index
+    version = current_version(root)
+    path = _index_path(root, version)
+    if path is None:
+        return None, None
+    vector_store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    vector_store.tombstones = frozenset(read_meta(path)["tombstones"])
+    return vector_store, version
+
+
+def ids_for_source(vector_store, source: str):
+    "Docstore ids of the chunks whose metadata source equals source."
+    return [doc_id for doc_id in vector_store.index_to_docstore_id.values()
+            if vector_store.docstore.search(doc_id).metadata.get("source") == source]
+
+
+def needs_compaction(vector_store, ratio: float = FAISS_COMPACT_RATIO) -> bool:
+    tombstones = getattr(vector_store, "tombstones", ())
+    return bool(tombstones) and len(tombstones) >= ratio * max(vector_store.index.ntotal, 1)
+
+
+def compact(root: str, embeddings, keep: int = FAISS_KEEP_VERSIONS):
+    "Publish a copy of the live index without its tombstoned vectors. Returns the new version or None."
+    with writer_lock(root):
+        vector_store, version = load(root, embeddings)
+        if vector_store is None or not vector_store.tombstones:
+            return None
+        start = time.perf_counter()
+        removed = len(vector_store.tombstones)
+        vector_store.delete(list(vector_store.tombstones))
+        new_version = publish(vector_store, root, (), keep)
+        print(f"Compacted {version} -> {new_version}: dropped {removed} vectors in {time.perf_counter() - start:.1f}s")
+        return new_version
+
+
+def compact_in_background(root: str, embeddings, keep: int = FAISS_KEEP_VERSIONS) -> threading.Thread:
+    thread = threading.Thread(target=compact, args=(root, embeddings, keep), name="faiss-compaction")
+    thread.start()
+    return thread
+
+
+def rollback(root: str, version: str):
+    "Point CURRENT back at an older retained version."
+    if version not in list_versions(root):
+        raise ValueError(f"Unknown version {version}; available: {', '.join(list_versions(root))}")
+    with writer_lock(root):
+        _write_current(root, version)
+    print(f"CURRENT -> {version}")
+
+
+def main():
+    from faiss_search import FAISS_INDEX_PATH
+
+    parser = argparse.ArgumentParser(description="Versioned FAISS index snapshots")
+    parser.add_argument("--root", default=FAISS_INDEX_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show versions")
+    commands.add_parser("compact", help="drop deleted vectors into a new version")
+    commands.add_parser("prune", help="apply the retention policy")
+    rollback_parser = commands.add_parser("rollback", help="make an older version current")
+    rollback_parser.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        current = current_version(args.root)
+        for version in list_versions(args.root):
+            meta = read_meta(os.path.join(_versions_dir(args.root), version))
+            print(f"{'*' if version == current else ' '} {version}  {meta.get('ntotal', '?'):>8} vectors  "
+                  f"{len(meta.get('tombstones', [])):>6} deleted")
+        if current is None:
+            print("No CURRENT pointer" + (" (legacy flat index in use)" if current_path(args.root) else ""))
+    elif args.command == "compact":
+        from embeddings import get_embeddings
+        if compact(args.root, get_embeddings()) is None:
+            print("Nothing to compact")
+    elif args.command == "prune":
+        with writer_lock(args.root):
+            prune(args.root)
+    elif args.command == "rollback":
+        rollback(args.root, args.version)
+
+
+if __name__ == "__main__":
+    main()
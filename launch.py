@@ -1,23 +1,187 @@
+import argparse
+import gc
+import os
+import signal
+import shutil
+import socket
+import sys
+import tempfile
 import uvicorn
 import webbrowser
 import threading
 import time
+import urllib.request
+
+SERVER_URL = "http://localhost:8000"
+STARTUP_TIMEOUT_SECONDS = 60
+DRAIN_TIMEOUT_SECONDS = 30
+
+def wait_for_endpoint(path: str, timeout: float = STARTUP_TIMEOUT_SECONDS, base_url: str = SERVER_URL) -> bool:
+    """Poll an endpoint until it answers 200 or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except Exception:
+            pass
+        time.sleep(0.1)
+    return False
 
 def open_browser():
-    """Open browser after server starts"""
-    time.sleep(3)  # Wait for server to fully start
-    webbrowser.open("http://localhost:8000")
+    """Open browser as soon as the server is live, then report readiness"""
+    if not wait_for_endpoint("/health"):
+        print("Server did not come up in time; open the browser manually.")
+        return
+    webbrowser.open(SERVER_URL)
+    started = time.monotonic()
+    if wait_for_endpoint("/ready"):
+        print(f"Agent ready ({time.monotonic() - started:.1f}s after the server came up)")
+    else:
+        print(f"Agent still warming up - see {SERVER_URL}/ready")
 
 def run_server():
-    """Run the FastAPI server"""
+    """Run the FastAPI server (development: single reloading process)"""
+    from ws_connections import server_options
     print("🚀 Starting AI Agent API...")
-    uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True, **server_options())
+
+# Production mode ---------------------------------------------------------------------------------------------------------------------------------
+# The parent process loads the embedding model, FAISS index and compiled graph, then forks N workers
+# that share those pages copy-on-write and accept on one shared socket. The LLM client is not
+# preloaded (its HTTP connection pool must not be shared across fork) and no inference runs in the
+# parent, so the PyTorch/OpenMP thread pools are only created inside the workers.
+
+def preload_components():
+    """Load shared read-only components before forking"""
+    from embeddings import get_embeddings
+    from faiss_search import get_vector_store, RETRIEVAL_SERVICE_URL
+    from main import get_graph
+
+    start = time.perf_counter()
+    if not RETRIEVAL_SERVICE_URL:
+        # With a retrieval service the workers only hold a thin client (see retrieval_service.py)
+        get_embeddings()
+        get_vector_store()
+    get_graph()
+    # Move everything loaded so far into the permanent GC generation so collections in the workers
+    # don't touch (and copy) the shared pages
+    gc.freeze()
+    print(f"Preloaded embeddings, FAISS index and graph in {time.perf_counter() - start:.1f}s")
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def serve_worker(sock: socket.socket, drain_timeout: float):
+    """Worker body: serve the app on the inherited socket until SIGTERM, then drain"""
+    import app as app_module
+    from metrics import start_snapshot_flusher
+    from ws_connections import server_options
+
+    start_snapshot_flusher()  # lets whichever worker answers /metrics report every worker
+    # WebSocket heartbeat, compression and frame limits (see ws_connections.py)
+    config = uvicorn.Config(app_module.app, log_level="info", timeout_graceful_shutdown=drain_timeout, **server_options())
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+def spawn_worker(sock: socket.socket, drain_timeout: float) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            serve_worker(sock, drain_timeout)
+        finally:
+            os._exit(0)
+    return pid
+
+def run_production(workers: int, host: str, port: int, preload: bool = True, drain_timeout: float = DRAIN_TIMEOUT_SECONDS):
+    """Pre-fork server: N workers on one socket, graceful drain on SIGTERM/SIGINT, crashed workers are respawned"""
+    # Phoenix must run as its own server here; each worker only registers the trace exporter
+    os.environ.setdefault("PHOENIX_LAUNCH_APP", "0")
+    print(f"🚀 Starting AI Agent API with {workers} workers on {host}:{port} (preload={'on' if preload else 'off'})")
+    # Workers share their metrics through snapshot files, so /metrics covers all of them (see metrics.py)
+    from metrics import enable_multiprocess
+    metrics_dir = os.getenv("METRICS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="agent_metrics_")
+    enable_multiprocess(metrics_dir)
+    # Workers see each other's chat history writes, so their hot-session caches skip most store checks (see cache.py)
+    from cache import enable_shared_generations
+    enable_shared_generations()
+    if preload:
+        preload_components()
+
+    sock = bind_socket(host, port)
+    children = {spawn_worker(sock, drain_timeout) for _ in range(workers)}
+    shutting_down = False
+
+    def request_shutdown(signum, frame):
+        nonlocal shutting_down
+        if shutting_down:
+            return
+        shutting_down = True
+        print(f"Draining {len(children)} workers (up to {drain_timeout:.0f}s)...")
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+
+    deadline = None
+    while children:
+        if shutting_down and deadline is None:
+            deadline = time.monotonic() + drain_timeout + 5
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if deadline and time.monotonic() > deadline:
+                for child in children:
+                    try:
+                        os.kill(child, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                print("Drain timeout reached; killed remaining workers")
+                deadline = time.monotonic() + 5
+            time.sleep(0.2)
+            continue
+        children.discard(pid)
+        if not shutting_down:
+            print(f"Worker {pid} exited with status {status}; respawning")
+            children.add(spawn_worker(sock, drain_timeout))
+
+    sock.close()
+    if not os.getenv("METRICS_MULTIPROC_DIR"):
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    print("All workers stopped")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Launch the AI Agent API")
+    parser.add_argument("--production", action="store_true", help="pre-fork multi-worker mode without reload")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-preload", action="store_true", help="let each worker load its own components")
+    parser.add_argument("--drain-timeout", type=float, default=DRAIN_TIMEOUT_SECONDS)
+    args = parser.parse_args()
+
+    if args.production:
+        run_production(args.workers, args.host, args.port, preload=not args.no_preload, drain_timeout=args.drain_timeout)
+        sys.exit(0)
+
     # Start browser opener in background thread
     browser_thread = threading.Thread(target=open_browser, daemon=True)
     browser_thread.start()
-    
+
     # Run server (blocking)
     run_server()
-    
\ No newline at end of file
+
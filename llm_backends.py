@@ -0,0 +1,95 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# LLM backend selection. Clients are built lazily on first use so importing main/app stays cheap;
+# only the selected backend's client library is imported.
+#   LLM_BACKEND=azure  - Azure Chat OpenAI (default, for testing on non GPU instances)
+#   LLM_BACKEND=ollama - On prem LLM via Ollama (start ollama on port 11434 first)
+#   LLM_BACKEND=vllm   - Any OpenAI compatible server, e.g. vLLM:
+#                        python -m vllm.entrypoints.openai.api_server --model gemma3:13b --port 8030
+LLM_BACKEND = os.getenv("LLM_BACKEND", "azure").lower()
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+# Deadline per LLM request; retries and fallback are handled in resilience.py, so the clients do not retry
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+# Backends tried in order when LLM_BACKEND fails or its circuit breaker is open, e.g. "vllm,ollama"
+LLM_FALLBACK_BACKENDS = [b.strip().lower() for b in os.getenv("LLM_FALLBACK_BACKENDS", "").split(",") if b.strip()]
+# Clients that take a timeout per request (the OpenAI ones), so resilience.py can end a hanging attempt early
+# and leave the rest of the deadline to the fallbacks; Ollama's client timeout is fixed when it is built
+CALL_TIMEOUT_BACKENDS = ("azure", "vllm")
+
+_llms = {}
+_llm_lock = threading.Lock()
+
+
+def build_llm(backend: str = None):
+    "Construct a chat model client for the given backend (defaults to LLM_BACKEND)."
+    backend = (backend or LLM_BACKEND).lower()
+
+    if backend == "azure":
+        from langchain_openai import AzureChatOpenAI
+        return AzureChatOpenAI(
+            azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key = os.getenv("AZURE_OPENAI_API_KEY"),
+            azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            api_version = os.getenv("AZURE_OPENAI_API_VERSION"),
+            temperature = LLM_TEMPERATURE,
+            timeout = LLM_TIMEOUT_SECONDS,
+            max_retries = 0
+        )
+
+    if backend == "ollama":
+        # Download qwen3:4b model; gemma models seem to be running into issues with Ollama at the moment
+        from langchain_ollama import ChatOllama
+        return ChatOllama(
+            model=os.getenv("OLLAMA_MODEL", "qwen3:4b"),
+            base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+            temperature=LLM_TEMPERATURE,
+            max_tokens=2048,
+            client_kwargs={"timeout": LLM_TIMEOUT_SECONDS}
+        )
+
+    if backend == "vllm":
+        # For PRODUCTION use gemma3:13b or gemma3:70b models if you have sufficient resources
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            base_url=os.getenv("VLLM_BASE_URL", "http://localhost:8030/v1"),
+            model_name=os.getenv("VLLM_MODEL", "gemma3:4b"),
+            api_key=os.getenv("VLLM_API_KEY", "EMPTY"),
+            temperature=LLM_TEMPERATURE,
+            max_tokens=2048,
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=0
+        )
+
+    raise ValueError(f"Unknown LLM backend: {backend}")
+
+
+def get_llm(backend: str = None):
+    "Return the shared chat model for a backend (defaults to LLM_BACKEND), building it on first use."
+    backend = (backend or LLM_BACKEND).lower()
+    if backend not in _llms:
+        with _llm_lock:
+            if backend not in _llms:
+                _llms[backend] = build_llm(backend)
+    return _llms[backend]
+
+
+def llm_backends() -> list:
+    "The primary backend followed by the configured fallbacks, without duplicates."
+    return list(dict.fromkeys([LLM_BACKEND] + LLM_FALLBACK_BACKENDS))
+
+
+def get_resilient_llm(prepare=None):
+    """The chat model behind timeouts, retries, circuit breakers and backend fallback (see resilience.py).
+    prepare(llm) adapts each backend's model first, e.g. binds tools."""
+    from resilience import ResilientRunnable
+    return ResilientRunnable([(f"llm:{b}", prepare(get_llm(b)) if prepare else get_llm(b)) for b in llm_backends()],
+                             timeout_backends=[f"llm:{b}" for b in CALL_TIMEOUT_BACKENDS], attempt_timeout=LLM_TIMEOUT_SECONDS)
+
+
+def is_llm_loaded() -> bool:
+    return LLM_BACKEND in _llms
@@ -1,20 +1,90 @@
+import os
 import sqlite3
+import threading
 from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_community.chat_message_histories import SQLChatMessageHistory
 
-SQLITE_DB_PATH ="chat_history.db"
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "chat_history.db")
+# Concurrency tuning: WAL lets readers run alongside the single writer, busy_timeout makes a blocked
+# writer wait for the lock instead of failing with "database is locked", and one pooled engine per
+# process replaces an engine (and a fresh connection) per call.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL is durable across crashes in WAL mode
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def _apply_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.close()
+
+def get_engine():
+    "Shared, pooled SQLAlchemy engine for the SQLite history database."
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine, event
+                engine = create_engine(
+                    f"sqlite:///{SQLITE_DB_PATH}",
+                    pool_size=SQLITE_POOL_SIZE,
+                    connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+                )
+                event.listen(engine, "connect", _apply_pragmas)
+                # Create the table once here; concurrent first calls racing on CREATE TABLE fail with "already exists"
+                SQLChatMessageHistory(session_id="", connection=engine)
+                # (session_id, id) index behind version checks, keyset pagination and per-session export
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(
+                        "CREATE INDEX IF NOT EXISTS message_store_session_id_idx ON message_store (session_id, id)")
+                _engine = engine
+    return _engine
 
 def get_session_history(session_id: str) -> SQLChatMessageHistory:
     "Get SQLite-backed chat history for a session."
     return SQLChatMessageHistory(
         session_id=session_id,
-        connection=f"sqlite:///{SQLITE_DB_PATH}"
+        connection=get_engine()
     )
 
+def get_session_version(session_id: str) -> tuple:
+    "(message count, last message id) for a session; used by the hot-session cache to detect writes."
+    conn = get_engine().raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM message_store WHERE session_id = ?", (session_id,))
+        count, last_id = cursor.fetchone()
+    finally:
+        conn.close()
+    return (count, last_id)
+
+def create_checkpointer():
+    "LangGraph checkpointer in the history database, used to resume failed turns (see checkpoints.py)."
+    from langgraph.checkpoint.sqlite import SqliteSaver  # langgraph-checkpoint-sqlite
+    conn = sqlite3.connect(SQLITE_DB_PATH, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    _apply_pragmas(conn)
+    saver = SqliteSaver(conn)  # serializes its own use of the connection across threads
+    saver.setup()
+    return saver
+
+def expired_checkpoint_threads(checkpointer, before_checkpoint_id: str, limit: int) -> list:
+    "Up to limit checkpoint threads whose newest checkpoint id sorts before before_checkpoint_id (see checkpoints.py)."
+    # Answered from the (thread_id, checkpoint_ns, checkpoint_id) primary key; checkpoint blobs are not read
+    with checkpointer.lock:
+        rows = checkpointer.conn.execute(
+            "SELECT thread_id FROM checkpoints WHERE checkpoint_ns = '' GROUP BY thread_id "
+            "HAVING MAX(checkpoint_id) < ? LIMIT ?", (before_checkpoint_id, limit)).fetchall()
+    return [row[0] for row in rows]
+
 def clear_session_history(session_id: str = None):
     "Clear chat history for a specific session or all sessions."
     try:
-        conn = sqlite3.connect(SQLITE_DB_PATH)
+        conn = get_engine().raw_connection() # pooled connection; close() hands it back to the pool
         cursor = conn.cursor() # Needed to execute the SQL commands
         if session_id:
             # Clear specific session
@@ -36,29 +106,58 @@ def clear_session_history(session_id: str = None):
     except Exception as e:
         return f"Error clearing history: {str(e)}"
 
-def list_sessions():
-    "List all available sessions in the database."
+def list_sessions_page(after: str = None, limit: int = 50) -> dict:
+    """One page of sessions ordered by session_id, starting after the given session_id (keyset pagination).
+    Returns {"sessions": [{"session_id", "message_count", "last_message_id"}], "next_after": session_id or None}."""
+    conn = get_engine().raw_connection()
     try:
-        conn = sqlite3.connect(SQLITE_DB_PATH)
         cursor = conn.cursor()
-        
+        # Walks the (session_id, id) index from the cursor position and stops after limit groups
         cursor.execute("""
-            SELECT session_id, COUNT(*) as message_count, 
-                   MIN(id) as first_message_id, MAX(id) as last_message_id
-            FROM message_store 
-            GROUP BY session_id 
-            ORDER BY last_message_id DESC
-        """)
-        
-        sessions = cursor.fetchall()
+            SELECT session_id, COUNT(*) as message_count, MAX(id) as last_message_id
+            FROM message_store
+            WHERE session_id > ?
+            GROUP BY session_id
+            ORDER BY session_id
+            LIMIT ?
+        """, (after or "", limit + 1))
+        rows = cursor.fetchall()
+    finally:
         conn.close()
-        
-        if not sessions:
+    sessions = [{"session_id": sid, "message_count": count, "last_message_id": last_id} for sid, count, last_id in rows[:limit]]
+    next_after = sessions[-1]["session_id"] if len(rows) > limit else None
+    return {"sessions": sessions, "next_after": next_after}
+
+def export_messages(session_id: str = None, batch_size: int = 1000):
+    "Stream (id, session_id, message_json) rows for one session or all sessions in id order, batch_size rows at a time."
+    conn = get_engine().raw_connection()
+    try:
+        cursor = conn.cursor()
+        if session_id:
+            cursor.execute("SELECT id, session_id, message FROM message_store WHERE session_id = ? ORDER BY id", (session_id,))
+        else:
+            cursor.execute("SELECT id, session_id, message FROM message_store ORDER BY id")
+        # SQLite steps the statement lazily, so only one batch is held in memory at a time
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def list_sessions(after: str = None, limit: int = 50):
+    "List one page of available sessions in the database."
+    try:
+        page = list_sessions_page(after, limit)
+        if not page["sessions"]:
             return "No sessions found in database."
         
         result = "\nAvailable sessions:\n" + "="*50 + "\n"
-        for session_id, count, first_id, last_id in sessions:
-            result += f"  - {session_id}: {count} messages\n"
+        for session in page["sessions"]:
+            result += f"  - {session['session_id']}: {session['message_count']} messages\n"
+        if page["next_after"]:
+            result += f"  ... more after '{page['next_after']}'\n"
         
         return result
     except Exception as e:
@@ -1,3 +1,6 @@
+import os
+import threading
+
 import psycopg2
 from langchain_community.chat_message_histories import SQLChatMessageHistory
 
@@ -14,14 +17,130 @@ POSTGRES_CONNECTION_STRING = (
     f"@{POSTGRES_CONFIG['host']}:{POSTGRES_CONFIG['port']}/{POSTGRES_CONFIG['database']}"
 )
 
+POSTGRES_CHECKPOINT_POOL_SIZE = int(os.getenv("POSTGRES_CHECKPOINT_POOL_SIZE", "8"))
+POSTGRES_CHECKPOINT_TIMEOUT_SECONDS = float(os.getenv("POSTGRES_CHECKPOINT_TIMEOUT_SECONDS", "5"))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    # One pooled SQLAlchemy engine per process, shared by every session's history object
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine, text
+                engine = create_engine(POSTGRES_CONNECTION_STRING, pool_pre_ping=True)
+                # Create the table once, then the (session_id, id) index behind version checks,
+                # keyset pagination and per-session export
+                SQLChatMessageHistory(session_id="", connection=engine, table_name="message_store")
+                with engine.begin() as conn:
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS message_store_session_id_idx ON message_store (session_id, id)"))
+                _engine = engine
+    return _engine
+
 def get_session_history(session_id: str) -> SQLChatMessageHistory:
     # Get PostgreSQL-backed chat history for a session
     return SQLChatMessageHistory(
         session_id=session_id,
-        connection=POSTGRES_CONNECTION_STRING,
+        connection=get_engine(),
         table_name="message_store"  
     )
 
+def get_session_version(session_id: str) -> tuple:
+    # (message count, last message id) for a session; used by the hot-session cache to detect writes
+    from sqlalchemy import text
+    with get_engine().connect() as conn:
+        row = conn.execute(
+            text("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM message_store WHERE session_id = :session_id"),
+            {"session_id": session_id},
+        ).one()
+    return (row[0], row[1])
+
+def create_checkpointer():
+    # LangGraph checkpointer in the chat history database, used to resume failed turns (see checkpoints.py)
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+    from langgraph.checkpoint.postgres import PostgresSaver  # langgraph-checkpoint-postgres
+    # A short wait for a connection: while Postgres is down the turn runs without checkpoints instead of stalling
+    pool = ConnectionPool(POSTGRES_CONNECTION_STRING, max_size=POSTGRES_CHECKPOINT_POOL_SIZE, open=True,
+                          timeout=POSTGRES_CHECKPOINT_TIMEOUT_SECONDS,
+                          kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row,
+                                  "connect_timeout": max(int(POSTGRES_CHECKPOINT_TIMEOUT_SECONDS), 1)})
+    saver = PostgresSaver(pool)
+    try:
+        saver.setup()
+    except Exception:
+        pool.close()  # stop the pool's reconnect workers; get_checkpointer retries later
+        raise
+    return saver
+
+def expired_checkpoint_threads(checkpointer, before_checkpoint_id: str, limit: int) -> list:
+    # Up to limit checkpoint threads whose newest checkpoint id sorts before before_checkpoint_id (see checkpoints.py);
+    # answered from the (thread_id, checkpoint_ns, checkpoint_id) primary key without reading checkpoint bodies
+    with checkpointer.conn.connection() as conn:
+        rows = conn.execute(
+            "SELECT thread_id FROM checkpoints WHERE checkpoint_ns = '' GROUP BY thread_id "
+            "HAVING MAX(checkpoint_id) < %s LIMIT %s", (before_checkpoint_id, limit)).fetchall()
+    return [row["thread_id"] for row in rows]
+
+def list_sessions_page(after: str = None, limit: int = 50) -> dict:
+    # One page of sessions ordered by session_id, starting after the given session_id (keyset pagination).
+    # Returns {"sessions": [{"session_id", "message_count", "last_message_id"}], "next_after": session_id or None}
+    conn = get_engine().raw_connection()
+    try:
+        cursor = conn.cursor()
+        # GroupAggregate over the (session_id, id) index, stopping after limit groups
+        cursor.execute("""
+            SELECT session_id, COUNT(*) AS message_count, MAX(id) AS last_message_id
+            FROM message_store
+            WHERE session_id > %s
+            GROUP BY session_id
+            ORDER BY session_id
+            LIMIT %s
+        """, (after or "", limit + 1))
+        rows = cursor.fetchall()
+        conn.rollback()
+    finally:
+        conn.close()
+    sessions = [{"session_id": sid, "message_count": count, "last_message_id": last_id} for sid, count, last_id in rows[:limit]]
+    next_after = sessions[-1]["session_id"] if len(rows) > limit else None
+    return {"sessions": sessions, "next_after": next_after}
+
+def export_messages(session_id: str = None, batch_size: int = 1000):
+    # Stream (id, session_id, message_json) rows for one session or all sessions in id order.
+    # A named (server-side) cursor fetches batch_size rows per round trip instead of the whole result set.
+    conn = get_engine().raw_connection()
+    try:
+        cursor = conn.cursor(name="export_messages")
+        cursor.itersize = batch_size
+        if session_id:
+            cursor.execute("SELECT id, session_id, message FROM message_store WHERE session_id = %s ORDER BY id", (session_id,))
+        else:
+            cursor.execute("SELECT id, session_id, message FROM message_store ORDER BY id")
+        yield from cursor
+        cursor.close()
+        conn.rollback()
+    finally:
+        conn.close()
+
+def list_sessions(after: str = None, limit: int = 50):
+    # List one page of available sessions in the database
+    try:
+        page = list_sessions_page(after, limit)
+        if not page["sessions"]:
+            return "No sessions found in database."
+
+        result = "\nAvailable sessions:\n" + "="*50 + "\n"
+        for session in page["sessions"]:
+            result += f"  - {session['session_id']}: {session['message_count']} messages\n"
+        if page["next_after"]:
+            result += f"  ... more after '{page['next_after']}'\n"
+
+        return result
+    except Exception as e:
+        return f"Error listing sessions: {str(e)}"
+
 def clear_session_history(session_id: str = None):
     # Clear chat history for a specific session or all sessions
     try:
@@ -0,0 +1,334 @@
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Lightweight in-process metrics exported in the Prometheus text format on /metrics.
+# Phoenix traces stay the place for per-request detail; these are cheap aggregate counters and
+# latency histograms that can be scraped under load.
+# Every process keeps its own registry. Under the pre-fork launcher (launch.py --production) each worker
+# also writes a snapshot of its registry to METRICS_MULTIPROC_DIR every METRICS_FLUSH_SECONDS, and
+# /metrics, answered by whichever worker accepted the scrape, merges the snapshots of all workers:
+# counters and histograms are summed (including workers that have exited, so totals never go back),
+# gauges are summed over live workers, or maxed for gauges declared with aggregate="max". Other
+# workers' values are up to METRICS_FLUSH_SECONDS old; value()/snapshot() stay process-local.
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "1"))
+
+_registry = {}
+_registry_lock = threading.Lock()
+_flusher = None
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _ValueMetric(_Metric):
+    # One float per label set
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, dumps, live):
+        "Combine dump() outputs of several processes ({pid: dump}); live is the set of running pids."
+        merged = {}
+        for pid, rows in dumps.items():
+            for key, value in rows:
+                merged[tuple(key)] = merged.get(tuple(key), 0.0) + value
+        return merged
+
+    def render(self, values=None):
+        lines = self._header()
+        with self._lock:
+            values = dict(self._values) if values is None else values
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(_ValueMetric):
+    kind = "counter"
+
+
+class Gauge(_ValueMetric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), aggregate="sum"):
+        super().__init__(name, documentation, labelnames)
+        if aggregate not in ("sum", "max"):
+            raise ValueError(f"Unknown gauge aggregate: {aggregate}")
+        self.aggregate = aggregate
+
+    def merge(self, dumps, live):
+        # Exited workers no longer hold connections, queued jobs or cache entries
+        merged = {}
+        for pid, rows in dumps.items():
+            if pid not in live:
+                continue
+            for key, value in rows:
+                key = tuple(key)
+                if self.aggregate == "max":
+                    merged[key] = max(merged.get(key, value), value)
+                else:
+                    merged[key] = merged.get(key, 0.0) + value
+        return merged
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        "Observe the wall-clock duration of the enclosed block."
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels):
+        "Return (count, sum) for one label set."
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return (series[-1], series[-2]) if series else (0, 0.0)
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), list(series)] for key, series in self._series.items()]
+
+    def merge(self, dumps, live):
+        merged = {}
+        for pid, rows in dumps.items():
+            for key, series in rows:
+                total = merged.setdefault(tuple(key), [0] * len(series))
+                for i, value in enumerate(series):
+                    total[i] += value
+        return merged
+
+    def render(self, series_by_key=None):
+        lines = self._header()
+        with self._lock:
+            series_by_key = {k: list(v) for k, v in self._series.items()} if series_by_key is None else series_by_key
+        for key, series in sorted(series_by_key.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', repr(float(bound)))])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def _register(metric_class, name, documentation, labelnames=(), **kwargs):
+    # Return the existing metric when a module is re-imported (e.g. uvicorn reload)
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = metric_class(name, documentation, labelnames, **kwargs)
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames=()) -> Counter:
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames=(), aggregate: str = "sum") -> Gauge:
+    "aggregate: how /metrics combines the gauge across pre-fork workers, sum or max."
+    return _register(Gauge, name, documentation, labelnames, aggregate=aggregate)
+
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def render_metrics() -> str:
+    "Render every registered metric in the Prometheus text exposition format, merged across workers if enabled."
+    with _registry_lock:
+        metrics = list(_registry.values())
+    if not METRICS_MULTIPROC_DIR:
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+    write_snapshot()  # this worker's values are current, the others' at most METRICS_FLUSH_SECONDS old
+    dumps = read_snapshots()
+    live = {pid for pid in dumps if _is_alive(pid)}
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render(metric.merge({pid: d.get(metric.name, []) for pid, d in dumps.items()}, live)))
+    return "\n".join(lines) + "\n"
+
+
+# Pre-fork workers ------------------------------------------------------------------------------------------------------------------------------
+def enable_multiprocess(directory: str):
+    "Called by the pre-fork launcher before forking: workers share their metrics through snapshots in directory."
+    global METRICS_MULTIPROC_DIR
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)  # left over from an earlier run
+    METRICS_MULTIPROC_DIR = directory
+
+
+def write_snapshot():
+    "Write this process's registry to METRICS_MULTIPROC_DIR/<pid>.json (atomically, via rename)."
+    with _registry_lock:
+        metrics = list(_registry.values())
+    snapshot = {metric.name: metric.dump() for metric in metrics}
+    path = os.path.join(METRICS_MULTIPROC_DIR, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(snapshot, f)
+    os.replace(path + ".tmp", path)
+
+
+def read_snapshots() -> dict:
+    "{pid: snapshot} for every process that has written one."
+    dumps = {}
+    for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, "*.json")):
+        try:
+            with open(path) as f:
+                dumps[int(os.path.basename(path)[:-5])] = json.load(f)
+        except (OSError, ValueError):
+            continue  # replaced or removed while reading
+    return dumps
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _flush_loop():
+    while True:
+        try:
+            write_snapshot()
+        except OSError as e:
+            print(f"Could not write metrics snapshot: {e}")
+        time.sleep(METRICS_FLUSH_SECONDS)
+
+
+def start_snapshot_flusher():
+    "Start writing this worker's snapshot every METRICS_FLUSH_SECONDS (no-op unless enable_multiprocess ran)."
+    global _flusher
+    if METRICS_MULTIPROC_DIR and _flusher is None:
+        _flusher = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+        _flusher.start()
+
+
+# Agent metrics ---------------------------------------------------------------------------------------------------------------------------------
+NODE_LATENCY = histogram("agent_node_latency_seconds", "Latency of LangGraph nodes", ["node"])
+TOOL_LATENCY = histogram("agent_tool_latency_seconds", "Latency of tool calls", ["tool"])
+TOOL_CALLS = counter("agent_tool_calls_total", "Tool calls by outcome", ["tool", "status"])
+GUARDRAIL_LATENCY = histogram("agent_guardrail_latency_seconds", "Latency of guardrail checks", ["check"],
+                              buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+GUARDRAIL_BLOCKS = counter("agent_guardrail_blocks_total", "Inputs or outputs blocked by guardrails", ["check"])
+HISTORY_LATENCY = histogram("agent_history_latency_seconds", "Latency of chat history operations", ["operation"])
+VECTOR_SEARCH_LATENCY = histogram("agent_vector_search_latency_seconds", "Latency of FAISS similarity search", [])
+LLM_TOKENS = counter("agent_llm_tokens_total", "LLM tokens reported by the provider", ["type"])
+LLM_CACHED_PROMPT_TOKENS = histogram("agent_llm_cached_prompt_tokens", "Prompt tokens served from the provider's prompt cache per LLM call", [],
+                                     buckets=(0, 128, 256, 512, 1024, 2048, 4096, 8192, 16384))
+REQUEST_LATENCY = histogram("agent_request_latency_seconds", "End-to-end latency of API requests", ["endpoint"])
+REQUESTS = counter("agent_requests_total", "API requests by outcome", ["endpoint", "status"])
+
+
+def instrument_tool(name: str):
+    "Decorator recording latency and outcome of a tool function."
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status = "ok"
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                TOOL_LATENCY.observe(time.perf_counter() - start, tool=name)
+                TOOL_CALLS.inc(tool=name, status=status)
+        return wrapper
+    return decorator
+
+
+def record_token_usage(message):
+    "Add the usage metadata of an AI message (if the provider reports it) to the token counters."
+    usage = getattr(message, "usage_metadata", None) or {}
+    for token_type in ("input_tokens", "output_tokens"):
+        if usage.get(token_type):
+            LLM_TOKENS.inc(usage[token_type], type=token_type.replace("_tokens", ""))
+    # Azure/OpenAI report cached prompt tokens; vLLM only with --enable-prompt-tokens-details
+    details = usage.get("input_token_details") or {}
+    if usage.get("input_tokens"):
+        cached = details.get("cache_read") or 0
+        LLM_CACHED_PROMPT_TOKENS.observe(cached)
+        if cached:
+            LLM_TOKENS.inc(cached, type="cache_read")
@@ -0,0 +1,80 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+
+from langchain_core.documents import Document
+
+# Content-addressed cache of extracted PDF page text. Parsing with PyPDFLoader dominates ingestion
+# for large manuals, and re-chunking or re-embedding experiments do not change the pages, so each
+# PDF's pages are stored gzip-compressed under the SHA-256 of the file bytes plus the extractor
+# version. A moved or renamed file still hits; an edited file, or a pypdf upgrade, misses.
+#   PAGE_CACHE_DIR=.page_cache   (set PAGE_CACHE_ENABLED=0 to always parse)
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", ".page_cache")
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "1") == "1"
+PAGE_CACHE_FORMAT = 1  # bump when the stored layout or the extraction settings change
+
+
+def extractor_version() -> str:
+    import pypdf
+    return f"PyPDFLoader-pypdf{pypdf.__version__}-f{PAGE_CACHE_FORMAT}"
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(digest: str, extractor: str, cache_dir: str = PAGE_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, digest[:2], f"{digest}.{extractor}.json.gz")
+
+
+def _read(path: str):
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # missing or corrupt entry: re-parse
+
+
+def _write(path: str, pages):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(pages, f, default=str)
+    os.replace(tmp, path)  # atomic, so concurrent ingestion runs never see a partial entry
+
+
+def load_pdf_pages(pdf_path: str, cache_dir: str = PAGE_CACHE_DIR, stats: dict = None) -> list[Document]:
+    """Pages of a PDF as Documents (same content and metadata as PyPDFLoader.load()), served from the
+    page cache when possible. stats, if given, accumulates hits/misses/pages and parse/cache seconds."""
+    stats = stats if stats is not None else {}
+    start = time.perf_counter()
+    entry = None
+    if PAGE_CACHE_ENABLED:
+        entry = cache_path(file_digest(pdf_path), extractor_version(), cache_dir)
+        pages = _read(entry)
+        if pages is not None:
+            documents = [Document(page_content=p["page_content"], metadata={**p["metadata"], "source": pdf_path}) for p in pages]
+            stats["hits"] = stats.get("hits", 0) + 1
+            stats["pages"] = stats.get("pages", 0) + len(documents)
+            stats["cache_seconds"] = stats.get("cache_seconds", 0.0) + time.perf_counter() - start
+            return documents
+
+    from langchain_community.document_loaders import PyPDFLoader
+    documents = PyPDFLoader(pdf_path).load()
+    if entry is not None:
+        _write(entry, [{"page_content": d.page_content, "metadata": d.metadata} for d in documents])
+    stats["misses"] = stats.get("misses", 0) + 1
+    stats["pages"] = stats.get("pages", 0) + len(documents)
+    stats["parse_seconds"] = stats.get("parse_seconds", 0.0) + time.perf_counter() - start
+    return documents
+
+
+def format_stats(stats: dict) -> str:
+    return (f"page cache: {stats.get('hits', 0)} hits ({stats.get('cache_seconds', 0.0):.2f}s), "
+            f"{stats.get('misses', 0)} parsed ({stats.get('parse_seconds', 0.0):.2f}s), {stats.get('pages', 0)} pages")
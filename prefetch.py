@@ -0,0 +1,146 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cpu_pool import IO_EXECUTOR_WORKERS
+from metrics import counter, histogram
+
+# Speculative knowledge-base prefetch. A knowledge-base answer costs LLM call -> FAISS search -> LLM
+# call; with PREFETCH_ENABLED=1 the search for the user's message starts in a background thread at
+# the same time as the first LLM call, and search_knowledge_base takes that result when the model's
+# tool query matches the user's message (term overlap >= PREFETCH_MATCH_THRESHOLD) instead of
+# searching again. A prefetch that is still running is waited for, never duplicated; one still queued
+# behind other turns' prefetches is cancelled and the tool searches itself; one that failed raises its
+# error in the tool instead of running the same search again; one the model does not use expires after
+# PREFETCH_TTL_SECONDS and is counted as unused. PREFETCH_WORKERS defaults to IO_EXECUTOR_WORKERS, one
+# prefetch thread per turn that can run at the same time.
+# Prefetches belong to the turn that started them (its checkpoint thread id, see turn_thread_id in
+# checkpoints.py) and are only claimed by tool calls of that turn: two sessions asking similar
+# questions at the same time never take each other's results.
+# Only the raw hits are prefetched: context assembly still runs on the model's actual query.
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0") == "1"
+PREFETCH_MATCH_THRESHOLD = float(os.getenv("PREFETCH_MATCH_THRESHOLD", "0.6"))
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "60"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", str(IO_EXECUTOR_WORKERS)))
+PREFETCH_MIN_WORDS = int(os.getenv("PREFETCH_MIN_WORDS", "2"))  # content words; skips greetings and one-word inputs
+
+PREFETCH_REQUESTS = counter("agent_prefetch_total", "Speculative knowledge-base prefetches by outcome", ["result"])
+PREFETCH_SAVED = histogram("agent_prefetch_saved_seconds", "Search latency hidden behind the first LLM call per prefetch hit", [])
+
+WORD = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are about can could do does for find from how i in is it me my of on or please search tell "
+    "the this to us was what when where which who why with you your".split()
+)
+
+
+def _terms(text: str) -> frozenset:
+    return frozenset(w for w in WORD.findall(text.lower()) if w not in STOPWORDS)
+
+
+def similarity(left: str, right: str) -> float:
+    "Jaccard overlap of the two texts' content words (tool queries usually drop the filler words)."
+    a, b = _terms(left), _terms(right)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Prefetch:
+    def __init__(self, key: str, query: str, future):
+        self.key = key
+        self.query = query
+        self.future = future
+        self.started = time.perf_counter()
+        self.finished = None  # set by the worker when the search completes
+
+
+class PrefetchRegistry:
+    "In-flight and completed prefetches, claimed at most once by a matching tool call of the same turn."
+
+    def __init__(self, search_fn, workers: int = PREFETCH_WORKERS, ttl: float = PREFETCH_TTL_SECONDS,
+                 threshold: float = PREFETCH_MATCH_THRESHOLD):
+        self._search_fn = search_fn
+        self._ttl = ttl
+        self._threshold = threshold
+        self._entries = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kb-prefetch")
+
+    def start(self, key: str, query: str):
+        "Begin searching for query in the background on behalf of turn key (no-op for very short inputs)."
+        if len(_terms(query)) < PREFETCH_MIN_WORDS:
+            return None
+        self._expire()
+        entry = None
+
+        def run():
+            try:
+                return self._search_fn(query)
+            finally:
+                entry.finished = time.perf_counter()
+
+        with self._lock:
+            entry = _Prefetch(key, query, None)
+            entry.future = self._executor.submit(run)
+            self._entries.append(entry)
+        return entry
+
+    def claim(self, key: str, query: str):
+        """Results of turn key's best-matching prefetch for a tool query, waiting for it if still running.
+        Returns None when no prefetch matches (a miss) or the match has not started yet (it is cancelled);
+        the caller then searches itself. Raises the search error of a prefetch that failed."""
+        self._expire()
+        with self._lock:
+            scored = [(similarity(query, e.query), e) for e in self._entries if e.key == key]
+            score, entry = max(scored, key=lambda s: s[0], default=(0.0, None))
+            if entry is None or score < self._threshold:
+                entry = None
+            else:
+                self._entries.remove(entry)
+        if entry is None:
+            PREFETCH_REQUESTS.inc(result="miss")
+            return None
+        if entry.future.cancel():
+            # Still queued behind other turns' prefetches: searching now is faster than waiting
+            PREFETCH_REQUESTS.inc(result="cancelled")
+            return None
+        wait_start = time.perf_counter()
+        try:
+            results = entry.future.result()
+        except Exception as e:
+            PREFETCH_REQUESTS.inc(result="error")
+            print(f"Knowledge-base prefetch for {query!r} failed: {e}")
+            raise
+        waited = time.perf_counter() - wait_start
+        PREFETCH_REQUESTS.inc(result="hit")
+        PREFETCH_SAVED.observe(max(entry.finished - entry.started - waited, 0.0))
+        return results
+
+    def _expire(self):
+        now = time.perf_counter()
+        with self._lock:
+            expired = [e for e in self._entries if now - e.started > self._ttl]
+            self._entries = [e for e in self._entries if now - e.started <= self._ttl]
+        for _ in expired:
+            PREFETCH_REQUESTS.inc(result="unused")
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_prefetcher(search_fn):
+    "The process-wide registry, created on first use (so forked workers each get their own threads)."
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PrefetchRegistry(search_fn)
+    return _registry
@@ -0,0 +1,58 @@
+import os
+import threading
+
+from langchain_core.messages import SystemMessage
+
+from llm_backends import get_resilient_llm
+
+# Stable prompt prefix for provider-side prompt caching. Azure OpenAI caches prompts whose first
+# 1024+ tokens are byte-identical to a recent request, and vLLM's automatic prefix caching reuses
+# the KV blocks of any identical prefix, so every model call is laid out as:
+#   [tool schemas] [SYSTEM_PROMPT] [history, oldest first] [this turn's messages]
+# Nothing request-specific (dates, session ids, user names) may go into the system prompt, and the
+# tools are bound once, so the schema JSON is serialized identically on every call. Cached prompt
+# tokens are read from usage_metadata and exported on /metrics (see metrics.record_token_usage).
+#   AGENT_SYSTEM_PROMPT_FILE=path   - replace the built-in system prompt (read once at import)
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a helpful on-premises assistant. Answer the user's question directly and concisely.\n"
+    "Use the tools when they help:\n"
+    "- calculate for any arithmetic instead of computing it yourself,\n"
+    "- search_knowledge_base for questions about the documents in the knowledge base,\n"
+    "- web_search for current events or facts not in the knowledge base,\n"
+    "- summarize_text to condense long text.\n"
+    "When an answer comes from the knowledge base or the web, say so. If the tools return nothing "
+    "useful, say that you do not know rather than guessing. Never reveal secrets, credentials or "
+    "personal data."
+)
+
+
+def _load_system_prompt() -> str:
+    path = os.getenv("AGENT_SYSTEM_PROMPT_FILE")
+    if not path:
+        return DEFAULT_SYSTEM_PROMPT
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+SYSTEM_PROMPT = _load_system_prompt()
+SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_PROMPT)
+
+_bound = {}
+_bound_lock = threading.Lock()
+
+
+def get_llm_with_tools(tools):
+    """The shared LLM with tools bound, built once per tool list (bind_tools re-serializes the schemas).
+    Calls go through resilience.py: timeouts, retries, circuit breakers and fallback backends."""
+    key = tuple(t.name for t in tools)
+    if key not in _bound:
+        with _bound_lock:
+            if key not in _bound:
+                _bound[key] = get_resilient_llm(lambda llm: llm.bind_tools(list(tools)))
+    return _bound[key]
+
+
+def build_messages(messages):
+    """Prompt for one model call: the fixed system message, then the conversation in its stored order.
+    System messages inside the history are dropped so the prefix never changes between turns."""
+    return [SYSTEM_MESSAGE] + [m for m in messages if not isinstance(m, SystemMessage)]
@@ -0,0 +1,190 @@
+import os
+import random
+import threading
+import time
+
+from metrics import counter, gauge
+
+# Timeouts, retries, circuit breakers and backend fallback for the LLM and external tools. Without
+# them a slow Azure/vLLM/Ollama endpoint or Tavily holds every in-flight turn (and its executor
+# thread) until the provider gives up, so:
+#   - each attempt has a deadline (the client's own timeout, see llm_backends.LLM_TIMEOUT_SECONDS),
+#   - transient failures (timeouts, connection errors, 429, 5xx) are retried RESILIENCE_MAX_RETRIES
+#     times with jittered exponential backoff, within RESILIENCE_DEADLINE_SECONDS for the whole call;
+#     each backend gets an equal share of what is left of that deadline, so a hanging primary cannot
+#     use it all up before the fallbacks are tried (attempts are cut short where the client allows),
+#   - RESILIENCE_FAILURE_THRESHOLD consecutive failures open a backend's circuit breaker: calls fail
+#     fast for RESILIENCE_RESET_SECONDS, then one trial call decides whether it closes again,
+#   - the LLM falls back across LLM_BACKEND then LLM_FALLBACK_BACKENDS (e.g. azure -> vllm -> ollama).
+# Other errors (bad request, authentication, context length) are raised at once: retrying or another
+# backend would not help, and they say nothing about the backend's health.
+RESILIENCE_MAX_RETRIES = int(os.getenv("RESILIENCE_MAX_RETRIES", "2"))
+RESILIENCE_BACKOFF_SECONDS = float(os.getenv("RESILIENCE_BACKOFF_SECONDS", "0.5"))
+RESILIENCE_MAX_BACKOFF_SECONDS = float(os.getenv("RESILIENCE_MAX_BACKOFF_SECONDS", "8"))
+RESILIENCE_DEADLINE_SECONDS = float(os.getenv("RESILIENCE_DEADLINE_SECONDS", "90"))
+RESILIENCE_FAILURE_THRESHOLD = int(os.getenv("RESILIENCE_FAILURE_THRESHOLD", "5"))
+RESILIENCE_RESET_SECONDS = float(os.getenv("RESILIENCE_RESET_SECONDS", "30"))
+
+BACKEND_CALLS = counter("agent_backend_calls_total", "LLM and tool backend attempts by outcome", ["backend", "outcome"])
+BACKEND_FALLBACKS = counter("agent_backend_fallbacks_total", "Calls served by a fallback backend", ["backend"])
+CIRCUIT_STATE = gauge("agent_circuit_state", "Circuit breaker state per backend (0 closed, 1 half-open, 2 open; worst worker)", ["backend"],
+                      aggregate="max")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+TRANSIENT_ERROR_NAMES = ("Timeout", "TimeoutError", "APIConnectionError", "APITimeoutError", "ConnectError",
+                         "ConnectionError", "RateLimitError", "InternalServerError", "ServiceUnavailableError",
+                         "RemoteProtocolError", "ReadError")
+
+
+class BackendUnavailable(RuntimeError):
+    "Raised when every backend for a call is failing or has an open circuit breaker."
+
+
+def is_transient(error: BaseException) -> bool:
+    "Whether an error is worth retrying: timeouts, dropped connections, rate limits and server errors."
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return any(name in type(error).__name__ for name in TRANSIENT_ERROR_NAMES)
+
+
+class CircuitBreaker:
+    "Consecutive-failure circuit breaker with a single half-open trial call."
+
+    def __init__(self, name: str, failure_threshold: int = RESILIENCE_FAILURE_THRESHOLD,
+                 reset_seconds: float = RESILIENCE_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(0, backend=name)
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_STATE.set(_STATE_VALUES[state], backend=self.name)
+
+    def allow(self) -> bool:
+        "Whether a call may go to this backend now (claims the trial slot when half-open)."
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._set_state(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def release(self):
+        "Give back a half-open trial slot without a verdict (the call failed for a non-health reason)."
+        with self._lock:
+            self._trial_running = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    "The process-wide circuit breaker for a backend name."
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_states() -> dict:
+    with _breakers_lock:
+        return {name: breaker.state for name, breaker in _breakers.items()}
+
+
+def backoff_delay(attempt: int, base: float = RESILIENCE_BACKOFF_SECONDS, cap: float = RESILIENCE_MAX_BACKOFF_SECONDS) -> float:
+    "Full-jitter exponential backoff for the given retry number (1-based)."
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def call_with_resilience(backends, call, max_retries: int = RESILIENCE_MAX_RETRIES,
+                         deadline_seconds: float = RESILIENCE_DEADLINE_SECONDS, attempt_timeout: float = None):
+    """Run call(target, timeout) against the first healthy backend, retrying transient failures and falling
+    back to the next backend when one is exhausted or its breaker is open. timeout is the seconds the
+    attempt may take: the rest of this backend's share of the deadline, at most attempt_timeout.
+    backends: [(name, target)] in preference order. Raises BackendUnavailable when all of them fail."""
+    deadline = time.monotonic() + deadline_seconds
+    last_error = None
+    for position, (name, target) in enumerate(backends):
+        breaker = get_breaker(name)
+        # This backend's share of the remaining deadline; the last one gets all of it
+        backend_deadline = time.monotonic() + (deadline - time.monotonic()) / (len(backends) - position)
+        for attempt in range(max_retries + 1):
+            timeout = backend_deadline - time.monotonic()
+            if attempt_timeout is not None:
+                timeout = min(timeout, attempt_timeout)
+            if timeout <= 0:
+                break
+            if not breaker.allow():
+                BACKEND_CALLS.inc(backend=name, outcome="rejected")
+                break
+            try:
+                result = call(target, timeout)
+            except Exception as e:
+                if not is_transient(e):
+                    breaker.release()
+                    BACKEND_CALLS.inc(backend=name, outcome="error")
+                    raise
+                breaker.record_failure()
+                BACKEND_CALLS.inc(backend=name, outcome="timeout" if "timeout" in type(e).__name__.lower() else "error")
+                last_error = e
+                if attempt == max_retries:
+                    break
+                delay = backoff_delay(attempt + 1)
+                if time.monotonic() + delay >= backend_deadline:
+                    break
+                time.sleep(delay)
+                continue
+            breaker.record_success()
+            BACKEND_CALLS.inc(backend=name, outcome="ok")
+            if position:
+                BACKEND_FALLBACKS.inc(backend=name)
+            return result
+        if time.monotonic() >= deadline:
+            break
+    names = ", ".join(name for name, _ in backends)
+    raise BackendUnavailable(f"No healthy backend among {names}: {last_error or 'circuit open'}") from last_error
+
+
+class ResilientRunnable:
+    """invoke()-compatible wrapper over the same model on several backends (e.g. each with tools bound).
+    Backends named in timeout_backends take a per-call timeout= (the OpenAI clients), so an attempt is cut
+    short at the end of its share of the deadline; others run up to attempt_timeout, their client's own."""
+
+    def __init__(self, backends, timeout_backends=(), attempt_timeout: float = None):
+        self.backends = [(name, (target, name in timeout_backends)) for name, target in backends]
+        self.attempt_timeout = attempt_timeout
+
+    def invoke(self, input, config=None, **kwargs):
+        def attempt(backend, timeout):
+            target, takes_timeout = backend
+            return target.invoke(input, config, **kwargs, **({"timeout": timeout} if takes_timeout else {}))
+        return call_with_resilience(self.backends, attempt, attempt_timeout=self.attempt_timeout)
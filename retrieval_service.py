@@ -0,0 +1,271 @@
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from metrics import counter, histogram
+
+# Shared retrieval service. Without it every API worker loads its own FAISS index and embedding model
+# and embeds/searches each query on its own. This process owns one copy of both and coalesces the
+# queries that arrive within RETRIEVAL_BATCH_WINDOW_MS (up to RETRIEVAL_MAX_BATCH) into a single
+# batched embedding forward pass and a single index.search call.
+#   python retrieval_service.py --port 8040              (HTTP)
+#   python retrieval_service.py --socket /tmp/kb.sock    (Unix socket, lower overhead on one host)
+# Workers started with RETRIEVAL_SERVICE_URL=http://127.0.0.1:8040 (or unix:///tmp/kb.sock) search
+# through it and never load the model or index themselves (see faiss_search.get_vector_store).
+RETRIEVAL_SERVICE_URL = os.getenv("RETRIEVAL_SERVICE_URL", "")
+RETRIEVAL_BATCH_WINDOW_MS = float(os.getenv("RETRIEVAL_BATCH_WINDOW_MS", "5"))
+RETRIEVAL_MAX_BATCH = int(os.getenv("RETRIEVAL_MAX_BATCH", "64"))
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_TIMEOUT_SECONDS", "10"))
+
+BATCH_SIZE = histogram("agent_retrieval_batch_size", "Queries per batched embedding + search call", [],
+                       buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+BATCH_LATENCY = histogram("agent_retrieval_batch_latency_seconds", "Embedding + search time per batch", ["stage"])
+RETRIEVAL_REQUESTS = counter("agent_retrieval_requests_total", "Retrieval service requests by outcome", ["status"])
+
+
+# Batching ------------------------------------------------------------------------------------------------------------------------------------------
+class MicroBatcher:
+    "Collects concurrent (query, k) requests and answers each window with one embed + one search."
+
+    def __init__(self, vector_store, window_ms: float = RETRIEVAL_BATCH_WINDOW_MS, max_batch: int = RETRIEVAL_MAX_BATCH):
+        # A store, or a callable returning the current one (so newly published index versions are picked up)
+        self._provider = vector_store if callable(vector_store) else (lambda: vector_store)
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.queries = 0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="retrieval-batcher", daemon=True).start()
+
+    @property
+    def vector_store(self):
+        return self._provider()
+
+    def submit(self, query: str, k: int) -> Future:
+        future = Future()
+        self._queue.put((query, k, future))
+        return future
+
+    def search(self, query: str, k: int, timeout: float = RETRIEVAL_TIMEOUT_SECONDS):
+        return self.submit(query, k).result(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results = self._search_batch([query for query, _, _ in batch], max(k for _, k, _ in batch))
+                for (_, k, future), hits in zip(batch, results):
+                    future.set_result(hits[:k])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+
+    def _search_batch(self, queries, k: int):
+        "[(Document, score)] per query, as FAISS.similarity_search_with_score would return them."
+        import numpy as np
+        import faiss
+
+        store = self.vector_store
+        tombstones = getattr(store, "tombstones", ())  # deleted until the next compaction (index_snapshots.py)
+        BATCH_SIZE.observe(len(queries))
+        self.batches += 1
+        self.queries += len(queries)
+        with BATCH_LATENCY.time(stage="embed"):
+            vectors = np.asarray(store.embedding_function.embed_documents(queries), dtype="float32")
+        if store._normalize_L2:
+            faiss.normalize_L2(vectors)
+        with BATCH_LATENCY.time(stage="search"):
+            scores, indices = store.index.search(vectors, k + len(tombstones))
+        results = []
+        for row_scores, row_indices in zip(scores, indices):
+            hits = []
+            for score, i in zip(row_scores, row_indices):
+                if i == -1 or store.index_to_docstore_id[i] in tombstones:
+                    continue
+                document = store.docstore.search(store.index_to_docstore_id[i])
+                hits.append((document, float(score)))
+            results.append(hits[:k])
+        return results
+
+
+# Server --------------------------------------------------------------------------------------------------------------------------------------------
+def make_handler(batcher: MicroBatcher):
+    class RetrievalHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict):
+            data = json.dumps(payload, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok", "ntotal": batcher.vector_store.index.ntotal,
+                                      "batches": batcher.batches, "queries": batcher.queries})
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            if self.path != "/search":
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+                hits = batcher.search(str(body["query"]), int(body.get("k", 4)))
+            except (KeyError, ValueError) as e:
+                RETRIEVAL_REQUESTS.inc(status="bad_request")
+                self._send_json(400, {"error": str(e)})
+                return
+            except Exception as e:
+                RETRIEVAL_REQUESTS.inc(status="error")
+                self._send_json(500, {"error": str(e)})
+                return
+            RETRIEVAL_REQUESTS.inc(status="ok")
+            self._send_json(200, {"results": [{"content": d.page_content, "metadata": d.metadata, "score": s} for d, s in hits]})
+
+    return RetrievalHandler
+
+
+class _ThreadingTCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # one connection per client thread in every worker
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)  # BaseHTTPRequestHandler expects a (host, port) address
+
+
+def start_server(vector_store, host: str = "127.0.0.1", port: int = 8040, socket_path: str = None, **batcher_kwargs):
+    "Serve searches over vector_store in a background thread; returns (server, batcher, url)."
+    batcher = MicroBatcher(vector_store, **batcher_kwargs)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, make_handler(batcher))
+        url = f"unix://{socket_path}"
+    else:
+        handler = make_handler(batcher)
+        handler.disable_nagle_algorithm = True  # headers and body are separate writes; avoid the delayed-ACK stall
+        server = _ThreadingTCPHTTPServer((host, port), handler)
+        url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name="retrieval-service", daemon=True).start()
+    return server, batcher, url
+
+
+# Client --------------------------------------------------------------------------------------------------------------------------------------------
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class RemoteVectorStore:
+    """Thin client with the part of the FAISS vector store interface that search_result uses.
+    Keeps one keep-alive connection per thread."""
+
+    def __init__(self, url: str = RETRIEVAL_SERVICE_URL, timeout: float = RETRIEVAL_TIMEOUT_SECONDS):
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():  # never share a socket across fork
+            self._local.pid = os.getpid()
+            if self.url.scheme == "unix":
+                connection = _UnixHTTPConnection(self.url.path, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _request(self, method: str, path: str, payload: dict = None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                response = connection.getresponse()
+                data = json.loads(response.read() or b"{}")
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # Stale keep-alive connection (service restarted): reconnect once
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(f"Retrieval service error {response.status}: {data.get('error')}")
+        return data
+
+    def similarity_search_with_score(self, query: str, k: int = 4):
+        from langchain_core.documents import Document
+        data = self._request("POST", "/search", {"query": query, "k": k})
+        return [(Document(page_content=r["content"], metadata=r["metadata"]), r["score"]) for r in data["results"]]
+
+    def health(self) -> dict:
+        return self._request("GET", "/health")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared micro-batched FAISS retrieval service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8040)
+    parser.add_argument("--socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--window-ms", type=float, default=RETRIEVAL_BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=RETRIEVAL_MAX_BATCH)
+    args = parser.parse_args()
+
+    from faiss_search import get_local_vector_store
+    vector_store = get_local_vector_store()  # always local here, whatever RETRIEVAL_SERVICE_URL says
+    if vector_store is None:
+        raise SystemExit("No FAISS index to serve; run add_documents_faiss.py first.")
+    vector_store.embedding_function.embed_documents(["warm up"])
+    server, _, url = start_server(get_local_vector_store, args.host, args.port, args.socket,
+                                  window_ms=args.window_ms, max_batch=args.max_batch)
+    print(f"Retrieval service listening on {url} ({vector_store.index.ntotal} vectors, "
+          f"{args.window_ms:g} ms batch window, max batch {args.max_batch})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
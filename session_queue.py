@@ -0,0 +1,152 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from metrics import counter, gauge, histogram
+
+# Per-session ordering for the API layer. Messages for the same session_id run one at a time in
+# arrival order (so each turn sees the history written by the previous one), while different
+# sessions still run concurrently. Optionally, messages that arrive while a turn is queued or
+# running are coalesced into a single turn.
+#
+# Within one process ordering is guaranteed by a per-session queue and drain task. With several
+# worker processes a session can land on different workers, so a cross-process lock backend is
+# held around each turn:
+#   SESSION_LOCK_BACKEND=local    - no cross-process lock (single worker, or sticky sessions)
+#   SESSION_LOCK_BACKEND=postgres - pg_advisory_lock on the chat history database
+SESSION_LOCK_BACKEND = os.getenv("SESSION_LOCK_BACKEND", "local").lower()
+SESSION_COALESCE_WINDOW_MS = float(os.getenv("SESSION_COALESCE_WINDOW_MS", "0"))  # 0 disables coalescing
+SESSION_COALESCE_MAX = int(os.getenv("SESSION_COALESCE_MAX", "5"))
+
+QUEUE_DEPTH = gauge("agent_session_queue_depth", "Messages waiting for or running a session turn", [])
+ACTIVE_SESSIONS = gauge("agent_session_queue_active_sessions", "Sessions with queued or running turns", [])
+QUEUE_WAIT = histogram("agent_session_queue_wait_seconds", "Time a message waits before its turn starts", [])
+COALESCED_MESSAGES = counter("agent_session_coalesced_messages_total", "Messages merged into another message's turn", [])
+
+
+class LocalSessionLock:
+    "No cross-process lock; ordering comes from the in-process queue only."
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        yield
+
+
+class PostgresSessionLock:
+    "Session-level advisory lock held on a dedicated connection for the duration of a turn."
+
+    def __init__(self, connection_config: dict = None):
+        if connection_config is None:
+            from memory_postgres import POSTGRES_CONFIG
+            connection_config = POSTGRES_CONFIG
+        self.connection_config = connection_config
+
+    def _acquire(self, session_id: str):
+        import psycopg2
+        conn = psycopg2.connect(**self.connection_config)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(hashtextextended(%s, 0))", (session_id,))
+        return conn
+
+    def _release(self, conn, session_id: str):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(hashtextextended(%s, 0))", (session_id,))
+        finally:
+            conn.close()
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        loop = asyncio.get_running_loop()
+        conn = await loop.run_in_executor(None, self._acquire, session_id)
+        try:
+            yield
+        finally:
+            await loop.run_in_executor(None, self._release, conn, session_id)
+
+
+def build_session_lock(backend: str = None):
+    backend = (backend or SESSION_LOCK_BACKEND).lower()
+    if backend == "local":
+        return LocalSessionLock()
+    if backend == "postgres":
+        return PostgresSessionLock()
+    raise ValueError(f"Unknown session lock backend: {backend}")
+
+
+class _PendingMessage:
+    __slots__ = ("message", "handler", "future", "enqueued_at")
+
+    def __init__(self, message, handler, future):
+        self.message = message
+        self.handler = handler
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class SessionQueue:
+    "Serializes turns per session; see module comment for the backends and coalescing."
+
+    def __init__(self, lock=None, coalesce_window_ms: float = SESSION_COALESCE_WINDOW_MS,
+                 coalesce_max: int = SESSION_COALESCE_MAX):
+        self.lock = lock or build_session_lock()
+        self.coalesce_window = coalesce_window_ms / 1000
+        self.coalesce_max = max(1, coalesce_max)
+        self._pending = {}   # session_id -> list of _PendingMessage
+        self._workers = {}   # session_id -> drain task
+
+    def depth(self, session_id: str = None) -> int:
+        if session_id is not None:
+            return len(self._pending.get(session_id, ()))
+        return sum(len(p) for p in self._pending.values())
+
+    async def submit(self, session_id: str, message: str, handler) -> dict:
+        """Queue a message and wait for its turn. handler(message, session_id) is an async callable.
+        Returns {"response", "coalesced", "primary"}: coalesced is the number of messages answered by the
+        turn and primary is False for messages whose text was merged into a later message's turn."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(session_id, []).append(_PendingMessage(message, handler, future))
+        QUEUE_DEPTH.inc()
+        if session_id not in self._workers:
+            ACTIVE_SESSIONS.inc()
+            self._workers[session_id] = asyncio.create_task(self._drain(session_id))
+        return await future
+
+    async def _drain(self, session_id: str):
+        pending = self._pending[session_id]
+        try:
+            while pending:
+                if self.coalesce_window:
+                    # Give rapid-fire follow-ups a moment to arrive before starting the turn
+                    await asyncio.sleep(self.coalesce_window)
+                batch_size = self.coalesce_max if self.coalesce_window else 1
+                batch = pending[:batch_size]
+                del pending[:batch_size]
+                await self._run_turn(session_id, batch)
+        finally:
+            del self._workers[session_id]
+            del self._pending[session_id]
+            ACTIVE_SESSIONS.dec()
+
+    async def _run_turn(self, session_id: str, batch):
+        started = time.perf_counter()
+        for item in batch:
+            QUEUE_WAIT.observe(started - item.enqueued_at)
+        if len(batch) > 1:
+            COALESCED_MESSAGES.inc(len(batch) - 1)
+        message = "\n".join(item.message for item in batch)
+        try:
+            async with self.lock.hold(session_id):
+                response = await batch[-1].handler(message, session_id)
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+        else:
+            for i, item in enumerate(batch):
+                if not item.future.done():
+                    item.future.set_result({"response": response, "coalesced": len(batch), "primary": i == len(batch) - 1})
+        finally:
+            QUEUE_DEPTH.dec(len(batch))
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+import logging
+
+from embeddings import warm_up_embeddings, is_embeddings_loaded
+from fast_router import get_faq_index, is_faq_loaded
+from faiss_search import get_vector_store, is_vector_store_loaded, RETRIEVAL_SERVICE_URL
+from llm_backends import get_llm, is_llm_loaded
+from main import get_graph, is_graph_loaded, get_history_backend, is_history_backend_loaded, start_monitoring
+
+logger = logging.getLogger(__name__)
+
+# Staged startup: the API process starts serving immediately (liveness) while heavy components are
+# loaded by a background warm-up thread; /ready reports which components are available.
+AGENT_WARM_UP = os.getenv("AGENT_WARM_UP", "1") == "1"
+MONITORING_ENABLED = os.getenv("PHOENIX_MONITORING", "1") == "1"
+
+# Name -> (loader, loaded check, required for readiness). Loaders are idempotent and thread safe,
+# so a request arriving mid warm-up simply waits on the same lock instead of loading twice.
+COMPONENTS = {
+    "monitoring": (start_monitoring, lambda: False, False),
+    "llm": (get_llm, is_llm_loaded, True),
+    "graph": (get_graph, is_graph_loaded, True),
+    "history": (get_history_backend, is_history_backend_loaded, True),
+    "embeddings": (warm_up_embeddings, is_embeddings_loaded, True),
+    "vector_store": (get_vector_store, is_vector_store_loaded, True),
+    "faq": (get_faq_index, is_faq_loaded, False),
+}
+if RETRIEVAL_SERVICE_URL:
+    # The retrieval service owns the embedding model and index; the vector_store check pings it
+    del COMPONENTS["embeddings"]
+
+_status = {name: "pending" for name in COMPONENTS}
+_errors = {}
+_load_seconds = {}
+_warm_up_thread = None
+
+
+def warm_up():
+    "Load every component in order, recording status, duration and any error."
+    for name, (loader, _, _) in COMPONENTS.items():
+        if name == "monitoring" and not MONITORING_ENABLED:
+            _status[name] = "disabled"
+            continue
+        _status[name] = "loading"
+        start = time.perf_counter()
+        try:
+            loader()
+            _status[name] = "ready"
+        except Exception as e:
+            _status[name] = "failed"
+            _errors[name] = str(e)
+            logger.error(f"Warm-up of {name} failed: {e}")
+        _load_seconds[name] = round(time.perf_counter() - start, 3)
+    logger.info(f"Warm-up finished: {_status}")
+
+
+def start_background_warm_up():
+    "Start the warm-up thread once; returns immediately."
+    global _warm_up_thread
+    if _warm_up_thread is None and AGENT_WARM_UP:
+        _warm_up_thread = threading.Thread(target=warm_up, name="agent-warm-up", daemon=True)
+        _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def readiness():
+    "Return (ready, details) where details lists the state of each component."
+    components = {}
+    for name, (_, is_loaded, _) in COMPONENTS.items():
+        state = _status[name]
+        # Components can also be loaded lazily by a request before the warm-up reaches them
+        if state in ("pending", "loading") and is_loaded():
+            state = "ready"
+        components[name] = {"status": state}
+        if name in _load_seconds:
+            components[name]["load_seconds"] = _load_seconds[name]
+        if name in _errors:
+            components[name]["error"] = _errors[name]
+
+    ready = all(
+        components[name]["status"] == "ready"
+        for name, (_, _, required) in COMPONENTS.items() if required
+    )
+    return ready, components
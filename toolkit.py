@@ -1,74 +1,96 @@
 import os
 from langchain_core.tools import tool
+from langgraph.config import get_config
 from tavily import TavilyClient
-from langchain_openai import AzureChatOpenAI
-from langchain_ollama import ChatOllama
 from dotenv import load_dotenv     
-from rag_capability.faiss_search import initialize_faiss_vector_store, search_result
+from faiss_search import get_vector_store, is_vector_store_loaded, search_result
+from calculator import evaluate
+from context_assembler import assemble_context
+from llm_backends import get_resilient_llm
+from metrics import instrument_tool
+from prefetch import PREFETCH_ENABLED, get_prefetcher
+from resilience import BackendUnavailable, call_with_resilience
 
 load_dotenv()
 
-# Initialize Azure OpenAI LLM
-llm = AzureChatOpenAI(
-    azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key = os.getenv("AZURE_OPENAI_API_KEY"),
-    azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-    api_version = os.getenv("AZURE_OPENAI_API_VERSION"),
-    temperature = 0.7
-)
+# The LLM used by summarize_text is shared with the agent and built lazily (see llm_backends.py)
 
-# Download Ollama LLM
-# Download qwen3:4b model; please note that gemma models seem to be running into issues with Ollama at the moment of writing this code
-# Pull the model and make sure Ollama is running on port 11434
+# Knowledge-base hits fetched per query; context_assembler.py merges and trims them to a token budget
+KB_SEARCH_K = int(os.getenv("KB_SEARCH_K", "4"))
+WEB_SEARCH_TIMEOUT_SECONDS = float(os.getenv("WEB_SEARCH_TIMEOUT_SECONDS", "15"))
 
-# # ollama pull qwen3:4b
-# llm = ChatOllama(
-#     model="qwen3:4b",  
-#     base_url="http://localhost:11434",  
-#     temperature=0.7,
-#     max_tokens=2048
-# )
+
+def _search_hits(query: str):
+    return search_result(get_vector_store(), query, k=KB_SEARCH_K)
+
+
+def _turn_key():
+    # The running graph turn's thread id (see invoke_graph in main.py); None outside a graph run
+    try:
+        return get_config().get("configurable", {}).get("thread_id")
+    except RuntimeError:
+        return None
+
+
+def prefetch_knowledge_base(query: str):
+    "Start the knowledge-base search for query in the background (PREFETCH_ENABLED=1, see prefetch.py)."
+    key = _turn_key()
+    if PREFETCH_ENABLED and key is not None and is_vector_store_loaded() and get_vector_store() is not None:
+        get_prefetcher(_search_hits).start(key, query)
 
 
 # Define Tools - Mathematical Calculation, Text Summarization, Knowledge Base Search------------------------------------------------------------------------------
 @tool
+@instrument_tool("calculate")
 def calculate(expression: str) -> str:
-    "Performs mathematical calculations. Input should be a valid Python math expression."
+    """Performs mathematical calculations. Input should be an arithmetic expression using + - * / // % **,
+    math functions (sqrt, log, sin, factorial, ...) and lists for element-wise operations, e.g. [1, 2, 3] * 2 or mean([4, 8])."""
     try:
-        result = eval(expression, {"__builtins__": {}}, {})
+        result = evaluate(expression)
         return f"Result: {result}"
     except Exception as e:
         return f"Error calculating: {str(e)}"
 
 @tool
+@instrument_tool("summarize_text")
 def summarize_text(text: str) -> str:
     """Summarizes the given text using the LLM."""
     prompt = f"Please provide a concise summary of the following text:\n\n{text}"
-    response = llm.invoke(prompt)
+    response = get_resilient_llm().invoke(prompt)
     return response.content
 
 @tool
+@instrument_tool("search_knowledge_base")
 def search_knowledge_base(query: str) -> str:
     "Searches the Azure AI Search vector database for relevant information."
-    vector_store = initialize_faiss_vector_store()
-    results = search_result(vector_store, query, k=2)
-    if not results:
+    vector_store = get_vector_store()
+    if vector_store is None:
+        return "The knowledge base is empty. Add documents with add_documents_faiss.py first."
+    key = _turn_key() if PREFETCH_ENABLED else None
+    results = get_prefetcher(_search_hits).claim(key, query) if key is not None else None
+    if results is None:
+        results = _search_hits(query)
+    if not results or isinstance(results, str):
         return "No relevant information found in the knowledge base."
-    context = "\n\n".join([doc['content'] for doc in results])
+    context, report = assemble_context(results, query)
+    print(f"Context: {report['tokens']} tokens ({report['saved']} saved of {report['raw_tokens']})")
     return f"Found relevant information:\n{context}"
 
 @tool
+@instrument_tool("web_search")
 def web_search(query: str,  num_results: int = 3) -> str:
     "Searches the web using tavily search and provides upto 5 results."
     try:
         api_key = os.getenv("TAVILY_API_KEY")
         tavily_client = TavilyClient(api_key)
         client = TavilyClient("tvly-dev-********************************")
-        response = tavily_client.search(
+        # Deadline, retries and a circuit breaker around Tavily (see resilience.py)
+        response = call_with_resilience([("tool:tavily", tavily_client)], lambda c, timeout: c.search(
                 query=query,
                 max_results=3,
-                search_depth="basic"  # or "advanced" for more thorough search
-            )
+                search_depth="basic",  # or "advanced" for more thorough search
+                timeout=timeout
+            ), attempt_timeout=WEB_SEARCH_TIMEOUT_SECONDS)
         print(f"\n Sources from Tavily Web Search ({len(response)} total):")
         print("*"*100 +"\n")
         for result in response['results']:
@@ -78,4 +100,7 @@ def web_search(query: str,  num_results: int = 3) -> str:
 
     except ValueError as e:
         print(f"{e}")
+    except BackendUnavailable as e:
+        print(f"{e}")
+        return "Web search is temporarily unavailable; answer from other sources or say you could not search the web."
 
@@ -0,0 +1,86 @@
+import os
+
+# Compact vector storage for the FAISS index. mpnet vectors are 768 float32 values (3 KB per chunk),
+# and the index is held in memory by every worker, so ingestion can store them more compactly:
+#   FAISS_VECTOR_STORAGE=float32      - IndexFlatL2, exact (default)
+#   FAISS_VECTOR_STORAGE=float16      - IndexScalarQuantizer(QT_fp16): half the memory, near-identical ranking
+#   FAISS_VECTOR_STORAGE=pca          - IndexPreTransform(PCAMatrix 768 -> FAISS_PCA_DIM, IndexFlatL2)
+#   FAISS_VECTOR_STORAGE=pca+float16  - both
+# The PCA matrix is part of the FAISS index, so it is saved and loaded with it and applied to every
+# query by FAISS itself; faiss_search needs no changes to search a compact index.
+# mpnet was not trained with Matryoshka loss, so plain truncation loses far more recall than a PCA
+# trained on the corpus; PCA is used for dimension reduction instead.
+FAISS_VECTOR_STORAGE = os.getenv("FAISS_VECTOR_STORAGE", "float32").lower()
+FAISS_PCA_DIM = int(os.getenv("FAISS_PCA_DIM", "256"))
+STORAGE_MODES = ("float32", "float16", "pca", "pca+float16")
+
+
+def build_index(storage: str, dimension: int, training_vectors=None, pca_dim: int = FAISS_PCA_DIM):
+    "Empty FAISS index for the storage mode; PCA modes are trained on training_vectors (n >= pca_dim)."
+    import faiss
+
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown FAISS vector storage: {storage} (expected one of {', '.join(STORAGE_MODES)})")
+    use_pca = storage.startswith("pca")
+    inner_dim = pca_dim if use_pca else dimension
+    if storage.endswith("float16"):
+        inner = faiss.IndexScalarQuantizer(inner_dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    else:
+        inner = faiss.IndexFlatL2(inner_dim)
+    if not use_pca:
+        return inner
+
+    if training_vectors is None or len(training_vectors) < pca_dim:
+        raise ValueError(f"PCA to {pca_dim} dimensions needs at least {pca_dim} training vectors")
+    index = faiss.IndexPreTransform(faiss.PCAMatrix(dimension, pca_dim), inner)
+    index.train(training_vectors)
+    return index
+
+
+def storage_of(index) -> str:
+    "Storage mode of an existing FAISS index."
+    import faiss
+
+    downcast = faiss.downcast_index(index)
+    use_pca = isinstance(downcast, faiss.IndexPreTransform)
+    inner = faiss.downcast_index(downcast.index) if use_pca else downcast
+    half = isinstance(inner, faiss.IndexScalarQuantizer) and inner.sq.qtype == faiss.ScalarQuantizer.QT_fp16
+    if use_pca:
+        return "pca+float16" if half else "pca"
+    return "float16" if half else "float32"
+
+
+def index_memory_bytes(index) -> int:
+    "Size of the serialized index, which tracks its in-memory footprint (vectors plus any transform)."
+    import faiss
+    return int(faiss.serialize_index(index).size)
+
+
+def all_vectors(index):
+    "Reconstruct every stored vector (in the index's input space) as a float32 array."
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def convert_index(index, storage: str, pca_dim: int = FAISS_PCA_DIM):
+    "Copy an index into the given storage mode, keeping vector order so docstore ids stay valid."
+    vectors = all_vectors(index)
+    compact = build_index(storage, index.d, vectors, pca_dim)
+    if len(vectors):
+        compact.add(vectors)
+    return compact
+
+
+def apply_storage(vector_store, storage: str = FAISS_VECTOR_STORAGE, pca_dim: int = FAISS_PCA_DIM) -> bool:
+    """Switch a LangChain FAISS store to the configured storage mode if it is not already using it.
+    Returns True when the index was converted; False when already compact or (PCA) too few vectors to train."""
+    if storage == "float32" or storage_of(vector_store.index) == storage:
+        return False
+    if storage.startswith("pca") and vector_store.index.ntotal < pca_dim:
+        print(f"Keeping float32 storage until the index holds {pca_dim} vectors to train PCA "
+              f"({vector_store.index.ntotal} so far)")
+        return False
+    before = index_memory_bytes(vector_store.index)
+    vector_store.index = convert_index(vector_store.index, storage, pca_dim)
+    after = index_memory_bytes(vector_store.index)
+    print(f"Converted FAISS index to {storage} storage: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+    return True
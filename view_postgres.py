@@ -1,6 +1,23 @@
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
 import psycopg2
+from psycopg2 import sql
 from tabulate import tabulate
 
+# Table explorer and bulk exporter for the Postgres databases (Phoenix spans, chat history).
+# Rows are streamed with named server-side cursors, identifiers are quoted with psycopg2.sql and filter
+# values are bound as parameters, so large tables can be browsed and dumped with constant memory.
+#   python view_postgres.py tables
+#   python view_postgres.py schema spans
+#   python view_postgres.py view spans --columns name,start_time --where "name=ChatOpenAI" --limit 50
+#   python view_postgres.py export spans --format csv --output spans.csv
+#   python view_postgres.py export spans --format parquet --output spans.parquet --where "start_time>=2025-01-01"
+
 # Database configuration
 DB_CONFIG = {
     "host": "localhost",
@@ -10,90 +27,198 @@ DB_CONFIG = {
     "database": "phoenix_db"
 }
 
-def list_tables():
-    conn = psycopg2.connect(**DB_CONFIG)
+FILTER_PATTERN = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|=|>|<|~)\s*(.*)$")
+FILTER_OPERATORS = {"=": "=", "!=": "<>", ">": ">", "<": "<", ">=": ">=", "<=": "<=", "~": "LIKE"}
+
+def connect(database=None):
+    return psycopg2.connect(**{**DB_CONFIG, **({"database": database} if database else {})})
+
+def list_tables(conn, schema="public"):
     cursor = conn.cursor()
-    
+    # reltuples is the planner's estimate: instant, unlike COUNT(*) on a large span table
     cursor.execute("""
-        SELECT table_name 
-        FROM information_schema.tables 
-        WHERE table_schema = 'public'
-        ORDER BY table_name;
-    """)
-    
+        SELECT c.relname, GREATEST(c.reltuples, 0)::bigint, pg_size_pretty(pg_total_relation_size(c.oid))
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s AND c.relkind IN ('r', 'p')
+        ORDER BY c.relname;
+    """, (schema,))
     tables = cursor.fetchall()
     cursor.close()
-    conn.close()
-    
+
     print("\nAvailable Tables:")
     print("="*50)
-    for table in tables:
-        print(f"  • {table[0]}")
+    print(tabulate(tables, headers=["Table", "Rows (est.)", "Size"], tablefmt="simple"))
     print()
-    
     return [t[0] for t in tables]
 
-def view_table(table_name, limit=100):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    
-    # Get column names
-    cursor.execute(f"""
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = '{table_name}'
-        ORDER BY ordinal_position;
-    """)
-    columns = [col[0] for col in cursor.fetchall()]
-    
-    # Get data
-    cursor.execute(f"SELECT * FROM {table_name} LIMIT {limit};")
-    rows = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
-    
-    # Display
-    print(f"\n Table: {table_name}")
-    print(f"   Rows: {len(rows)} (showing up to {limit})")
-    print("="*80)
-    print(tabulate(rows, headers=columns, tablefmt="grid"))
-    print()
-
-def table_info(table_name):
-    conn = psycopg2.connect(**DB_CONFIG)
+def table_columns(conn, table_name, schema="public"):
+    "[(column_name, data_type, character_maximum_length, is_nullable, column_default)] in table order."
     cursor = conn.cursor()
-    
-    cursor.execute(f"""
-        SELECT 
-            column_name,
-            data_type,
-            character_maximum_length,
-            is_nullable,
-            column_default
+    cursor.execute("""
+        SELECT column_name, data_type, character_maximum_length, is_nullable, column_default
         FROM information_schema.columns
-        WHERE table_name = '{table_name}'
+        WHERE table_schema = %s AND table_name = %s
         ORDER BY ordinal_position;
-    """)
-    
-    schema = cursor.fetchall()
+    """, (schema, table_name))
+    columns = cursor.fetchall()
     cursor.close()
-    conn.close()
-    
-    print(f"\n🔍 Schema for: {table_name}")
+    if not columns:
+        raise SystemExit(f"Table not found: {schema}.{table_name}")
+    return columns
+
+def table_info(conn, table_name, schema="public"):
+    print(f"\n🔍 Schema for: {schema}.{table_name}")
     print("="*80)
     print(tabulate(
-        schema, 
+        table_columns(conn, table_name, schema),
         headers=["Column", "Type", "Max Length", "Nullable", "Default"],
         tablefmt="grid"
     ))
     print()
 
+def build_query(conn, table_name, schema="public", columns=None, filters=(), limit=None):
+    "SELECT with quoted identifiers and bound filter values; returns (composed query, params, column names)."
+    known = [c[0] for c in table_columns(conn, table_name, schema)]
+    selected = columns or known
+    for column in selected:
+        if column not in known:
+            raise SystemExit(f"Unknown column {column!r}; available: {', '.join(known)}")
+
+    conditions, params = [], []
+    for expression in filters:
+        match = FILTER_PATTERN.match(expression)
+        if not match or match.group(1) not in known:
+            raise SystemExit(f"Bad filter {expression!r}; expected <column><op><value> with op one of {', '.join(FILTER_OPERATORS)}")
+        column, operator, value = match.groups()
+        # Compare as text for LIKE so patterns work on any column type
+        target = sql.SQL("{}::text").format(sql.Identifier(column)) if operator == "~" else sql.Identifier(column)
+        conditions.append(sql.SQL("{} {} %s").format(target, sql.SQL(FILTER_OPERATORS[operator])))
+        params.append(value)
+
+    query = sql.SQL("SELECT {} FROM {}").format(
+        sql.SQL(", ").join(sql.Identifier(c) for c in selected),
+        sql.Identifier(schema, table_name),
+    )
+    if conditions:
+        query += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions)
+    if limit:
+        query += sql.SQL(" LIMIT {}").format(sql.Literal(int(limit)))
+    return query, params, selected
+
+def report(rows, seconds, nbytes=None):
+    rate = rows / seconds if seconds else float("inf")
+    line = f"{rows} rows in {seconds:.2f}s ({rate:,.0f} rows/s"
+    if nbytes is not None:
+        line += f", {nbytes / 1e6:.1f} MB, {nbytes / 1e6 / seconds if seconds else 0:,.1f} MB/s"
+    print(line + ")", file=sys.stderr)
+
+def view_table(conn, table_name, schema="public", columns=None, filters=(), limit=100, batch_size=1000):
+    query, params, selected = build_query(conn, table_name, schema, columns, filters, limit)
+    start, total = time.perf_counter(), 0
+    # Named cursor: rows stay on the server and arrive batch_size at a time
+    with conn.cursor(name="view_table") as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(query, params)
+        print(f"\n Table: {schema}.{table_name}")
+        print("="*80)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            total += len(rows)
+            print(tabulate(rows, headers=selected, tablefmt="grid", maxcolwidths=60))
+    report(total, time.perf_counter() - start)
+
+def copy_csv(conn, query, params, out):
+    "COPY (query) TO STDOUT as CSV with a header; values are bound client-side with mogrify (COPY takes no parameters)."
+    cursor = conn.cursor()
+    select = cursor.mogrify(query, params).decode()
+    cursor.copy_expert(f"COPY ({select}) TO STDOUT WITH (FORMAT csv, HEADER true)", out)
+    rows = cursor.rowcount  # from the "COPY n" command tag
+    cursor.close()
+    return rows
+
+def arrow_types(conn, table_name, schema, selected):
+    # Numeric and boolean columns keep their type; everything else (timestamps, JSON, arrays) is exported as text
+    import pyarrow as pa
+    mapping = {"smallint": pa.int16(), "integer": pa.int32(), "bigint": pa.int64(), "real": pa.float32(),
+               "double precision": pa.float64(), "boolean": pa.bool_()}
+    types = {c[0]: c[1] for c in table_columns(conn, table_name, schema)}
+    return {column: mapping.get(types[column], pa.string()) for column in selected}
+
+def export_table(conn, table_name, output, fmt="csv", schema="public", columns=None, filters=(), limit=None,
+                 block_size=64 << 20):
+    query, params, selected = build_query(conn, table_name, schema, columns, filters, limit)
+    start = time.perf_counter()
+    if fmt == "csv":
+        with open(output, "wb") as out:
+            rows = copy_csv(conn, query, params, out)
+        report(rows, time.perf_counter() - start, os.path.getsize(output))
+        return
+
+    try:
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise SystemExit("Parquet export needs pyarrow: pip install pyarrow") from e
+    # COPY to a spool file at disk speed, then convert block by block so memory stays bounded
+    with tempfile.NamedTemporaryFile(suffix=".csv") as spool:
+        copy_csv(conn, query, params, spool)
+        spool.flush()
+        copied = time.perf_counter()
+        reader = pacsv.open_csv(
+            spool.name,
+            read_options=pacsv.ReadOptions(block_size=block_size),
+            convert_options=pacsv.ConvertOptions(column_types=arrow_types(conn, table_name, schema, selected),
+                                                 true_values=["t"], false_values=["f"], strings_can_be_null=True),
+        )
+        rows = 0
+        with pq.ParquetWriter(output, reader.schema, compression="zstd") as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    print(f"COPY took {copied - start:.2f}s", file=sys.stderr)
+    report(rows, time.perf_counter() - start, os.path.getsize(output))
+
+def main():
+    parser = argparse.ArgumentParser(description="Browse and export Postgres tables with server-side cursors")
+    parser.add_argument("--database", help=f"database name (default {DB_CONFIG['database']})")
+    parser.add_argument("--schema", default="public")
+    commands = parser.add_subparsers(dest="command")
+
+    commands.add_parser("tables", help="list tables with estimated row counts and sizes")
+    schema_parser = commands.add_parser("schema", help="show a table's columns")
+    schema_parser.add_argument("table")
+
+    for name, help_text in (("view", "print rows, streamed in batches"), ("export", "bulk export via COPY to CSV or Parquet")):
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument("table")
+        sub.add_argument("--columns", help="comma separated column projection")
+        sub.add_argument("--where", action="append", default=[], metavar="EXPR",
+                         help="filter like col=value, col>=value or col~pattern%% (repeatable, ANDed)")
+        if name == "view":
+            sub.add_argument("--limit", type=int, default=100)
+            sub.add_argument("--batch-size", type=int, default=1000)
+        else:
+            sub.add_argument("--format", choices=["csv", "parquet"], default="csv")
+            sub.add_argument("--output", required=True)
+            sub.add_argument("--limit", type=int)
+    args = parser.parse_args()
+
+    conn = connect(args.database)
+    try:
+        if args.command == "schema":
+            table_info(conn, args.table, args.schema)
+        elif args.command in ("view", "export"):
+            columns = [c.strip() for c in args.columns.split(",")] if args.columns else None
+            if args.command == "view":
+                view_table(conn, args.table, args.schema, columns, args.where, args.limit, args.batch_size)
+            else:
+                export_table(conn, args.table, args.output, args.format, args.schema, columns, args.where, args.limit)
+        else:
+            list_tables(conn, args.schema)
+    finally:
+        conn.close()
+
 if __name__ == "__main__":
-    # List all tables
-    tables = list_tables()
-    
-    # View each table
-    for table in tables:
-        table_info(table)
-        view_table(table, limit=25)
\ No newline at end of file
+    main()
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+
+from starlette.websockets import WebSocketDisconnect
+
+from metrics import counter, gauge
+
+# WebSocket connection management for /ws. One socket stays open per browser tab, so connections
+# are bounded, dead peers are detected, and a slow reader cannot make a worker buffer replies forever:
+#   - heartbeats: the server pings every WS_PING_INTERVAL_SECONDS and drops peers that don't pong
+#     within WS_PING_TIMEOUT_SECONDS (protocol-level, answered by browsers automatically; see
+#     server_options). Connections with no message and no turn in flight for WS_IDLE_TIMEOUT_SECONDS
+#     are closed. Clients may also send {"type": "ping"} and get {"type": "pong"} back.
+#   - WS_MAX_CONNECTIONS per worker; further connections are accepted and closed with 1013 (try again later).
+#   - replies go through a per-connection queue of WS_SEND_QUEUE_SIZE messages drained by one sender
+#     task; a full queue or a send taking longer than WS_SEND_TIMEOUT_SECONDS closes the connection.
+#   - permessage-deflate (WS_PER_MESSAGE_DEFLATE) and at most WS_MAX_MESSAGE_BYTES per incoming message.
+#   - clients that offer the "msgpack" subprotocol exchange binary msgpack frames instead of JSON text
+#     (needs ormsgpack or msgpack installed; otherwise the subprotocol is not accepted).
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "1000"))
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "300"))
+WS_PING_INTERVAL_SECONDS = float(os.getenv("WS_PING_INTERVAL_SECONDS", "20"))
+WS_PING_TIMEOUT_SECONDS = float(os.getenv("WS_PING_TIMEOUT_SECONDS", "20"))
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "16"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "1") == "1"
+WS_MAX_MESSAGE_BYTES = int(os.getenv("WS_MAX_MESSAGE_BYTES", str(64 * 1024)))  # input guardrails stop at 5000 chars
+WS_MAX_INCOMING_QUEUE = int(os.getenv("WS_MAX_INCOMING_QUEUE", "8"))
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+WS_CONNECTIONS = gauge("agent_ws_connections", "Open WebSocket connections", ["format"])
+WS_CLOSED = counter("agent_ws_closed_total", "WebSocket connections closed or refused by reason", ["reason"])
+WS_SEND_QUEUE_FULL = counter("agent_ws_send_queue_full_total", "Replies that found the connection's send queue full")
+WS_MALFORMED_FRAMES = counter("agent_ws_malformed_frames_total", "Binary frames on msgpack connections that failed to decode")
+
+_closing = set()
+
+
+def server_options() -> dict:
+    "uvicorn.Config keyword arguments for the protocol-level heartbeat, compression and frame limits."
+    return {
+        "ws_ping_interval": WS_PING_INTERVAL_SECONDS,
+        "ws_ping_timeout": WS_PING_TIMEOUT_SECONDS,
+        "ws_per_message_deflate": WS_PER_MESSAGE_DEFLATE,
+        "ws_max_size": WS_MAX_MESSAGE_BYTES,
+        "ws_max_queue": WS_MAX_INCOMING_QUEUE,
+    }
+
+
+def _msgpack():
+    # ormsgpack and msgpack share packb/unpackb; None when neither is installed
+    try:
+        import ormsgpack
+        return ormsgpack
+    except ImportError:
+        pass
+    try:
+        import msgpack
+        return msgpack
+    except ImportError:
+        return None
+
+
+class Connection:
+    "One accepted /ws socket: decoded receives with an idle timeout and a bounded, ordered send queue."
+
+    __slots__ = ("websocket", "format", "_codec", "_registry", "_queue", "_sender", "closed")
+
+    def __init__(self, websocket, registry, codec=None):
+        self.websocket = websocket
+        self.format = MSGPACK_SUBPROTOCOL if codec else "json"
+        self._codec = codec
+        self._registry = registry
+        self._queue = asyncio.Queue(WS_SEND_QUEUE_SIZE)
+        self._sender = asyncio.create_task(self._send_loop())
+        self.closed = False
+
+    async def receive(self, timeout: float = WS_IDLE_TIMEOUT_SECONDS):
+        """(message, raw) for the next client message: message is the decoded JSON/msgpack value, or
+        None when a text frame is not JSON. A binary frame that is not msgpack gets an error reply and
+        is skipped. Raises TimeoutError after `timeout` seconds of silence."""
+        while True:
+            event = await asyncio.wait_for(self.websocket.receive(), timeout)
+            if event["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(event.get("code", 1000), event.get("reason"))
+            if event.get("bytes") is None:
+                break
+            if self._codec is None:
+                return None, event["bytes"].decode("utf-8", "replace")
+            try:
+                message = self._codec.unpackb(event["bytes"])
+            except ValueError as e:  # ormsgpack.MsgpackDecodeError, msgpack's ExtraData/FormatError/StackError
+                WS_MALFORMED_FRAMES.inc()
+                self.send({"error": f"Malformed msgpack message: {e}"})
+                continue
+            return message, message if isinstance(message, str) else ""
+        raw = event.get("text") or ""
+        try:
+            return json.loads(raw), raw
+        except ValueError:
+            return None, raw
+
+    def send(self, payload: dict) -> bool:
+        "Queue a reply without waiting. A full queue means the client stopped reading: the connection is closed."
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            WS_SEND_QUEUE_FULL.inc()
+            self._close_later(1013, "send queue full")
+            return False
+
+    async def _send_loop(self):
+        while True:
+            payload = await self._queue.get()
+            try:
+                if self._codec is not None:
+                    send = self.websocket.send_bytes(self._codec.packb(payload))
+                else:
+                    send = self.websocket.send_text(json.dumps(payload))
+                await asyncio.wait_for(send, WS_SEND_TIMEOUT_SECONDS)
+            except TimeoutError:
+                self._close_later(1013, "slow consumer")
+                return
+            except Exception:
+                return  # the peer is gone; the receive loop sees the disconnect
+
+    def _close_later(self, code: int, reason: str):
+        task = asyncio.create_task(self.close(code, reason))
+        _closing.add(task)  # keep a reference until it finishes
+        task.add_done_callback(_closing.discard)
+
+    async def close(self, code: int = 1000, reason: str = "closed"):
+        "Close once, releasing the connection slot; reason is recorded in agent_ws_closed_total."
+        if self.closed:
+            return
+        self.closed = True
+        self._registry.release(self)
+        WS_CLOSED.inc(reason=reason.replace(" ", "_"))
+        self._sender.cancel()
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass  # already closed by the peer
+
+
+class ConnectionRegistry:
+    "Per-worker cap on open /ws connections."
+
+    def __init__(self, max_connections: int = WS_MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self.active = 0
+
+    async def open(self, websocket):
+        "Accept websocket and return its Connection, or close it with 1013 and return None when the worker is full."
+        codec = _msgpack() if MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", []) else None
+        await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if codec else None)
+        if self.active >= self.max_connections:
+            WS_CLOSED.inc(reason="connection_cap")
+            await websocket.close(code=1013, reason="connection limit reached")
+            return None
+        self.active += 1
+        connection = Connection(websocket, self, codec)
+        WS_CONNECTIONS.inc(format=connection.format)
+        return connection
+
+    def release(self, connection: Connection):
+        self.active -= 1
+        WS_CONNECTIONS.dec(format=connection.format)